@@ -0,0 +1,80 @@
+"""
+Rate alerts indexed by currency pair.
+
+Active alerts (not yet triggered, with a phone number) are grouped by
+(from, to) and kept sorted by target_rate, so one rate per pair is enough to
+find every crossed threshold with a bisect. A second per-pair list tracks the
+alerts still waiting for their one-off weekly-high notice.
+"""
+
+import threading
+from bisect import bisect_right, insort
+
+
+def is_active(alert):
+    return bool(alert.get("phone_number")) and not alert.get("triggered_at") and not alert.get("sms_sent")
+
+
+class AlertIndex:
+    """Per-pair, target-sorted view over the alert dicts (which it shares, not copies)."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._seq = 0
+        self._targets = {}   # pair -> sorted [(target_rate, seq)]
+        self._alerts = {}    # pair -> {seq: alert}
+        self._watch = {}     # pair -> [alert] awaiting a weekly-high notice
+
+    def rebuild(self, alerts):
+        with self._lock:
+            self._targets = {}
+            self._alerts = {}
+            self._watch = {}
+            for alert in alerts:
+                self._add(alert)
+
+    def add(self, alert):
+        with self._lock:
+            self._add(alert)
+
+    def _add(self, alert):
+        if not is_active(alert):
+            return
+        try:
+            target = float(alert.get("target_rate", 0))
+        except (TypeError, ValueError):
+            return
+        pair = (alert.get("from"), alert.get("to"))
+        self._seq += 1
+        insort(self._targets.setdefault(pair, []), (target, self._seq))
+        self._alerts.setdefault(pair, {})[self._seq] = alert
+        if not alert.get("weekly_high_notified"):
+            self._watch.setdefault(pair, []).append(alert)
+
+    def pairs(self):
+        """Pairs that still have something to evaluate."""
+        with self._lock:
+            return [pair for pair in set(self._targets) | set(self._watch)
+                    if self._targets.get(pair) or self._watch.get(pair)]
+
+    def pop_crossed(self, pair, rate):
+        """Remove and return every alert on pair whose target_rate <= rate."""
+        with self._lock:
+            targets = self._targets.get(pair)
+            if not targets:
+                return []
+            cut = bisect_right(targets, (rate, float("inf")))
+            crossed = targets[:cut]
+            del targets[:cut]
+            alerts = self._alerts[pair]
+            return [alerts.pop(seq) for _, seq in crossed]
+
+    def pop_weekly_high(self, pair):
+        """Remove and return the still-active alerts on pair awaiting a weekly-high notice."""
+        with self._lock:
+            watch = self._watch.pop(pair, [])
+            return [alert for alert in watch if is_active(alert) and not alert.get("weekly_high_notified")]
+
+    def size(self):
+        with self._lock:
+            return sum(len(targets) for targets in self._targets.values())
@@ -0,0 +1,177 @@
+"""
+Running aggregates over the conversion history.
+
+HistoryAggregates is updated in O(1) per appended conversion and persisted to
+history_aggregates.json, so the home page and /history analytics render from
+counters instead of rescanning history (/dashboard uses rollups.py). The saved file records how many
+entries it covers; on startup only the entries after that point are replayed,
+and a full rebuild happens only when the counts no longer line up. With the
+SQLite store the counters are instead merged from rows the database has
+already grouped (merge()), and nothing is persisted here.
+"""
+
+import json
+import os
+import threading
+
+
+AGGREGATES_FILE = os.getenv("HISTORY_AGGREGATES_FILE", "history_aggregates.json")
+# Persist after this many updates; anything newer is replayed from the log on startup
+AGGREGATES_SAVE_EVERY = int(os.getenv("HISTORY_AGGREGATES_SAVE_EVERY", "20"))
+
+
+def _empty():
+    return {
+        "count": 0,
+        "total_amount": 0.0,
+        "pair_counts": {},
+        "mode_counts": {"live": 0, "simulated": 0},
+        "largest_amount": 0,
+        "largest_amount_pair": None,
+        "last_time": None,
+    }
+
+
+class HistoryAggregates:
+    """Counters for history analytics, kept in step with the history log."""
+
+    def __init__(self, path=AGGREGATES_FILE, save_every=AGGREGATES_SAVE_EVERY):
+        self.path = path
+        self.save_every = save_every
+        self._lock = threading.Lock()
+        self._data = _empty()
+        self._unsaved = 0
+
+    def sync(self, entries):
+        """
+        Bring the counters in line with entries: replay the tail when the saved
+        state is a prefix, otherwise rebuild from scratch.
+        """
+        with self._lock:
+            if self._data["count"] == 0 and os.path.exists(self.path):
+                self._data = self._load()
+            count = self._data["count"]
+            if count > len(entries):
+                # History was trimmed or replaced
+                self._data = _empty()
+                count = 0
+            for entry in entries[count:]:
+                self._add(entry)
+            if count != len(entries):
+                self._save()
+
+    def rebuild(self, entries):
+        """Recompute every counter from the full history."""
+        with self._lock:
+            self._data = _empty()
+            for entry in entries:
+                self._add(entry)
+            self._save()
+
+    def add(self, entry):
+        """Fold one new conversion into the counters."""
+        with self._lock:
+            self._add(entry)
+            self._unsaved += 1
+            if self._unsaved >= self.save_every:
+                self._save()
+
+    def catch_up(self, entries):
+        """Fold in entries past the current count (appended here or by another worker)."""
+        with self._lock:
+            new = entries[self._data["count"]:]
+            for entry in new:
+                self._add(entry)
+            self._unsaved += len(new)
+            if self._unsaved >= self.save_every:
+                self._save()
+
+    def merge(self, groups, last_time=None, reset=False):
+        """
+        Fold in rows grouped by pair and mode (SqliteHistoryStore.summarize);
+        reset first when the groups cover the whole history.
+        """
+        with self._lock:
+            if reset:
+                self._data = _empty()
+            data = self._data
+            for from_currency, to_currency, mode, _, rows, valid, amount, largest in groups:
+                data["count"] += rows
+                if not valid:
+                    # Rows without a numeric amount count, but not in the breakdowns
+                    continue
+                pair = f"{from_currency}→{to_currency}"
+                data["total_amount"] += amount
+                data["pair_counts"][pair] = data["pair_counts"].get(pair, 0) + valid
+                data["mode_counts"][mode] = data["mode_counts"].get(mode, 0) + valid
+                if largest > data["largest_amount"]:
+                    data["largest_amount"] = largest
+                    data["largest_amount_pair"] = pair
+            if groups:
+                data["last_time"] = last_time
+
+    def _add(self, entry):
+        data = self._data
+        data["count"] += 1
+        data["last_time"] = entry.get("time")
+        try:
+            amount = float(entry.get("amount", 0))
+            pair = f"{entry.get('from')}→{entry.get('to')}"
+            mode = entry.get("mode", "live")
+        except (ValueError, TypeError, AttributeError):
+            # Malformed entries still count as conversions but not in the breakdowns
+            return
+        data["total_amount"] += amount
+        data["pair_counts"][pair] = data["pair_counts"].get(pair, 0) + 1
+        if amount > data["largest_amount"]:
+            data["largest_amount"] = amount
+            data["largest_amount_pair"] = pair
+        data["mode_counts"][mode] = data["mode_counts"].get(mode, 0) + 1
+
+    def _load(self):
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            if isinstance(data, dict) and set(_empty()) <= set(data):
+                return data
+        except Exception as e:
+            print(f"[WARN] Failed to load {self.path}: {e}")
+        return _empty()
+
+    def _save(self):
+        self._unsaved = 0
+        # Per-process temp name: several workers may save at once
+        tmp_path = f"{self.path}.{os.getpid()}.tmp"
+        try:
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(self._data, f, ensure_ascii=False)
+            os.replace(tmp_path, self.path)
+        except Exception as e:
+            print(f"[WARN] Failed to save {self.path}: {e}")
+
+    def flush(self):
+        with self._lock:
+            if self._unsaved:
+                self._save()
+
+    @property
+    def count(self):
+        return self._data["count"]
+
+    def summary(self):
+        """Same shape as the old compute_history_analytics result, or None when empty."""
+        with self._lock:
+            data = self._data
+            if not data["count"]:
+                return None
+            pair_counts = data["pair_counts"]
+            most_frequent_pair = max(pair_counts.items(), key=lambda kv: kv[1])[0] if pair_counts else None
+            return {
+                "total_conversions": data["count"],
+                "total_amount": round(data["total_amount"], 2),
+                "unique_pairs": len(pair_counts),
+                "most_frequent_pair": most_frequent_pair,
+                "largest_amount": data["largest_amount"],
+                "largest_amount_pair": data["largest_amount_pair"],
+                "last_conversion_time": data["last_time"],
+            }
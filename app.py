@@ -1,43 +1,119 @@
-from dotenv import load_dotenv
-load_dotenv()
+import os
+
+
+def _find_env_file():
+    """The nearest .env in this directory or a parent, like python-dotenv's search."""
+    path = os.path.dirname(os.path.abspath(__file__))
+    while True:
+        candidate = os.path.join(path, ".env")
+        if os.path.isfile(candidate):
+            return candidate
+        parent = os.path.dirname(path)
+        if parent == path:
+            return None
+        path = parent
+
 
+# python-dotenv is only imported when there is a .env file to load
+_env_file = _find_env_file()
+if _env_file:
+    from dotenv import load_dotenv
+    load_dotenv(_env_file)
 
-from flask import Flask, render_template, request
+
+from flask import Flask, Response, g, render_template, request
 from datetime import datetime, timedelta
-import random
-import requests
+from importlib.util import find_spec
+import csv
+import io
 import json
-import os
+import math
 import re
-
-# scheduler for daily jobs
-from apscheduler.schedulers.background import BackgroundScheduler
-
-# Optional Twilio import for SMS functionality
-try:
-    from twilio.rest import Client
-    TWILIO_AVAILABLE = True
-except ImportError:
-    TWILIO_AVAILABLE = False
+import threading
+import time
+
+import metrics
+import providers
+from currencies import CURRENCIES, FALLBACK_RATES
+from rate_cache import rate_cache
+from rate_matrix import RateMatrix, convert_arrays
+from rate_stream import HEARTBEAT_FRAME, RATE_STREAM_HEARTBEAT, STREAM_HEADERS, RateStream, format_event
+from rate_series import rate_series, RATE_STATS_MAX_DAYS
+from historical import historical_rates, parse_day
+from snapshot import SNAPSHOT_DAYS, SNAPSHOT_INTERVAL, offline_snapshot, write_snapshot
+from storage import open_stores
+from analytics import HistoryAggregates
+from rollups import HistoryRollups
+from alert_index import AlertIndex
+from notifications import NotificationStore
+from sms_outbox import SmsOutbox
+from sms_dispatch import DeliveryLedger, dispatch_bulk
+from forecast import forecast_pairs, forecast_series, FORECAST_CONFIDENCE
+from forecast_cache import ForecastCache
+from shared_state import LeaderLock
+from logs import get_logger
+
+# Optional Twilio dependency for SMS functionality (imported on the first send)
+TWILIO_AVAILABLE = find_spec("twilio") is not None
+if not TWILIO_AVAILABLE:
     print("[INFO] Twilio not installed. SMS functionality will be in demo mode.")
 
 app = Flask(__name__)
-
-# Supported currencies
-CURRENCIES = ["USD", "INR", "EUR", "GBP", "JPY"]
-
-# In-memory history (persisted to history.json)
-history = []
-# In-memory alerts (persisted to alerts.json)
+log = get_logger("app")
+
+# All-pairs rate matrix, filled from one full provider table per refresh
+RATE_MATRIX_BASE = "USD"
+rate_matrix = RateMatrix(CURRENCIES)
+
+# Conversion history, alerts and subscribers (JSON files or SQLite, see storage.py)
+history_log, alert_store, subscriber_store = open_stores()
+# Running analytics counters, kept in step with history_log
+history_aggregates = HistoryAggregates()
+# history_log.generation the counters were last built against (None = not yet synced)
+_aggregates_generation = None
+_aggregates_lock = threading.Lock()
+# Hourly/daily/monthly buckets for /dashboard, built on first use
+history_rollups = HistoryRollups()
+_rollups_lock = threading.Lock()
+# The SQLite store groups rows itself (summarize), so its history is never loaded
+# into memory; the counters and rollups track the last row id they folded in
+_history_summarized = hasattr(history_log, "summarize")
+_aggregates_last_id = 0
+_rollups_last_id = 0
+# In-memory alerts (alert_store.items, shared by every worker through the store)
 alerts = []
-# Cache the latest forecast so it can be reused on dedicated pages
-last_forecast = {
-    "labels": [],
-    "values": [],
-    "summary": None
-}
-
-# subscribers list (phone numbers registered for DAILY summaries)
+# Guards alerts/alert_index between requests and the background evaluator
+alerts_lock = threading.RLock()
+# Active alerts grouped by pair and sorted by target rate
+alert_index = AlertIndex()
+# Seconds between background alert evaluations
+ALERT_CHECK_INTERVAL = int(os.getenv("ALERT_CHECK_INTERVAL", "60"))
+# Messages from background jobs (alert checks, queued SMS results) for the UI, shared by every worker
+notification_store = NotificationStore()
+# Precomputed forecasts per pair, refreshed by the scheduler
+forecast_cache = ForecastCache()
+
+# Forecast horizon limits and how much stored history the models are fitted on
+FORECAST_DEFAULT_DAYS = 7
+FORECAST_MAX_DAYS = 365
+FORECAST_LOOKBACK_DAYS = int(os.getenv("FORECAST_LOOKBACK_DAYS", "365"))
+# Steps kept per cached forecast, and how often the scheduler refits every pair
+FORECAST_CACHE_HORIZON = 30
+FORECAST_REFRESH_INTERVAL = int(os.getenv("FORECAST_REFRESH_INTERVAL", "900"))
+
+# History rows per page (/history, /api/history) and on the home page
+HISTORY_PAGE_SIZE = int(os.getenv("HISTORY_PAGE_SIZE", "50"))
+HISTORY_PAGE_MAX = 500
+INDEX_HISTORY_ROWS = 20
+
+# Rate modes a conversion can be recorded with
+RATE_MODES = ("live", "simulated")
+
+# Upper bound on rows accepted by /api/convert/batch, and rows per streamed chunk
+BATCH_MAX_ROWS = int(os.getenv("BATCH_MAX_ROWS", "100000"))
+BATCH_CHUNK_ROWS = 1000
+
+# subscribers list (phone numbers registered for DAILY summaries, subscriber_store.items)
 subscribers = []
 
 # SMS Configuration (using Twilio - you can get free credits)
@@ -45,77 +121,169 @@ TWILIO_ACCOUNT_SID = os.getenv('TWILIO_ACCOUNT_SID', 'your_twilio_sid')
 TWILIO_AUTH_TOKEN = os.getenv('TWILIO_AUTH_TOKEN', 'your_twilio_token')
 TWILIO_PHONE_NUMBER = os.getenv('TWILIO_PHONE_NUMBER', '+1234567890')
 
-# Initialize Twilio client (will work with demo credentials)
-if TWILIO_AVAILABLE:
-    try:
-        sms_client = Client(TWILIO_ACCOUNT_SID, TWILIO_AUTH_TOKEN)
-        SMS_ENABLED = True
-    except:
-        SMS_ENABLED = False
-        print("[WARN] SMS service not configured. Set TWILIO_ACCOUNT_SID and TWILIO_AUTH_TOKEN environment variables.")
-else:
-    SMS_ENABLED = False
-    sms_client = None
+# Twilio client (will work with demo credentials), created on the first send
+SMS_ENABLED = TWILIO_AVAILABLE
+sms_client = None
+_sms_client_lock = threading.Lock()
+
+
+def get_sms_client():
+    global sms_client
+    if sms_client is None:
+        with _sms_client_lock:
+            if sms_client is None:
+                from twilio.rest import Client
+                sms_client = Client(TWILIO_ACCOUNT_SID, TWILIO_AUTH_TOKEN)
+    return sms_client
+
+
+def get_history():
+    """Conversion history in append order (loads the log on first call)."""
+    return history_log.entries()
+
+
+def _summarize_history(last_id, generation, by_hour=False):
+    """
+    SQLite backend: (groups, last_id, last_time, reset) for the rows inserted
+    after last_id. reset means the groups cover the whole table (first call,
+    or rows were trimmed since `generation`) and replace what was folded before.
+    """
+    if generation is None:
+        last_id = 0
+    groups, newest, last_time = history_log.summarize(last_id, by_hour=by_hour)
+    if not last_id:
+        return groups, newest, last_time, True
+    if history_log.generation != generation or newest < last_id:
+        groups, newest, last_time = history_log.summarize(0, by_hour=by_hour)
+        return groups, newest, last_time, True
+    return groups, newest, last_time, False
+
+
+def get_history_aggregates(rebuild=False):
+    """
+    Analytics counters, caught up with the history log, including conversions
+    other workers appended. Rebuilt when the log was compacted or trimmed, or
+    when asked to.
+    """
+    global _aggregates_generation, _aggregates_last_id
+    if _history_summarized:
+        with _aggregates_lock:
+            if rebuild:
+                _aggregates_generation = None
+            groups, _aggregates_last_id, last_time, reset = _summarize_history(
+                _aggregates_last_id, _aggregates_generation)
+            history_aggregates.merge(groups, last_time, reset=reset)
+            _aggregates_generation = history_log.generation
+        return history_aggregates
+    entries = get_history()
+    with _aggregates_lock:
+        if rebuild:
+            history_aggregates.rebuild(entries)
+        elif _aggregates_generation is None:
+            history_aggregates.sync(entries)
+        elif _aggregates_generation != history_log.generation or history_aggregates.count > len(entries):
+            history_aggregates.rebuild(entries)
+        elif history_aggregates.count < len(entries):
+            history_aggregates.catch_up(entries)
+        _aggregates_generation = history_log.generation
+    return history_aggregates
+
+
+def get_history_rollups():
+    """Dashboard rollups, folding in conversions appended since the last call."""
+    global _rollups_last_id
+    if _history_summarized:
+        with _rollups_lock:
+            groups, _rollups_last_id, _, reset = _summarize_history(
+                _rollups_last_id, history_rollups.generation, by_hour=True)
+            history_rollups.merge(groups, reset=reset, generation=history_log.generation)
+        return history_rollups
+    entries = get_history()
+    with _rollups_lock:
+        if history_rollups.generation != history_log.generation or history_rollups.count > len(entries):
+            history_rollups.rebuild(entries, generation=history_log.generation)
+        elif history_rollups.count < len(entries):
+            history_rollups.catch_up(entries)
+    return history_rollups
 
 
 def load_history():
-    global history
-    try:
-        if os.path.exists("history.json"):
-            with open("history.json", "r", encoding="utf-8") as f:
-                data = json.load(f)
-                if isinstance(data, list):
-                    history = data
-    except Exception as e:
-        print(f"[WARN] Failed to load history.json: {e}")
+    get_history_aggregates()
 
 
-def save_history():
-    try:
-        with open("history.json", "w", encoding="utf-8") as f:
-            json.dump(history, f, ensure_ascii=False, indent=2)
-    except Exception as e:
-        print(f"[WARN] Failed to save history.json: {e}")
+def append_history_many(entries):
+    """Persist several conversions with one write and fold them into the counters."""
+    history_log.append_many(entries)
+    get_history_aggregates()
+
+
+def append_history(entry):
+    """Persist one conversion with a single O(1) append and update the counters."""
+    history_log.append(entry)
+    get_history_aggregates()
 
 
 def load_alerts():
+    """(Re)load alerts from storage, e.g. after another worker changed them."""
     global alerts
     try:
-        if os.path.exists("alerts.json"):
-            with open("alerts.json", "r", encoding="utf-8") as f:
-                data = json.load(f)
-                if isinstance(data, list):
-                    alerts = data
+        data = alert_store.load()
+        with alerts_lock:
+            alerts = data
+            alert_index.rebuild(alerts)
     except Exception as e:
-        print(f"[WARN] Failed to load alerts.json: {e}")
+        print(f"[WARN] Failed to load alerts: {e}")
 
 
-def save_alerts():
+def refresh_alerts():
+    """Pick up alert changes made by other workers."""
+    if alert_store.changed():
+        load_alerts()
+
+
+def save_alerts(changed):
+    """Persist alerts that were updated in place (triggered or notified)."""
     try:
-        with open("alerts.json", "w", encoding="utf-8") as f:
-            json.dump(alerts, f, ensure_ascii=False, indent=2)
+        with alerts_lock:
+            alert_store.update(changed)
     except Exception as e:
-        print(f"[WARN] Failed to save alerts.json: {e}")
+        print(f"[WARN] Failed to save alerts: {e}")
+
+
+def add_alert(alert_data):
+    """Add an alert under the store lock, after picking up other workers' alerts."""
+    with alerts_lock, alert_store.locked():
+        refresh_alerts()
+        # Also appends to alerts (the store's items)
+        alert_store.add(alert_data)
+        alert_index.add(alert_data)
 
 # --- Subscribers persistence (new) ---
 def load_subscribers():
     global subscribers
     try:
-        if os.path.exists("subscribers.json"):
-            with open("subscribers.json", "r", encoding="utf-8") as f:
-                data = json.load(f)
-                if isinstance(data, list):
-                    subscribers = data
+        subscribers = subscriber_store.load()
     except Exception as e:
-        print(f"[WARN] Failed to load subscribers.json: {e}")
+        print(f"[WARN] Failed to load subscribers: {e}")
 
 
-def save_subscribers():
-    try:
-        with open("subscribers.json", "w", encoding="utf-8") as f:
-            json.dump(subscribers, f, ensure_ascii=False, indent=2)
-    except Exception as e:
-        print(f"[WARN] Failed to save subscribers.json: {e}")
+def refresh_subscribers():
+    """Pick up subscribers registered through other workers."""
+    if subscriber_store.changed():
+        load_subscribers()
+
+
+def add_subscriber(phone):
+    """Register phone for the daily summary. Returns False when it is already subscribed."""
+    with subscriber_store.locked():
+        refresh_subscribers()
+        # Duplicate check is a set lookup (JSON) or the unique phone index (SQLite)
+        return subscriber_store.add({
+            "phone": phone,
+            "created_at": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+            # placeholder for future preferences (preferred currencies etc.)
+            "prefs": {"pairs": []}
+        })
 
 
 def validate_phone_number(phone):
@@ -128,169 +296,463 @@ def validate_phone_number(phone):
     return None
 
 
+def queue_sms_notification(phone_number, message, sent_note=None, failed_note=None):
+    """
+    Queue an SMS for the background outbox instead of sending it inline.
+    The optional notes are posted to the notification store once the outcome is known.
+    """
+    def report(ok):
+        note = sent_note if ok else failed_note
+        if note:
+            notification_store.push(note, level="info" if ok else "warning")
+    sms_outbox.enqueue(phone_number, message, on_result=report)
+
+
 def send_sms_notification(phone_number, message):
-    """Send SMS notification using Twilio"""
+    """Send SMS notification using Twilio, recording latency and outcome in sms_send_duration_seconds"""
+    started = time.perf_counter()
+    ok, outcome = deliver_sms(phone_number, message)
+    metrics.SMS_SEND_SECONDS.labels(outcome).observe(time.perf_counter() - started)
+    return ok
+
+
+def deliver_sms(phone_number, message):
+    """Returns (ok, outcome) where outcome is "sent", "demo" or "failed"."""
     if not SMS_ENABLED:
-        print(f"[DEMO] SMS would be sent to {phone_number}: {message}")
-        return True
+        log.info("SMS would be sent (demo mode)", to=phone_number, message=message)
+        return True, "demo"
     
     if not TWILIO_AVAILABLE:
-        print(f"[DEMO] Twilio not available - SMS would be sent to {phone_number}: {message}")
-        return True
+        log.info("SMS would be sent (Twilio not available)", to=phone_number, message=message)
+        return True, "demo"
     
     try:
-        message_obj = sms_client.messages.create(
+        message_obj = get_sms_client().messages.create(
             body=message,
             from_=TWILIO_PHONE_NUMBER,
             to=phone_number
         )
-        print(f"[SMS] Sent to {phone_number}: {message_obj.sid}")
-        return True
+        log.info("SMS sent", to=phone_number, sid=message_obj.sid)
+        return True, "sent"
     except Exception as e:
-        print(f"[SMS ERROR] Failed to send to {phone_number}: {e}")
+        log.error("SMS send failed", to=phone_number, error=str(e))
         # Return True in demo mode to avoid blocking the app
         if "demo" in str(e).lower() or "trial" in str(e).lower():
-            print(f"[DEMO] SMS simulation for {phone_number}: {message}")
-            return True
-        return False
+            log.info("SMS simulated (demo/trial account)", to=phone_number, message=message)
+            return True, "demo"
+        return False, "failed"
+
+
+# Outbound SMS queue drained by a background worker
+sms_outbox = SmsOutbox(lambda phone_number, message: send_sms_notification(phone_number, message))
+# Per-message delivery record for bulk sends (daily summaries)
+sms_ledger = DeliveryLedger()
 
 
 def get_weekly_high_rate(from_currency, to_currency):
     """Get the highest rate for this currency pair in the past 7 days"""
-    try:
-        # Get rates for the past 7 days
-        rates = []
-        for i in range(7):
-            date = (datetime.now() - timedelta(days=i)).strftime("%Y-%m-%d")
-            try:
-                # Try to get historical rate (simplified - in real app, use historical API)
-                rate = get_exchange_rate(from_currency, to_currency, mode="live")
-                rates.append(rate)
-            except:
-                continue
-        
-        if rates:
-            return max(rates)
-        else:
-            # Fallback to current rate
-            return get_exchange_rate(from_currency, to_currency, mode="live")
-    except:
-        return get_exchange_rate(from_currency, to_currency, mode="live")
+    stats = rate_series.window_stats(from_currency, to_currency, days=7)
+    if stats:
+        return stats["high"]
+    # No observations this week yet - use the backfilled daily rates, then the current rate
+    high = historical_rates.window_high(from_currency, to_currency, days=7)
+    if high is not None:
+        return high
+    return get_exchange_rate(from_currency, to_currency, mode="live")
+
+# Fallback rates as a matrix, for vectorized conversions without a live table
+fallback_matrix = RateMatrix(CURRENCIES)
+fallback_matrix.load_nested(FALLBACK_RATES)
+
+
+def offline_rate(from_currency, to_currency):
+    """Rate without the network: the last saved rate snapshot, else FALLBACK_RATES."""
+    rate = offline_snapshot.rate(from_currency, to_currency)
+    if rate is not None:
+        return rate
+    return FALLBACK_RATES.get(from_currency, {}).get(to_currency, 1.0)
+
 
-# Fallback exchange rates (approximate, as of 2025)
-FALLBACK_RATES = {
-    "USD": {"INR": 88, "EUR": 0.92, "GBP": 0.79, "JPY": 146},
-    "INR": {"USD": 0.011, "EUR": 0.010, "GBP": 0.0090, "JPY": 1.65},
-    "EUR": {"USD": 1.09, "INR": 96, "GBP": 0.86, "JPY": 159},
-    "GBP": {"USD": 1.27, "INR": 112, "EUR": 1.16, "JPY": 185},
-    "JPY": {"USD": 0.0068, "INR": 0.61, "EUR": 0.0063, "GBP": 0.0054},
-}
+def offline_matrix():
+    """(matrix, source) without the network: the rate snapshot over FALLBACK_RATES, or FALLBACK_RATES alone."""
+    matrix = offline_snapshot.matrix(CURRENCIES, fill=fallback_matrix.matrix)
+    if matrix is None:
+        return fallback_matrix.snapshot(), "fallback"
+    return matrix, "snapshot"
 
 
-def get_exchange_rate(from_currency, to_currency, mode="live"):
+def get_exchange_rate(from_currency, to_currency, mode="live", as_of=None):
     """
     Get real-time exchange rate using multiple reliable APIs for today's accurate rates.
-    Falls back to static rates if all APIs fail.
+    Live rates are served from the shared TTL cache; falls back to static rates if all APIs fail.
+    With a past as_of date the rate comes from the historical store, raising
+    LookupError when it has none for that date; a future as_of raises ValueError.
     """
+    if as_of is not None and as_of > datetime.now().date():
+        raise ValueError(f"No rate for {as_of.isoformat()}: the date is in the future")
+
     # If both currencies are same → rate is 1
     if from_currency == to_currency:
         return 1.0
 
-    # If explicitly in simulated mode, skip API and use fallback
+    if as_of is not None and as_of < datetime.now().date():
+        rate = historical_rates.rate(from_currency, to_currency, as_of)
+        if rate is None:
+            raise LookupError(f"No stored {from_currency}→{to_currency} rate on or before {as_of.isoformat()}")
+        return rate
+
+    # If explicitly in simulated mode, skip API and use the offline rates
     if mode == "simulated":
-        return FALLBACK_RATES.get(from_currency, {}).get(to_currency, 1.0)
-
-    # Try multiple reliable APIs for today's accurate rates
-    apis = [
-        {
-            "name": "exchangerate-api",
-            "url": f"https://api.exchangerate-api.com/v4/latest/{from_currency}",
-            "extract": lambda r: r.get("rates", {}).get(to_currency),
-            "headers": {"User-Agent": "CurrencyConverter/1.0"}
-        },
-        {
-            "name": "currencylayer",
-            "url": f"https://api.currencylayer.com/live?access_key=free&currencies={to_currency}&source={from_currency}&format=1",
-            "extract": lambda r: r.get("quotes", {}).get(f"{from_currency}{to_currency}")
-        },
-        {
-            "name": "exchangerate.host",
-            "url": f"https://api.exchangerate.host/latest?base={from_currency}&symbols={to_currency}",
-            "extract": lambda r: r.get("rates", {}).get(to_currency),
-            "headers": {"User-Agent": "CurrencyConverter/1.0"}
-        },
-        {
-            "name": "fixer.io",
-            "url": f"https://api.fixer.io/latest?base={from_currency}&symbols={to_currency}",
-            "extract": lambda r: r.get("rates", {}).get(to_currency)
-        }
-    ]
+        return offline_rate(from_currency, to_currency)
+
+    # Pairs inside CURRENCIES are answered from the shared rate matrix
+    rate = get_matrix_rate(from_currency, to_currency)
+    if rate is not None:
+        return rate
+
+    try:
+        rate = rate_cache.get(
+            (from_currency, to_currency),
+            lambda: fetch_live_rate(from_currency, to_currency)
+        )
+    except Exception as e:
+        log.warning("Rate cache lookup failed", error=str(e))
+        rate = None
+    if rate is not None:
+        return rate
+
+    log.warning("All live APIs failed, using offline rates", pair=f"{from_currency}→{to_currency}")
+    return offline_rate(from_currency, to_currency)
+
+
+def fetch_rate_table(base=RATE_MATRIX_BASE):
+    """
+    Fetch the full rate table for one base currency ({quote: rate}).
+    Returns None if every table provider fails.
+    """
+    return providers.fetch_first(providers.table_providers(base), valid=providers.valid_table)
+
+
+def refresh_rate_matrix():
+    """Reload the rate matrix when the cached base table has changed."""
+    try:
+        table = rate_cache.get((RATE_MATRIX_BASE, "*"), fetch_rate_table)
+    except Exception as e:
+        log.warning("Rate table lookup failed", error=str(e))
+        return False
+    return apply_rate_table(table)
+
+
+def apply_rate_table(table):
+    """Load a fetched base table into the rate matrix unless it is already loaded."""
+    if table is None:
+        return False
+    if rate_matrix.source is not table:
+        rate_matrix.load_table(RATE_MATRIX_BASE, table)
+        # Every refresh is an observation for every pair in the matrix
+        rate_series.record_many([
+            (f, t, rate_matrix.rate(f, t))
+            for f in CURRENCIES for t in CURRENCIES if f != t
+        ])
+    return True
+
+
+def rate_snapshot(mode="live"):
+    """
+    One consistent rate matrix for batch work: the live matrix, or the
+    offline rates in simulated mode or when no live table is available.
+    Returns (matrix copy, source) where source is "live", "snapshot" or "fallback".
+    """
+    if mode != "simulated" and refresh_rate_matrix():
+        return rate_matrix.snapshot(), "live"
+    return offline_matrix()
+
 
-    for api in apis:
+def get_matrix_rate(from_currency, to_currency):
+    """Look up a pair in the rate matrix, or None if it can't be answered there."""
+    if from_currency not in rate_matrix.index or to_currency not in rate_matrix.index:
+        return None
+    if not refresh_rate_matrix():
+        return None
+    return rate_matrix.rate(from_currency, to_currency)
+
+
+def fetch_live_rate(from_currency, to_currency):
+    """
+    Fetch today's rate straight from the providers, bypassing the cache.
+    Providers are raced/hedged according to RATE_FETCH_MODE.
+    Returns None if every provider fails.
+    """
+    rate = providers.fetch_first(providers.pair_providers(from_currency, to_currency))
+    return accept_live_rate(from_currency, to_currency, rate)
+
+
+def accept_live_rate(from_currency, to_currency, rate):
+    """Record a freshly fetched pair rate; returns it as a float, or None if there was none."""
+    if rate is None:
+        return None
+    log.info("Today's rate", pair=f"{from_currency}→{to_currency}", rate=f"{rate:.6f}")
+    rate_series.record(from_currency, to_currency, float(rate))
+    return float(rate)
+
+
+def stream_rates(pairs):
+    """Live matrix rates for the streamed pairs, or None when no live table is available."""
+    if not refresh_rate_matrix():
+        return None
+    rates = {}
+    for f, t in pairs:
+        rate = rate_matrix.rate(f, t)
+        # A currency missing from the current table: skip the pair, keep polling the others
+        if rate is not None:
+            # Rounded like /api/rate, so float noise in the cross rates isn't pushed as a change
+            rates[(f, t)] = round(rate, 6)
+    return rates
+
+
+# Live rates pushed to /api/stream/rates clients (one poller per process)
+rate_stream = RateStream(stream_rates)
+
+
+def take_background_notifications():
+    """Background notification messages not yet shown on the home page (by any worker)."""
+    return [item["message"] for item in notification_store.take_unshown()]
+
+
+def evaluate_alerts():
+    """
+    Check every active alert against current rates and queue SMS notifications.
+    One rate and one weekly high per pair; crossed targets come from the alert index.
+    Returns the number of SMS queued.
+    """
+    queued = 0
+    refresh_alerts()
+    # Rates are fetched before taking the file lock so other workers can keep adding alerts
+    quotes = {}
+    for f, t in alert_index.pairs():
         try:
-            print(f"[INFO] Fetching today's rate from {api['name']}...")
-            headers = api.get("headers", {})
-            response = requests.get(api["url"], timeout=15, headers=headers)
-            response.raise_for_status()
-            data = response.json()
-            
-            # Check if API response is valid
-            if "error" in data:
-                print(f"[WARN] API error from {api['name']}: {data.get('error', {}).get('info', 'Unknown error')}")
-                continue
-                
-            rate = api["extract"](data)
-            if rate and rate > 0:
-                print(f"[SUCCESS] Today's rate from {api['name']}: {rate:.6f}")
-                return float(rate)
-            else:
-                print(f"[WARN] Invalid rate from {api['name']}: {rate}")
-                
-        except requests.exceptions.Timeout:
-            print(f"[WARN] {api['name']} timeout - trying next API")
-            continue
-        except requests.exceptions.RequestException as e:
-            print(f"[WARN] {api['name']} request failed: {e}")
-            continue
+            quotes[(f, t)] = (get_exchange_rate(f, t, mode="live"), get_weekly_high_rate(f, t))
         except Exception as e:
-            print(f"[WARN] {api['name']} failed: {e}")
-            continue
+            log.warning("Failed checking alerts", pair=f"{f}→{t}", error=str(e))
+
+    now = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    outcomes = []
+    with alerts_lock, alert_store.locked():
+        refresh_alerts()
+        changed = []
+        for (f, t), (current, weekly_high) in quotes.items():
+            # Check if target rate is reached
+            triggered = alert_index.pop_crossed((f, t), current)
+            for alert in triggered:
+                alert["triggered_at"] = now
+                alert["sms_sent"] = True
+            # Check if current rate is weekly high (even if target not reached)
+            at_weekly_high = alert_index.pop_weekly_high((f, t)) if current >= weekly_high else []
+            for alert in at_weekly_high:
+                alert["weekly_high_notified"] = True
+            changed.extend(triggered + at_weekly_high)
+            outcomes.append((f, t, current, weekly_high, triggered, at_weekly_high))
+        if changed:
+            save_alerts(changed)
+
+    for f, t, current, weekly_high, triggered, at_weekly_high in outcomes:
+        for alert in triggered:
+            target = float(alert.get("target_rate", 0))
+            sms_message = f"🚨 CURRENCY ALERT! 🚨\n\n{f}→{t} Rate Alert Triggered!\n\nTarget Rate: {target}\nCurrent Rate: {current:.6f}\nWeekly High: {weekly_high:.6f}\n\nTime: {now}\n\nThis is the highest rate this week! 💰"
+            queue_sms_notification(
+                alert.get("phone_number"), sms_message,
+                sent_note=f"📱 SMS sent: {f}→{t} rate {current:.6f} reached target {target}",
+                failed_note=f"⚠️ SMS failed: {f}→{t} rate {current:.6f} reached target {target}"
+            )
+            queued += 1
+
+        for alert in at_weekly_high:
+            target = float(alert.get("target_rate", 0))
+            weekly_high_message = f"📈 WEEKLY HIGH ALERT! 📈\n\n{f}→{t} reached weekly high!\n\nCurrent Rate: {current:.6f}\nWeekly High: {weekly_high:.6f}\nTarget: {target}\n\nThis is the best rate this week! 🎯"
+            queue_sms_notification(
+                alert.get("phone_number"), weekly_high_message,
+                sent_note=f"📱 Weekly high SMS sent: {f}→{t} rate {current:.6f} is weekly high",
+                failed_note=f"⚠️ Weekly high SMS failed: {f}→{t} rate {current:.6f} is weekly high"
+            )
+            queued += 1
+
+    return queued
+
+
+def evaluate_alerts_job():
+    """Scheduled job: evaluate alerts off the request path"""
+    try:
+        with metrics.ALERT_EVALUATION_SECONDS.labels().time():
+            evaluate_alerts()
+    except Exception as e:
+        print(f"[WARN] Failed checking alerts: {e}")
+
+
+def pair_closes(from_currency, to_currency, current_rate):
+    """Stored daily closes for the pair, with current_rate standing in for today."""
+    today = datetime.now().date()
+    cutoff = today.toordinal() - FORECAST_LOOKBACK_DAYS + 1
+    # The rate snapshot fills in days this install's series doesn't have
+    by_day = {day: close for day, close in offline_snapshot.daily_closes(from_currency, to_currency)
+              if day.toordinal() >= cutoff}
+    by_day.update(rate_series.daily_closes(from_currency, to_currency, days=FORECAST_LOOKBACK_DAYS))
+    closes = [close for day, close in sorted(by_day.items()) if day != today]
+    closes.append(current_rate)
+    return closes
+
+
+def refresh_forecasts():
+    """Fit every pair in CURRENCIES in one vectorized pass and publish a new cache version."""
+    histories = {}
+    base_rates = {}
+    for f in CURRENCIES:
+        for t in CURRENCIES:
+            if f == t:
+                continue
+            rate = get_exchange_rate(f, t, mode="live")
+            histories[(f, t)] = pair_closes(f, t, rate)
+            base_rates[(f, t)] = rate
+    results = forecast_pairs(histories, horizon=FORECAST_CACHE_HORIZON)
+    return forecast_cache.replace_all(results, base_rates, FORECAST_CACHE_HORIZON)
 
-    print("[WARN] All live APIs failed, using fallback rates")
-    # Fallback lookup with safety
-    return FALLBACK_RATES.get(from_currency, {}).get(to_currency, 1.0)
+
+def save_rate_snapshot():
+    """
+    Write the live rate matrix and every pair's stored daily closes to the
+    snapshot file. Returns False, leaving the last snapshot alone, when no live table is available.
+    """
+    if not refresh_rate_matrix():
+        return False
+    closes = {(f, t): rate_series.daily_closes(f, t, days=SNAPSHOT_DAYS)
+              for f in CURRENCIES for t in CURRENCIES if f != t}
+    write_snapshot(offline_snapshot.path, CURRENCIES, rate_matrix.snapshot(), closes,
+                   matrix_updated_at=rate_matrix.updated_at, days=SNAPSHOT_DAYS)
+    offline_snapshot.load()
+    return True
+
+
+def save_rate_snapshot_job():
+    """Scheduled job: persist the rate snapshot"""
+    try:
+        if save_rate_snapshot():
+            print(f"[INFO] Rate snapshot saved to {offline_snapshot.path}.")
+        else:
+            print("[WARN] No live rates; rate snapshot not updated.")
+    except Exception as e:
+        print(f"[WARN] Rate snapshot save failed: {e}")
+
+
+def backfill_history_job():
+    """Scheduled job: extend the historical rates to today"""
+    try:
+        stored = historical_rates.backfill()
+        print(f"[INFO] Historical rates backfilled ({stored} days).")
+    except Exception as e:
+        print(f"[WARN] Historical backfill failed: {e}")
+
+
+def refresh_forecasts_job():
+    """Scheduled job: recompute the forecast cache"""
+    try:
+        version = refresh_forecasts()
+        print(f"[INFO] Forecast cache refreshed (version {version}).")
+    except Exception as e:
+        print(f"[WARN] Forecast refresh failed: {e}")
+
+
+def forecast_rates(from_currency, to_currency, current_rate, days):
+    """
+    Forecast the from→to rate over `days` days. Served from the forecast cache
+    and rescaled to current_rate; pairs missing from the cache (or horizons longer
+    than it holds) are fitted on demand. Returns point/lower/upper lists.
+    """
+    if from_currency == to_currency:
+        flat = [1.0] * days
+        return {"point": flat, "lower": flat, "upper": flat, "volatility": 0.0, "version": forecast_cache.version}
+    pair = (from_currency, to_currency)
+    cached = forecast_cache.get(pair, days)
+    if cached is None:
+        horizon = max(days, FORECAST_CACHE_HORIZON)
+        result = forecast_series(pair_closes(from_currency, to_currency, current_rate), horizon=horizon)
+        forecast_cache.put(pair, result, current_rate, horizon)
+        cached = forecast_cache.get(pair, days)
+    scale = current_rate / cached["base_rate"] if cached["base_rate"] else 1.0
+    return {
+        "point": [r * scale for r in cached["point"]],
+        "lower": [r * scale for r in cached["lower"]],
+        "upper": [r * scale for r in cached["upper"]],
+        "volatility": cached["volatility"],
+        "version": cached["version"],
+    }
+
+
+def build_forecast_view(from_currency, to_currency, amount, days=FORECAST_DEFAULT_DAYS, mode="live"):
+    """
+    Chart series and summary for forecasting `amount` of from→to over `days` days.
+    Raises ValueError for currencies outside CURRENCIES and for an amount that
+    is not a finite number greater than 0.
+    """
+    for code in (from_currency, to_currency):
+        if code not in CURRENCIES:
+            raise ValueError(f"Unsupported currency {code!r}; expected one of {', '.join(CURRENCIES)}")
+    # Same rule as the batch converter: nan/inf would reach the model and make the JSON invalid
+    if not (math.isfinite(amount) and amount > 0):
+        raise ValueError("Amount must be a finite number greater than 0.")
+    days = max(1, min(days, FORECAST_MAX_DAYS))
+    # Base conversion
+    rate = get_exchange_rate(from_currency, to_currency, mode=mode)
+    base_value = round(amount * rate, 2)
+    labels = [(datetime.now() + timedelta(days=i)).strftime("%Y-%m-%d") for i in range(1, days + 1)]
+
+    # Model-based forecast of the rate, scaled by the amount
+    rate_forecast = forecast_rates(from_currency, to_currency, rate, days)
+    values = [round(amount * r, 2) for r in rate_forecast["point"]]
+    lower = [round(amount * r, 2) for r in rate_forecast["lower"]]
+    upper = [round(amount * r, 2) for r in rate_forecast["upper"]]
+
+    # Analytics: rise/fall and amount/percentage change from day 0 to the last day
+    final_value = values[-1] if values else base_value
+    change_abs = round(final_value - base_value, 2)
+    change_pct = round((change_abs / base_value) * 100, 2) if base_value != 0 else 0.0
+    direction = "Rise" if change_abs > 0 else ("Fall" if change_abs < 0 else "No Change")
+    # Advice logic based on magnitude of change
+    threshold_pct = 1.0  # percent
+    if direction == "Rise" and abs(change_pct) >= threshold_pct:
+        advice = "Convert now"
+    elif direction == "Fall" and abs(change_pct) >= threshold_pct:
+        advice = "Wait"
+    else:
+        advice = "Watch"
+
+    return {
+        "labels": labels,
+        "values": values,
+        "lower": lower,
+        "upper": upper,
+        "summary": {
+            "from": from_currency,
+            "to": to_currency,
+            "amount": amount,
+            "direction": direction,
+            "change_abs": abs(change_abs),
+            "change_pct": abs(change_pct),
+            "base_value": base_value,
+            "final_value": final_value,
+            "days": days,
+            "advice": advice,
+            "final_low": lower[-1],
+            "final_high": upper[-1],
+            "confidence": int(FORECAST_CONFIDENCE * 100),
+            "volatility": round(rate_forecast["volatility"] * 100, 4),
+            "version": rate_forecast["version"],
+        },
+    }
 
 
 def compute_history_analytics():
     """Build aggregated analytics for history tables."""
-    if not history:
-        return None
     try:
-        total_conversions = len(history)
-        total_amount = round(sum(item.get("amount", 0) for item in history), 2)
-        pair_counts = {}
-        largest_amount = 0
-        largest_amount_pair = None
-        last_time = history[-1].get("time")
-        for item in history:
-            pair = f"{item.get('from')}→{item.get('to')}"
-            pair_counts[pair] = pair_counts.get(pair, 0) + 1
-            amt = float(item.get("amount", 0))
-            if amt > largest_amount:
-                largest_amount = amt
-                largest_amount_pair = pair
-        most_frequent_pair = None
-        if pair_counts:
-            most_frequent_pair = max(pair_counts.items(), key=lambda kv: kv[1])[0]
-        return {
-            "total_conversions": total_conversions,
-            "total_amount": total_amount,
-            "unique_pairs": len(pair_counts),
-            "most_frequent_pair": most_frequent_pair,
-            "largest_amount": largest_amount,
-            "largest_amount_pair": largest_amount_pair,
-            "last_conversion_time": last_time,
-        }
+        return get_history_aggregates().summary()
     except Exception as e:
         print(f"[WARN] Failed to compute analytics: {e}")
         return None
@@ -298,10 +760,14 @@ def compute_history_analytics():
 
 @app.route("/", methods=["GET", "POST"])
 def index():
-    global history, alerts, last_forecast
+    refresh_alerts()
+    # Only the newest conversions; the full log is paged through /history
+    history, _ = history_log.page(limit=INDEX_HISTORY_ROWS)
     result = None
     chart_labels = []
     chart_values = []
+    chart_lower = []
+    chart_upper = []
     forecast_summary = None
     selected_mode = "live"
     analytics = None
@@ -360,7 +826,7 @@ def index():
                 max_result = round(result * (1 + cost_variance), 2)
                 
                 # Store history with enhanced data
-                history.append({
+                append_history({
                     "from": from_currency,
                     "to": to_currency,
                     "amount": amount,
@@ -374,7 +840,6 @@ def index():
                     },
                     "time": datetime.now().strftime("%Y-%m-%d %H:%M:%S")
                 })
-                save_history()
                 
                 # Add success notification
                 notifications.append(f"Successfully converted {amount} {from_currency} to {result} {to_currency} at rate {rate:.6f}")
@@ -411,56 +876,21 @@ def index():
                     alerts=alerts,
                     notifications=notifications
                 )
-            amount = float(amount_value)
-            # Base conversion
-            rate = get_exchange_rate(from_currency, to_currency, mode=selected_mode)
-            base_value = round(amount * rate, 2)
-
-            # Generate 7-day simulated forecast with slight trend and random noise
-            days = 7
-            chart_labels = [(datetime.now() + timedelta(days=i)).strftime("%Y-%m-%d") for i in range(1, days + 1)]
-
-            # Simulate a mild trend: -1% to +1% over the period, plus daily noise
-            overall_trend = random.uniform(-0.01, 0.01)
-            daily_values = []
-            for i in range(1, days + 1):
-                progress = i / days
-                trend_component = overall_trend * progress
-                noise_component = random.uniform(-0.0075, 0.0075)
-                multiplier = 1 + trend_component + noise_component
-                daily_values.append(round(base_value * multiplier, 2))
-
-            chart_values = daily_values
-
-            # Analytics: rise/fall and amount/percentage change from day 0 to day 7
-            final_value = chart_values[-1] if chart_values else base_value
-            change_abs = round(final_value - base_value, 2)
-            change_pct = round((change_abs / base_value) * 100, 2) if base_value != 0 else 0.0
-            direction = "Rise" if change_abs > 0 else ("Fall" if change_abs < 0 else "No Change")
-            # Advice logic based on magnitude of change
-            threshold_pct = 1.0  # percent
-            if direction == "Rise" and abs(change_pct) >= threshold_pct:
-                advice = "Convert now"
-            elif direction == "Fall" and abs(change_pct) >= threshold_pct:
-                advice = "Wait"
-            else:
-                advice = "Watch"
-
-            forecast_summary = {
-                "direction": direction,
-                "change_abs": abs(change_abs),
-                "change_pct": abs(change_pct),
-                "base_value": base_value,
-                "final_value": final_value,
-                "days": days,
-                "advice": advice,
-            }
-
-            last_forecast = {
-                "labels": chart_labels,
-                "values": chart_values,
-                "summary": forecast_summary
-            }
+            # Forecast horizon in days (defaults to a week)
+            try:
+                days = int(request.form.get("days") or FORECAST_DEFAULT_DAYS)
+            except ValueError:
+                days = FORECAST_DEFAULT_DAYS
+            try:
+                view = build_forecast_view(from_currency, to_currency, _parse_amount(amount_value), days,
+                                           mode=selected_mode)
+                chart_labels = view["labels"]
+                chart_values = view["values"]
+                chart_lower = view["lower"]
+                chart_upper = view["upper"]
+                forecast_summary = view["summary"]
+            except ValueError as e:
+                notifications.append(str(e))
         elif "add_alert" in request.form:
             # Create a new SMS rate alert for a pair
             try:
@@ -502,66 +932,24 @@ def index():
                     "sms_sent": False
                 }
                 
-                alerts.append(alert_data)
-                save_alerts()
+                add_alert(alert_data)
                 
                 # Send confirmation SMS
                 confirmation_message = f"📱 Currency Alert Registered!\n{from_currency}→{to_currency}\nTarget: {target_rate}\nCurrent: {current_rate:.6f}\nWeekly High: {weekly_high:.6f}\n\nYou'll be notified when the rate reaches your target!"
-                send_sms_notification(validated_phone, confirmation_message)
+                queue_sms_notification(
+                    validated_phone, confirmation_message,
+                    failed_note=f"⚠️ Confirmation SMS to {validated_phone} failed"
+                )
                 
-                notifications.append(f"📱 SMS Alert registered for {from_currency}→{to_currency} at rate {target_rate}. Confirmation sent to {validated_phone}")
+                notifications.append(f"📱 SMS Alert registered for {from_currency}→{to_currency} at rate {target_rate}. Confirmation queued for {validated_phone}")
                 
             except ValueError:
                 notifications.append("Invalid target rate. Please enter a valid number.")
             except Exception as e:
                 notifications.append(f"Failed to create alert: {str(e)}")
 
-    # Check alerts against current live rates and send SMS notifications
-    if alerts:
-        try:
-            for alert in alerts:
-                if alert.get("triggered_at") or alert.get("sms_sent"):
-                    continue
-                    
-                f = alert.get("from")
-                t = alert.get("to")
-                target = float(alert.get("target_rate", 0))
-                phone = alert.get("phone_number")
-                
-                if not phone:
-                    continue
-                
-                current = get_exchange_rate(f, t, mode="live")
-                weekly_high = get_weekly_high_rate(f, t)
-                
-                # Check if target rate is reached
-                if current >= target:
-                    alert["triggered_at"] = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-                    alert["sms_sent"] = True
-                    
-                    # Send SMS notification
-                    sms_message = f"🚨 CURRENCY ALERT! 🚨\n\n{f}→{t} Rate Alert Triggered!\n\nTarget Rate: {target}\nCurrent Rate: {current:.6f}\nWeekly High: {weekly_high:.6f}\n\nTime: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}\n\nThis is the highest rate this week! 💰"
-                    
-                    if send_sms_notification(phone, sms_message):
-                        notifications.append(f"📱 SMS sent: {f}→{t} rate {current:.6f} reached target {target}")
-                    else:
-                        notifications.append(f"⚠️ SMS failed: {f}→{t} rate {current:.6f} reached target {target}")
-                
-                # Check if current rate is weekly high (even if target not reached)
-                elif current >= weekly_high and not alert.get("weekly_high_notified"):
-                    alert["weekly_high_notified"] = True
-                    
-                    # Send weekly high notification
-                    weekly_high_message = f"📈 WEEKLY HIGH ALERT! 📈\n\n{f}→{t} reached weekly high!\n\nCurrent Rate: {current:.6f}\nWeekly High: {weekly_high:.6f}\nTarget: {target}\n\nThis is the best rate this week! 🎯"
-                    
-                    if send_sms_notification(phone, weekly_high_message):
-                        notifications.append(f"📱 Weekly high SMS sent: {f}→{t} rate {current:.6f} is weekly high")
-                    else:
-                        notifications.append(f"⚠️ Weekly high SMS failed: {f}→{t} rate {current:.6f} is weekly high")
-                        
-            save_alerts()
-        except Exception as e:
-            print(f"[WARN] Failed checking alerts: {e}")
+    # Alerts are evaluated by the background scheduler; show what it reported
+    notifications.extend(take_background_notifications())
 
     # Build analytics from history
     analytics = compute_history_analytics()
@@ -574,6 +962,8 @@ def index():
         mode=selected_mode,
         chart_labels=chart_labels,
         chart_values=chart_values,
+        chart_lower=chart_lower,
+        chart_upper=chart_upper,
         forecast_summary=forecast_summary,
         analytics=analytics,
         alerts=alerts,
@@ -581,18 +971,41 @@ def index():
     )
 
 
+def rate_date_arg(args):
+    """?date=YYYY-MM-DD as a date (None when absent). Raises ValueError on a malformed or future date."""
+    value = (args.get("date") or "").strip()
+    if not value:
+        return None
+    try:
+        as_of = parse_day(value)
+    except ValueError:
+        raise ValueError("date must look like 2024-06-03") from None
+    if as_of > datetime.now().date():
+        raise ValueError("date must not be in the future")
+    return as_of
+
+
 @app.route("/api/rate/<from_currency>/<to_currency>")
 def get_live_rate(from_currency, to_currency):
-    """API endpoint to get live exchange rate"""
+    """API endpoint to get live exchange rate, or the rate as of a past ?date="""
     try:
-        rate = get_exchange_rate(from_currency, to_currency, mode="live")
-        return {
+        as_of = rate_date_arg(request.args)
+    except ValueError as e:
+        return {"success": False, "error": str(e), "from": from_currency, "to": to_currency}, 400
+    try:
+        rate = get_exchange_rate(from_currency, to_currency, mode="live", as_of=as_of)
+        payload = {
             "success": True,
             "from": from_currency,
             "to": to_currency,
             "rate": round(rate, 6),
             "timestamp": datetime.now().strftime("%Y-%m-%d %H:%M:%S")
         }
+        if as_of is not None:
+            payload["date"] = as_of.isoformat()
+        return payload
+    except LookupError as e:
+        return {"success": False, "error": str(e), "from": from_currency, "to": to_currency}, 404
     except Exception as e:
         return {
             "success": False,
@@ -602,6 +1015,292 @@ def get_live_rate(from_currency, to_currency):
         }
 
 
+def stream_args(args):
+    """
+    Pairs to stream: ?pairs=USD-INR,EUR-GBP (or ?pair=, or ?from=&to=).
+    Both currencies must be in CURRENCIES; raises ValueError otherwise.
+    """
+    raw = (args.get("pairs") or args.get("pair") or "").strip()
+    if not raw and args.get("from") and args.get("to"):
+        raw = f"{args['from']}-{args['to']}"
+    if not raw:
+        raise ValueError("pairs is required, e.g. ?pairs=USD-INR,EUR-GBP")
+    pairs = []
+    for item in raw.upper().split(","):
+        from_currency, sep, to_currency = item.strip().partition("-")
+        if not sep or from_currency not in CURRENCIES or to_currency not in CURRENCIES or from_currency == to_currency:
+            raise ValueError(f"unsupported pair '{item.strip()}'; pairs look like USD-INR, "
+                             f"with currencies from {', '.join(CURRENCIES)}")
+        pairs.append((from_currency, to_currency))
+    return pairs
+
+
+@app.route("/api/stream/rates")
+def stream_live_rates():
+    """
+    Server-Sent Events: the current rate of each pair, then a `rate` event
+    whenever it changes. Holds one request thread per client; the ASGI mode
+    serves this route on the event loop instead.
+    """
+    try:
+        pairs = stream_args(request.args)
+    except ValueError as e:
+        return {"success": False, "error": str(e)}, 400
+
+    def events():
+        wake = threading.Event()
+        subscription = rate_stream.subscribe(pairs, wake.set)
+        try:
+            while True:
+                woke = wake.wait(RATE_STREAM_HEARTBEAT)
+                wake.clear()
+                pending = subscription.drain()
+                if pending:
+                    yield "".join(format_event(event) for event in pending)
+                elif not woke:
+                    # Also how a disconnected client is noticed: the write fails and the generator is closed
+                    yield HEARTBEAT_FRAME
+        finally:
+            rate_stream.unsubscribe(subscription)
+
+    return Response(events(), mimetype="text/event-stream", headers=STREAM_HEADERS)
+
+
+def parse_batch_body(body, mimetype, args):
+    """
+    Rows, record flag and mode from a batch request body. Accepts a JSON list of
+    {"from", "to", "amount"} objects, a JSON object {"rows": [...], "record": bool,
+    "mode": "live"|"simulated"}, or a CSV body with from,to,amount columns
+    (record/mode then come from the query string).
+    """
+    if mimetype in ("text/csv", "application/csv"):
+        text = body.decode("utf-8", errors="replace") if isinstance(body, bytes) else body
+        rows = list(csv.DictReader(io.StringIO(text)))
+        record = args.get("record", "").lower() in ("1", "true", "yes")
+        mode = args.get("mode", "live")
+    else:
+        try:
+            payload = json.loads(body) if body else None
+        except ValueError:
+            payload = None
+        if isinstance(payload, list):
+            rows, record, mode = payload, False, args.get("mode", "live")
+        elif isinstance(payload, dict) and isinstance(payload.get("rows"), list):
+            rows, record, mode = payload["rows"], bool(payload.get("record")), payload.get("mode", "live")
+        else:
+            raise ValueError("Body must be a JSON list of rows, {\"rows\": [...]}, or CSV with from,to,amount columns")
+    if len(rows) > BATCH_MAX_ROWS:
+        raise ValueError(f"Too many rows ({len(rows)}); the limit is {BATCH_MAX_ROWS}")
+    if mode not in RATE_MODES:
+        raise ValueError(f"mode must be one of {', '.join(RATE_MODES)}")
+    return rows, record, mode
+
+
+def _parse_amount(value):
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return float("nan")
+
+
+def convert_rows(rows, record, mode, matrix, source, as_csv):
+    """
+    Convert batch rows against one rate matrix snapshot in a single vectorized
+    pass, recording them to history when asked.
+    Returns (headers, chunks, mimetype); chunks yields the NDJSON or CSV body.
+    """
+    froms = [str(row.get("from") or "").strip().upper() if isinstance(row, dict) else "" for row in rows]
+    tos = [str(row.get("to") or "").strip().upper() if isinstance(row, dict) else "" for row in rows]
+    amounts = [_parse_amount(row.get("amount")) if isinstance(row, dict) else float("nan") for row in rows]
+
+    rates, results, valid = convert_arrays(matrix, rate_matrix.indices(froms), rate_matrix.indices(tos), amounts)
+    timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+
+    if record and valid.any():
+        cost_variance = 0.01
+        append_history_many([
+            {
+                "from": froms[i],
+                "to": tos[i],
+                "amount": amounts[i],
+                "result": float(results[i]),
+                "rate": round(float(rates[i]), 6),
+                "mode": mode,
+                "cost_range": {
+                    "min": round(float(results[i]) * (1 - cost_variance), 2),
+                    "max": round(float(results[i]) * (1 + cost_variance), 2),
+                    "variance": cost_variance
+                },
+                "time": timestamp
+            }
+            for i in valid.nonzero()[0]
+        ])
+
+    def generate():
+        out = io.StringIO()
+        writer = csv.writer(out) if as_csv else None
+        if as_csv:
+            writer.writerow(["row", "from", "to", "amount", "rate", "result", "error"])
+        for start in range(0, len(rows), BATCH_CHUNK_ROWS):
+            for i in range(start, min(start + BATCH_CHUNK_ROWS, len(rows))):
+                error = None if valid[i] else "invalid currency, pair or amount"
+                rate = round(float(rates[i]), 6) if valid[i] else None
+                result = float(results[i]) if valid[i] else None
+                if as_csv:
+                    writer.writerow([i, froms[i], tos[i], amounts[i], rate, result, error or ""])
+                else:
+                    line = {"row": i, "from": froms[i], "to": tos[i], "amount": amounts[i],
+                            "rate": rate, "result": result, "ok": bool(valid[i])}
+                    if error:
+                        line["error"] = error
+                        raw = rows[i].get("amount") if isinstance(rows[i], dict) else None
+                        # Echo the amount as sent, except overflowing numbers JSON can't represent
+                        line["amount"] = None if isinstance(raw, float) and not math.isfinite(raw) else raw
+                    out.write(json.dumps(line) + "\n")
+            yield out.getvalue()
+            out.seek(0)
+            out.truncate()
+
+    headers = {
+        "X-Rate-Source": source,
+        "X-Rate-Snapshot": timestamp,
+        "X-Rows": str(len(rows)),
+        "X-Rows-Converted": str(int(valid.sum())),
+        "X-Recorded": str(int(valid.sum())) if record else "0",
+    }
+    mimetype = "text/csv" if as_csv else "application/x-ndjson"
+    return headers, generate(), mimetype
+
+
+@app.route("/api/convert/batch", methods=["POST"])
+def convert_batch():
+    """
+    Convert many (from, to, amount) rows against a single rate snapshot in one
+    vectorized pass. Streams NDJSON, or CSV when the body is CSV or ?format=csv.
+    """
+    try:
+        rows, record, mode = parse_batch_body(request.get_data(), request.mimetype, request.args)
+    except ValueError as e:
+        return {"success": False, "error": str(e)}, 400
+
+    matrix, source = rate_snapshot(mode)
+    as_csv = request.mimetype in ("text/csv", "application/csv") or request.args.get("format") == "csv"
+    headers, chunks, mimetype = convert_rows(rows, record, mode, matrix, source, as_csv)
+    return Response(chunks, mimetype=mimetype, headers=headers)
+
+
+@app.route("/api/stats/<from_currency>/<to_currency>")
+def get_rate_stats(from_currency, to_currency):
+    """API endpoint for rolling-window rate stats from the stored time series"""
+    try:
+        days = int(request.args.get("days", 7))
+        if not 1 <= days <= RATE_STATS_MAX_DAYS:
+            raise ValueError(f"days must be between 1 and {RATE_STATS_MAX_DAYS}")
+    except ValueError as e:
+        return {"success": False, "error": str(e)}, 400
+    stats = rate_series.window_stats(from_currency, to_currency, days=days)
+    return {
+        "success": stats is not None,
+        "from": from_currency,
+        "to": to_currency,
+        "days": days,
+        "stats": stats
+    }
+
+
+@app.route("/api/analytics/rebuild", methods=["POST"])
+def rebuild_analytics():
+    """Recompute the history analytics counters from the full log"""
+    return {"success": True, "analytics": get_history_aggregates(rebuild=True).summary()}
+
+
+@app.route("/api/notifications")
+def get_notifications():
+    """API endpoint for background notifications newer than ?since=<id>"""
+    try:
+        since = int(request.args.get("since", 0))
+    except ValueError:
+        since = 0
+    items = notification_store.since(since)
+    return {
+        "success": True,
+        "notifications": items,
+        "last_id": items[-1]["id"] if items else since,
+        "sms_pending": sms_outbox.pending()
+    }
+
+
+@app.route("/api/cache-stats")
+def cache_stats():
+    """API endpoint exposing rate cache hit/miss/refresh counters"""
+    return {"success": True, "rate_cache": rate_cache.stats()}
+
+
+@app.route("/api/provider-stats")
+def provider_stats():
+    """API endpoint exposing per-provider latency and error rates"""
+    return {
+        "success": True,
+        "mode": providers.RATE_FETCH_MODE,
+        "providers": providers.provider_stats.snapshot(),
+        "circuits": providers.breaker_states()
+    }
+
+
+@app.before_request
+def start_request_timer():
+    g.request_started = time.perf_counter()
+
+
+@app.after_request
+def record_request_latency(response):
+    """Per-route latency (time to the response headers; streamed bodies are not included)"""
+    started = g.get("request_started")
+    if started is not None:
+        route = request.url_rule.rule if request.url_rule else "<unmatched>"
+        metrics.HTTP_REQUEST_SECONDS.labels(request.method, route, str(response.status_code)).observe(
+            time.perf_counter() - started)
+    return response
+
+
+def cache_lookup_samples():
+    stats = rate_cache.stats()
+    return [((result,), stats[key]) for result, key in
+            (("hit", "hits"), ("stale", "stale_hits"), ("miss", "misses"), ("coalesced", "coalesced"),
+             ("failed", "failed_hits"))]
+
+
+def snapshot_age_samples():
+    info = offline_snapshot.info()
+    return [((), info["age_seconds"])] if info["available"] else []
+
+
+# Read at scrape time from the counters these components already keep
+metrics.Callback("rate_cache_lookups_total", "Rate cache lookups by result", "counter",
+                 cache_lookup_samples, labels=("result",))
+metrics.Callback(
+    "rate_cache_hit_ratio", "Share of rate lookups served without waiting on a provider", "gauge",
+    lambda: [((), rate_cache.stats()["hit_ratio"])])
+metrics.Callback(
+    "provider_circuit_open", "1 while a provider's circuit breaker is open", "gauge",
+    lambda: [((name,), int(state["state"] == "open")) for name, state in providers.breaker_states().items()],
+    labels=("provider",))
+metrics.Callback("alerts_active", "Alerts waiting for their target rate", "gauge",
+                 lambda: [((), alert_index.size())])
+metrics.Callback("sms_outbox_pending", "SMS messages queued but not yet sent", "gauge",
+                 lambda: [((), sms_outbox.pending())])
+metrics.Callback("rate_snapshot_age_seconds", "Age of the rates in the mapped offline snapshot", "gauge",
+                 snapshot_age_samples)
+metrics.Callback("rate_stream_clients", "Clients connected to /api/stream/rates", "gauge",
+                 lambda: [((), rate_stream.subscriber_count())])
+
+
+@app.route("/metrics")
+def metrics_endpoint():
+    """Prometheus scrape endpoint (this worker's metrics)"""
+    return Response(metrics.render(), mimetype="text/plain; version=0.0.4")
+
+
 @app.route("/api/test-sms/<phone_number>")
 def test_sms(phone_number):
     """Test SMS functionality"""
@@ -643,83 +1342,163 @@ def subscribe():
         if not validated:
             return {"success": False, "error": "Invalid phone format. Use international format (+1234567890)"}, 400
 
-        # avoid duplicate
-        exists = any(s.get("phone") == validated for s in subscribers)
-        if not exists:
-            subscribers.append({
-                "phone": validated,
-                "created_at": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
-                # placeholder for future preferences (preferred currencies etc.)
-                "prefs": {"pairs": []}
-            })
-            save_subscribers()
+        # avoid duplicate (checked against every worker's registrations)
+        if add_subscriber(validated):
 
             # send immediate registration confirmation
             msg = f"✅ You have subscribed to daily currency summary.\nTime: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}\nYou will receive daily updates."
-            send_sms_notification(validated, msg)
+            queue_sms_notification(validated, msg)
 
         return {"success": True, "subscribed": validated}
     except Exception as e:
         return {"success": False, "error": str(e)}, 500
 
 
-@app.route("/dashboard")
-def dashboard():
-    """Dashboard route to display analytics and charts"""
-    daily_totals = {}
-    pair_counts = {}
-    mode_counts = {"live": 0, "simulated": 0}
-
-    # Process history data
-    for item in history:
-        try:
-            t = item.get("time")
-            date_key = t.split(" ")[0] if isinstance(t, str) and " " in t else t
-            daily_totals[date_key] = daily_totals.get(date_key, 0) + float(item.get("amount", 0))
+def dashboard_args(args):
+    """
+    ?granularity=hour|day|month (default day), ?start=&end= (YYYY-MM-DD, inclusive),
+    ?pair=USD-INR and ?mode=. Raises ValueError on a malformed value.
+    """
+    filters = history_args(args)
+    start = end = None
+    if filters["since"]:
+        start = datetime.strptime(filters["since"], "%Y-%m-%d")
+    if filters["until"]:
+        # Last hour of the end date
+        end = datetime.strptime(filters["until"], "%Y-%m-%d") - timedelta(hours=1)
+    pair = None
+    if filters["from_currency"] and filters["to_currency"]:
+        pair = f"{filters['from_currency']}→{filters['to_currency']}"
+    return {
+        "granularity": (args.get("granularity") or "day").strip().lower(),
+        "start": start,
+        "end": end,
+        "pair": pair,
+        "mode": filters["mode"],
+    }
 
-            pair = f"{item.get('from')}→{item.get('to')}"
-            pair_counts[pair] = pair_counts.get(pair, 0) + 1
 
-            m = item.get("mode", "live")
-            if m in mode_counts:
-                mode_counts[m] += 1
-            else:
-                mode_counts[m] = 1
-        except (ValueError, KeyError, AttributeError):
-            # Skip invalid history entries
-            continue
+@app.route("/dashboard")
+def dashboard():
+    """Dashboard charts for any date range and granularity, answered from the rollups"""
+    try:
+        charts = get_history_rollups().dashboard(**dashboard_args(request.args))
+        error = None
+    except ValueError as e:
+        charts, error = get_history_rollups().dashboard(), str(e)
+    return render_template("dashboard.html", error=error, **charts)
 
-    daily_labels = sorted(daily_totals.keys()) if daily_totals else []
-    daily_values = [round(daily_totals[k], 2) for k in daily_labels] if daily_labels else []
 
-    sorted_pairs = sorted(pair_counts.items(), key=lambda kv: kv[1], reverse=True)[:5] if pair_counts else []
-    pair_labels = [kv[0] for kv in sorted_pairs] if sorted_pairs else []
-    pair_values = [kv[1] for kv in sorted_pairs] if sorted_pairs else []
+@app.route("/api/dashboard")
+def get_dashboard():
+    """API endpoint for the dashboard series and breakdowns (same arguments as /dashboard)"""
+    try:
+        return {"success": True, **get_history_rollups().dashboard(**dashboard_args(request.args))}
+    except ValueError as e:
+        return {"success": False, "error": str(e)}, 400
 
-    mode_labels = list(mode_counts.keys()) if mode_counts else []
-    mode_values = [mode_counts[k] for k in mode_labels] if mode_labels else []
 
-    return render_template("dashboard.html", daily_labels=daily_labels, daily_values=daily_values, pair_labels=pair_labels, pair_values=pair_values, mode_labels=mode_labels, mode_values=mode_values)
+def history_args(args):
+    """
+    Filters and paging for the history views:
+    ?pair=USD-INR (or ?from=&to=), ?mode=, ?start=&end= (YYYY-MM-DD, inclusive),
+    ?cursor= and ?limit=. Raises ValueError on a malformed value.
+    """
+    from_currency = (args.get("from") or "").strip().upper() or None
+    to_currency = (args.get("to") or "").strip().upper() or None
+    pair = (args.get("pair") or "").strip().upper()
+    if pair:
+        from_currency, sep, to_currency = pair.partition("-")
+        if not sep or not from_currency or not to_currency:
+            raise ValueError("pair must look like USD-INR")
+    mode = (args.get("mode") or "").strip().lower() or None
+    if mode and mode not in RATE_MODES:
+        raise ValueError(f"mode must be one of {', '.join(RATE_MODES)}")
+
+    since = until = None
+    if args.get("start"):
+        since = datetime.strptime(args["start"], "%Y-%m-%d").strftime("%Y-%m-%d")
+    if args.get("end"):
+        until = (datetime.strptime(args["end"], "%Y-%m-%d") + timedelta(days=1)).strftime("%Y-%m-%d")
+
+    limit = int(args.get("limit") or HISTORY_PAGE_SIZE)
+    if limit < 1:
+        raise ValueError("limit must be at least 1")
+    return {
+        "from_currency": from_currency,
+        "to_currency": to_currency,
+        "mode": mode,
+        "since": since,
+        "until": until,
+        "cursor": args.get("cursor") or None,
+        "limit": min(limit, HISTORY_PAGE_MAX),
+    }
 
 
 @app.route("/history")
 def history_page():
-    """Dedicated history view."""
+    """Dedicated history view, one page at a time (same filters as /api/history)."""
     analytics = compute_history_analytics()
-    return render_template("history.html", history=history, analytics=analytics)
+    try:
+        entries, next_cursor = history_log.page(**history_args(request.args))
+        error = None
+    except ValueError as e:
+        entries, next_cursor, error = [], None, str(e)
+    filters = {key: request.args.get(key, "") for key in ("pair", "from", "to", "mode", "start", "end", "limit")}
+    return render_template("history.html", history=entries, next_cursor=next_cursor,
+                           filters=filters, error=error, analytics=analytics)
+
+
+@app.route("/api/history")
+def get_history_page():
+    """API endpoint for one filtered page of history; pass next_cursor back as ?cursor= for the next."""
+    try:
+        entries, next_cursor = history_log.page(**history_args(request.args))
+    except ValueError as e:
+        return {"success": False, "error": str(e)}, 400
+    return {"success": True, "count": len(entries), "history": entries, "next_cursor": next_cursor}
+
+
+def forecast_args():
+    """Pair, amount and horizon from the query string (defaults: 1 USD→INR over 7 days)."""
+    from_currency = request.args.get("from", "USD")
+    to_currency = request.args.get("to", "INR")
+    amount = _parse_amount(request.args.get("amount", 1))
+    days = int(request.args.get("days", FORECAST_DEFAULT_DAYS))
+    return from_currency, to_currency, amount, days
 
 
 @app.route("/forecast")
 def forecast_page():
-    """Dedicated forecast view."""
+    """Dedicated forecast view for ?from=&to=&amount=&days=."""
+    try:
+        view = build_forecast_view(*forecast_args())
+    except ValueError:
+        view = {"labels": [], "values": [], "lower": [], "upper": [], "summary": None}
     return render_template(
         "forecast.html",
-        chart_labels=last_forecast.get("labels", []),
-        chart_values=last_forecast.get("values", []),
-        forecast_summary=last_forecast.get("summary"),
+        chart_labels=view["labels"],
+        chart_values=view["values"],
+        chart_lower=view["lower"],
+        chart_upper=view["upper"],
+        forecast_summary=view["summary"],
     )
 
 
+@app.route("/api/forecast/<from_currency>/<to_currency>")
+def get_forecast(from_currency, to_currency):
+    """API endpoint for the cached forecast of a pair, scaled by ?amount= over ?days="""
+    try:
+        amount = _parse_amount(request.args.get("amount", 1))
+        days = int(request.args.get("days", FORECAST_DEFAULT_DAYS))
+        view = build_forecast_view(from_currency, to_currency, amount, days)
+        return {"success": True, **view}
+    except ValueError as e:
+        return {"success": False, "error": str(e), "from": from_currency, "to": to_currency}, 400
+    except Exception as e:
+        return {"success": False, "error": str(e), "from": from_currency, "to": to_currency}
+
+
 # --- daily summary builder & sender (new) ---
 def build_daily_summary():
     """
@@ -741,43 +1520,126 @@ def build_daily_summary():
         return f"Daily Currency Summary is currently unavailable. ({e})"
 
 
-def send_daily_summary_job():
-    """Scheduled job: send daily summary to all subscribers"""
+def send_daily_summary_job(batch=None, message=None):
+    """
+    Scheduled job: send daily summary to all subscribers.
+    Sends run concurrently under the SMS rate limit and are recorded in the
+    delivery ledger, so re-running a batch only reaches recipients not yet served.
+    """
+    refresh_subscribers()
     if not subscribers:
         print("[INFO] No subscribers to send daily summary to.")
         return
 
-    message = build_daily_summary()
-    print(f"[INFO] Sending daily summary to {len(subscribers)} subscribers.")
-    for sub in list(subscribers):
-        phone = sub.get("phone")
-        if not phone:
-            continue
-        try:
-            ok = send_sms_notification(phone, message)
-            if ok:
-                print(f"[INFO] Daily summary sent to {phone}")
-            else:
-                print(f"[WARN] Failed to send daily summary to {phone}")
-        except Exception as e:
-            print(f"[WARN] Exception sending daily summary to {phone}: {e}")
+    batch = batch or f"daily-{datetime.now().strftime('%Y-%m-%d')}"
+    message = message or build_daily_summary()
+    phones = [sub.get("phone") for sub in list(subscribers)]
+    print(f"[INFO] Sending daily summary {batch} to {len(phones)} subscribers.")
+    try:
+        summary = dispatch_bulk(batch, phones, message, send_sms_notification, ledger=sms_ledger)
+        print(f"[INFO] Daily summary {batch}: {summary['sent']} sent, {summary['failed']} failed, "
+              f"{summary['skipped']} already delivered")
+    except Exception as e:
+        print(f"[WARN] Daily summary {batch} failed: {e}")
+    sms_ledger.compact()
+
+
+def resume_sms_batches():
+    """Finish today's daily summary if a crash or restart interrupted it; older ones are abandoned."""
+    today = f"daily-{datetime.now().strftime('%Y-%m-%d')}"
+    for batch, message in sms_ledger.incomplete_batches().items():
+        if batch == today:
+            print(f"[INFO] Resuming interrupted SMS batch {batch}")
+            send_daily_summary_job(batch=batch, message=message)
+        elif batch.startswith("daily-"):
+            # A stale summary is worse than none: don't send yesterday's rates today
+            print(f"[WARN] Abandoning interrupted SMS batch {batch}")
+            sms_ledger.abandon_batch(batch)
+    sms_ledger.compact()
+
+# Lock file whose holder is the one process that runs the once-only scheduled jobs
+SCHEDULER_LOCK_FILE = os.getenv("SCHEDULER_LOCK_FILE", "scheduler.lock")
+LEADER_RETRY_INTERVAL = int(os.getenv("LEADER_RETRY_INTERVAL", "30"))
+scheduler_leader = LeaderLock(SCHEDULER_LOCK_FILE)
+scheduler = None
+_app_created = False
+
+
+def add_leader_jobs():
+    """Jobs that must run exactly once across all workers."""
+    # run daily at 09:00 — adjust hour/minute as needed
+    scheduler.add_job(send_daily_summary_job, 'cron', hour=9, minute=0, id="daily_summary")
+    # evaluate rate alerts in the background instead of on every page load
+    scheduler.add_job(evaluate_alerts_job, 'interval', seconds=ALERT_CHECK_INTERVAL, id="alert_check",
+                      max_instances=1, coalesce=True)
+    # finish any bulk SMS batch a previous run did not complete
+    scheduler.add_job(resume_sms_batches, 'date', id="resume_sms_batches")
+    # persist the live rates for simulated mode and offline use; one writer for every worker
+    scheduler.add_job(save_rate_snapshot_job, 'interval', seconds=SNAPSHOT_INTERVAL, id="rate_snapshot",
+                      max_instances=1, coalesce=True)
+    # backfill daily historical rates now, then extend them once a day
+    scheduler.add_job(backfill_history_job, 'interval', hours=24, id="historical_backfill",
+                      next_run_time=datetime.now(), max_instances=1, coalesce=True)
+    print(f"[INFO] Process {os.getpid()} is the scheduler leader. Daily summary job scheduled at 09:00.")
+
+
+def elect_scheduler_leader():
+    """Scheduled on followers: take over the leader jobs if the leader has exited."""
+    if scheduler_leader.try_acquire():
+        scheduler.remove_job("leader_election")
+        add_leader_jobs()
+
+
+def start_scheduler():
+    """
+    Start this process's background scheduler. Every worker refreshes its own
+    forecast cache; only the process holding SCHEDULER_LOCK_FILE runs the daily
+    summary, alert checks and SMS batch recovery, and the others keep trying to
+    take over in case it exits.
+    """
+    from apscheduler.schedulers.background import BackgroundScheduler
 
-if __name__ == "__main__":
+    global scheduler
+    scheduler = BackgroundScheduler()
+    # precompute forecasts for every pair now and then on an interval
+    scheduler.add_job(refresh_forecasts_job, 'interval', seconds=FORECAST_REFRESH_INTERVAL, id="forecast_refresh",
+                      next_run_time=datetime.now(), max_instances=1, coalesce=True)
+    if scheduler_leader.try_acquire():
+        add_leader_jobs()
+    else:
+        scheduler.add_job(elect_scheduler_leader, 'interval', seconds=LEADER_RETRY_INTERVAL,
+                          id="leader_election", max_instances=1, coalesce=True)
+        print(f"[INFO] Process {os.getpid()} is a scheduler follower.")
+    try:
+        scheduler.start()
+    except Exception as e:
+        print(f"[WARN] Scheduler failed to start: {e}")
+
+
+def create_app(with_scheduler=True):
+    """
+    Application factory: load persisted state and start the background jobs.
+    Safe to call more than once; used by wsgi.py, asgi.py and the dev server.
+    """
+    global _app_created
+    if _app_created:
+        return app
+    _app_created = True
     load_history()
     load_alerts()
+    offline_snapshot.load()
     load_subscribers()   # load subscribers on startup
+    if with_scheduler:
+        start_scheduler()
+    return app
 
-    # start scheduler for daily job (run at 09:00 local time)
-    scheduler = BackgroundScheduler()
-    # run daily at 09:00 — adjust hour/minute as needed
-    scheduler.add_job(send_daily_summary_job, 'cron', hour=9, minute=0, id="daily_summary")
-    # Ensure scheduler starts only in main process (Werkzeug reloader guard)
-    if os.environ.get("WERKZEUG_RUN_MAIN") == "true" or not app.debug:
-        try:
-            scheduler.start()
-            print("[INFO] Scheduler started. Daily summary job scheduled at 09:00.")
-        except Exception as e:
-            print(f"[WARN] Scheduler failed to start: {e}")
+
+if __name__ == "__main__":
+    debug = True
+    # With the reloader (debug) on, requests are served by the child process Werkzeug
+    # starts with WERKZEUG_RUN_MAIN set; the watching parent must not run the scheduler,
+    # or it would hold the leader lock and run the alert checks nobody sees.
+    create_app(with_scheduler=os.environ.get("WERKZEUG_RUN_MAIN") == "true" or not debug)
 
     # Print SMS service status
     if SMS_ENABLED:
@@ -787,4 +1649,4 @@ if __name__ == "__main__":
         print("   To enable real SMS, set up Twilio credentials (see SMS_SETUP.md)")
     
     print("🚀 Currency Converter with SMS Alerts starting...")
-    app.run(debug=True)
+    app.run(debug=debug)
@@ -0,0 +1,279 @@
+"""
+ASGI serving mode.
+
+/api/rate/<from>/<to> and /api/convert/batch run on the event loop: provider
+calls go through one shared httpx.AsyncClient and concurrent lookups for the
+same rate await one shared task (rate_cache.get_async), so thousands of
+in-flight requests wait without holding a thread each. CPU-bound batch
+conversion runs in a worker thread. /api/stream/rates clients also wait on
+the loop, woken by the rate stream's poller thread. Every other route is the
+Flask app, served through asgiref's WsgiToAsgi adapter.
+
+    uvicorn asgi:application --host 0.0.0.0 --port 5000
+"""
+
+import asyncio
+import json
+import time
+from datetime import datetime
+from urllib.parse import parse_qsl
+
+import app as web
+import providers
+from logs import get_logger
+from metrics import HTTP_REQUEST_SECONDS
+from rate_cache import rate_cache
+from rate_stream import HEARTBEAT_FRAME, RATE_STREAM_HEARTBEAT, STREAM_HEADERS, format_event
+
+# Optional adapter for the non-async Flask routes
+try:
+    from asgiref.wsgi import WsgiToAsgi
+    ASGIREF_AVAILABLE = True
+except ImportError:
+    ASGIREF_AVAILABLE = False
+    print("[INFO] asgiref not installed. ASGI mode serves only the async API routes.")
+
+if not providers.HTTPX_AVAILABLE:
+    print("[INFO] httpx not installed. Async provider calls will run in worker threads.")
+
+log = get_logger("asgi")
+_client = None
+
+
+def get_client():
+    """The shared AsyncClient, created on first use inside the running loop."""
+    global _client
+    if _client is None:
+        _client = providers.build_async_client()
+    return _client
+
+
+async def close_client():
+    global _client
+    if _client is not None:
+        await _client.aclose()
+        _client = None
+
+
+async def fetch_rate_table_async(base=web.RATE_MATRIX_BASE):
+    return await providers.fetch_first_async(get_client(), providers.table_providers(base),
+                                             valid=providers.valid_table)
+
+
+async def refresh_rate_matrix_async():
+    """Async refresh_rate_matrix()."""
+    try:
+        table = await rate_cache.get_async((web.RATE_MATRIX_BASE, "*"), fetch_rate_table_async)
+    except Exception as e:
+        log.warning("Rate table lookup failed", error=str(e))
+        return False
+    return web.apply_rate_table(table)
+
+
+async def fetch_live_rate_async(from_currency, to_currency):
+    rate = await providers.fetch_first_async(get_client(), providers.pair_providers(from_currency, to_currency))
+    return web.accept_live_rate(from_currency, to_currency, rate)
+
+
+async def get_exchange_rate_async(from_currency, to_currency):
+    """Async get_exchange_rate() for live mode: matrix, then per-pair cache, then fallback."""
+    if from_currency == to_currency:
+        return 1.0
+
+    index = web.rate_matrix.index
+    if from_currency in index and to_currency in index and await refresh_rate_matrix_async():
+        rate = web.rate_matrix.rate(from_currency, to_currency)
+        if rate is not None:
+            return rate
+
+    try:
+        rate = await rate_cache.get_async(
+            (from_currency, to_currency),
+            lambda: fetch_live_rate_async(from_currency, to_currency)
+        )
+    except Exception as e:
+        log.warning("Rate cache lookup failed", error=str(e))
+        rate = None
+    if rate is not None:
+        return rate
+
+    log.warning("All live APIs failed, using offline rates", pair=f"{from_currency}→{to_currency}")
+    return web.offline_rate(from_currency, to_currency)
+
+
+async def rate_snapshot_async(mode="live"):
+    """Async rate_snapshot()."""
+    if mode != "simulated" and await refresh_rate_matrix_async():
+        return web.rate_matrix.snapshot(), "live"
+    return web.offline_matrix()
+
+
+async def read_body(receive):
+    chunks = []
+    while True:
+        message = await receive()
+        chunks.append(message.get("body", b""))
+        if not message.get("more_body"):
+            return b"".join(chunks)
+
+
+async def send_json(send, payload, status=200):
+    body = json.dumps(payload).encode()
+    await send({
+        "type": "http.response.start",
+        "status": status,
+        "headers": [(b"content-type", b"application/json"), (b"content-length", str(len(body)).encode())],
+    })
+    await send({"type": "http.response.body", "body": body})
+
+
+async def rate_endpoint(scope, send, from_currency, to_currency):
+    """Same response as the Flask /api/rate route; returns the status."""
+    args = dict(parse_qsl(scope.get("query_string", b"").decode("latin-1")))
+    try:
+        as_of = web.rate_date_arg(args)
+    except ValueError as e:
+        await send_json(send, {"success": False, "error": str(e), "from": from_currency, "to": to_currency},
+                        status=400)
+        return 400
+    status = 200
+    try:
+        if as_of is not None and as_of < datetime.now().date():
+            # An in-memory binary search; no I/O to await
+            rate = web.get_exchange_rate(from_currency, to_currency, as_of=as_of)
+        else:
+            rate = await get_exchange_rate_async(from_currency, to_currency)
+        payload = {
+            "success": True,
+            "from": from_currency,
+            "to": to_currency,
+            "rate": round(rate, 6),
+            "timestamp": datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        }
+        if as_of is not None:
+            payload["date"] = as_of.isoformat()
+    except LookupError as e:
+        payload, status = {"success": False, "error": str(e), "from": from_currency, "to": to_currency}, 404
+    except Exception as e:
+        payload = {"success": False, "error": str(e), "from": from_currency, "to": to_currency}
+    await send_json(send, payload, status=status)
+    return status
+
+
+async def batch_endpoint(scope, receive, send):
+    """Same request and response formats as the Flask /api/convert/batch route; returns the status."""
+    body = await read_body(receive)
+    headers = dict(scope.get("headers") or [])
+    mimetype = headers.get(b"content-type", b"").decode("latin-1").split(";")[0].strip().lower()
+    args = dict(parse_qsl(scope.get("query_string", b"").decode("latin-1")))
+    try:
+        rows, record, mode = await asyncio.to_thread(web.parse_batch_body, body, mimetype, args)
+    except ValueError as e:
+        await send_json(send, {"success": False, "error": str(e)}, status=400)
+        return 400
+
+    matrix, source = await rate_snapshot_async(mode)
+    as_csv = mimetype in ("text/csv", "application/csv") or args.get("format") == "csv"
+    out_headers, chunks, out_mimetype = await asyncio.to_thread(
+        web.convert_rows, rows, record, mode, matrix, source, as_csv
+    )
+    await send({
+        "type": "http.response.start",
+        "status": 200,
+        "headers": [(b"content-type", out_mimetype.encode())]
+                   + [(k.lower().encode(), v.encode()) for k, v in out_headers.items()],
+    })
+    while True:
+        chunk = await asyncio.to_thread(next, chunks, None)
+        if chunk is None:
+            break
+        await send({"type": "http.response.body", "body": chunk.encode(), "more_body": True})
+    await send({"type": "http.response.body", "body": b""})
+    return 200
+
+
+async def wait_for_disconnect(receive):
+    while (await receive())["type"] != "http.disconnect":
+        pass
+
+
+async def stream_endpoint(scope, receive, send):
+    """Same events as the Flask /api/stream/rates route."""
+    args = dict(parse_qsl(scope.get("query_string", b"").decode("latin-1")))
+    try:
+        pairs = web.stream_args(args)
+    except ValueError as e:
+        await send_json(send, {"success": False, "error": str(e)}, status=400)
+        return
+
+    loop = asyncio.get_running_loop()
+    wake = asyncio.Event()
+    subscription = web.rate_stream.subscribe(pairs, lambda: loop.call_soon_threadsafe(wake.set))
+    disconnected = asyncio.ensure_future(wait_for_disconnect(receive))
+    try:
+        await send({
+            "type": "http.response.start",
+            "status": 200,
+            "headers": [(b"content-type", b"text/event-stream; charset=utf-8")]
+                       + [(k.lower().encode(), v.encode()) for k, v in STREAM_HEADERS.items()],
+        })
+        while not disconnected.done():
+            woken = asyncio.ensure_future(wake.wait())
+            await asyncio.wait({woken, disconnected}, timeout=RATE_STREAM_HEARTBEAT,
+                               return_when=asyncio.FIRST_COMPLETED)
+            woken.cancel()
+            if disconnected.done():
+                break
+            wake.clear()
+            pending = subscription.drain()
+            frame = "".join(format_event(event) for event in pending) if pending else HEARTBEAT_FRAME
+            await send({"type": "http.response.body", "body": frame.encode(), "more_body": True})
+    finally:
+        web.rate_stream.unsubscribe(subscription)
+        disconnected.cancel()
+
+
+flask_app = web.create_app()
+_wsgi = WsgiToAsgi(flask_app) if ASGIREF_AVAILABLE else None
+
+
+async def lifespan(receive, send):
+    while True:
+        message = await receive()
+        if message["type"] == "lifespan.startup":
+            await send({"type": "lifespan.startup.complete"})
+        elif message["type"] == "lifespan.shutdown":
+            await close_client()
+            await send({"type": "lifespan.shutdown.complete"})
+            return
+
+
+async def application(scope, receive, send):
+    if scope["type"] == "lifespan":
+        await lifespan(receive, send)
+        return
+
+    if scope["type"] == "http":
+        method = scope["method"]
+        parts = scope["path"].strip("/").split("/")
+        started = time.perf_counter()
+        # Same route labels as the Flask rules, so both serving modes report one series
+        if method == "GET" and len(parts) == 4 and parts[:2] == ["api", "rate"]:
+            status = await rate_endpoint(scope, send, parts[2], parts[3])
+            HTTP_REQUEST_SECONDS.labels(method, "/api/rate/<from_currency>/<to_currency>", str(status)).observe(
+                time.perf_counter() - started)
+            return
+        if method == "POST" and parts == ["api", "convert", "batch"]:
+            status = await batch_endpoint(scope, receive, send)
+            HTTP_REQUEST_SECONDS.labels(method, "/api/convert/batch", str(status)).observe(
+                time.perf_counter() - started)
+            return
+        if method == "GET" and parts == ["api", "stream", "rates"]:
+            # Not timed: a stream lasts as long as the client stays connected
+            await stream_endpoint(scope, receive, send)
+            return
+
+    if _wsgi is None:
+        await send_json(send, {"success": False, "error": "Not available in ASGI mode without asgiref"}, status=404)
+        return
+    await _wsgi(scope, receive, send)
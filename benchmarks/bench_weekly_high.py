@@ -0,0 +1,62 @@
+"""
+Weekly high: the old seven-fetch loop vs. the rate time-series index.
+
+Run from the repository root:
+    python benchmarks/bench_weekly_high.py [--delay 0.05] [--repeat 20]
+
+The old loop is reproduced against a local stub provider (no network); the
+new path answers from rate_series.window_stats.
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import timeit
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import providers  # noqa: E402
+from rate_series import RateSeries  # noqa: E402
+from stub_provider import start_stub_provider, stub_pair_providers  # noqa: E402
+
+
+def old_weekly_high(from_currency, to_currency):
+    """The pre-time-series implementation: one uncached live fetch per day."""
+    rates = []
+    for i in range(7):
+        rate = providers.fetch_first(providers.pair_providers(from_currency, to_currency), mode="sequential")
+        if rate:
+            rates.append(rate)
+    return max(rates) if rates else None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--delay", type=float, default=0.0, help="stub provider latency in seconds")
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    server, base_url = start_stub_provider(delay=args.delay)
+    providers.pair_providers = stub_pair_providers(base_url)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        series = RateSeries(path=os.path.join(tmp, "series.jsonl"), seed_path=None)
+        now = datetime.now()
+        # A year of hourly observations
+        for hour in range(24 * 365):
+            when = now - timedelta(hours=hour)
+            series.record_many([("USD", "INR", 88 + (hour % 97) / 100)], when=when)
+
+        old = timeit.timeit(lambda: old_weekly_high("USD", "INR"), number=args.repeat) / args.repeat
+        new = timeit.timeit(lambda: series.window_stats("USD", "INR", days=7), number=args.repeat * 1000) / (args.repeat * 1000)
+
+    server.shutdown()
+    print(f"old loop (7 stub fetches): {old * 1e3:10.3f} ms/call")
+    print(f"rate_series.window_stats:  {new * 1e6:10.3f} us/call")
+    print(f"speedup:                   {old / new:10.0f}x")
+
+
+if __name__ == "__main__":
+    main()
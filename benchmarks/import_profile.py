@@ -0,0 +1,104 @@
+"""
+Cold-start profile: how long `import app` takes and which imports dominate.
+
+Run from the repository root:
+    python benchmarks/import_profile.py [--module app] [--repeat 5] [--top 15]
+                                        [--json results.json] [--budget-ms 400]
+
+Each run is a fresh interpreter with `python -X importtime`, so nothing is
+cached in-process. Reports the median wall time of the import, the median
+self/cumulative time of the slowest modules, and exits with status 1 when
+--budget-ms is given and the median import exceeds it.
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def profile_once(module):
+    """One fresh-interpreter import. Returns (wall ms, {module: (self us, cumulative us)})."""
+    started = time.perf_counter()
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=ROOT, capture_output=True, text=True
+    )
+    wall_ms = (time.perf_counter() - started) * 1000
+    if proc.returncode != 0:
+        raise RuntimeError(f"import {module} failed:\n{proc.stderr[-2000:]}")
+
+    timings = {}
+    for line in proc.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        fields = line[len("import time:"):].split("|")
+        try:
+            self_us, cumulative_us = int(fields[0]), int(fields[1])
+        except (ValueError, IndexError):
+            continue
+        timings[fields[2].strip()] = (self_us, cumulative_us)
+    return wall_ms, timings
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--module", default="app")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--top", type=int, default=15)
+    parser.add_argument("--json", help="also write the results to this file")
+    parser.add_argument("--budget-ms", type=float, help="fail when the median import exceeds this")
+    args = parser.parse_args()
+
+    walls = []
+    runs = []
+    for _ in range(max(1, args.repeat)):
+        wall_ms, timings = profile_once(args.module)
+        walls.append(wall_ms)
+        runs.append(timings)
+
+    names = set().union(*runs)
+    modules = []
+    for name in names:
+        samples = [run[name] for run in runs if name in run]
+        modules.append({
+            "module": name,
+            "self_ms": round(statistics.median(s[0] for s in samples) / 1000, 2),
+            "cumulative_ms": round(statistics.median(s[1] for s in samples) / 1000, 2),
+        })
+    modules.sort(key=lambda m: m["cumulative_ms"], reverse=True)
+    target = next((m for m in modules if m["module"] == args.module), None)
+    top = [m for m in modules if m["module"] != args.module][:args.top]
+
+    result = {
+        "module": args.module,
+        "runs": len(walls),
+        "interpreter_wall_ms": round(statistics.median(walls), 1),
+        "import_ms": target["cumulative_ms"] if target else None,
+        "modules_loaded": round(statistics.median(len(run) for run in runs)),
+        "slowest": top,
+    }
+
+    print(f"import {args.module}: {result['import_ms']} ms median over {result['runs']} runs "
+          f"({result['interpreter_wall_ms']} ms including interpreter start, "
+          f"{result['modules_loaded']} modules)")
+    print(f"{'module':<50}{'cumulative ms':>15}{'self ms':>10}")
+    for m in top:
+        print(f"{m['module']:<50}{m['cumulative_ms']:>15}{m['self_ms']:>10}")
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(result, f, indent=2)
+
+    if args.budget_ms is not None and result["import_ms"] is not None and result["import_ms"] > args.budget_ms:
+        print(f"[WARN] import {args.module} took {result['import_ms']} ms, over the {args.budget_ms} ms budget")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,262 @@
+"""
+Load test: threaded WSGI vs. the ASGI serving mode under a slow upstream.
+
+Run from the repository root:
+    python benchmarks/loadtest.py [--requests 2000] [--concurrency 500] [--delay 0.5] [--threads 8]
+
+Each server runs in its own subprocess (so it doesn't share a GIL with the
+load generator) against a local stub provider that answers after --delay
+seconds. The rate cache TTL is set to 0, so every request has to wait on the
+upstream (concurrent identical lookups still share one fetch). The WSGI server
+gets a fixed pool of --threads request threads, like gunicorn --threads; the
+ASGI server runs on one event loop under uvicorn (which must be installed).
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from werkzeug.serving import BaseWSGIServer  # noqa: E402
+
+from currencies import CURRENCIES  # noqa: E402
+
+
+class PooledWSGIServer(BaseWSGIServer):
+    """Werkzeug server that handles requests on a fixed-size thread pool."""
+
+    request_queue_size = 1024
+
+    def __init__(self, host, port, app, threads):
+        super().__init__(host, port, app)
+        self._pool = ThreadPoolExecutor(max_workers=threads, thread_name_prefix="wsgi")
+
+    def process_request(self, request, client_address):
+        self._pool.submit(self._handle, request, client_address)
+
+    def _handle(self, request, client_address):
+        try:
+            self.finish_request(request, client_address)
+        except Exception:
+            self.handle_error(request, client_address)
+        finally:
+            self.shutdown_request(request)
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def serve(kind, port, delay, threads):
+    """Child process: run one server against the stub provider until killed."""
+    # Keep runtime files (history, series, ledgers) out of the working tree
+    os.chdir(tempfile.mkdtemp(prefix="loadtest-"))
+    import providers
+    from rate_cache import rate_cache
+    from stub_provider import start_stub_provider, stub_pair_providers, stub_table_providers
+
+    _, stub_url = start_stub_provider(delay)
+    providers.pair_providers = stub_pair_providers(stub_url)
+    providers.table_providers = stub_table_providers(stub_url)
+    rate_cache.ttl = 0
+    rate_cache.stale_ttl = 0
+
+    # Same state for both servers, and no background jobs competing for CPU
+    import app as web
+    web.create_app(with_scheduler=False)
+    if kind == "wsgi":
+        PooledWSGIServer("127.0.0.1", port, web.app, threads).serve_forever()
+    else:
+        import uvicorn
+        import asgi
+        uvicorn.run(asgi.application, host="127.0.0.1", port=port, log_level="warning", backlog=4096)
+
+
+def start_server(kind, delay, threads):
+    """Start a serve() child process and wait until it accepts connections."""
+    port = free_port()
+    child = subprocess.Popen(
+        [sys.executable, os.path.abspath(__file__), "--serve", kind, "--port", str(port),
+         "--delay", str(delay), "--threads", str(threads)],
+        stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+    deadline = time.time() + 30
+    while time.time() < deadline:
+        try:
+            with socket.create_connection(("127.0.0.1", port), timeout=0.5):
+                return child, f"http://127.0.0.1:{port}"
+        except OSError:
+            time.sleep(0.1)
+    child.kill()
+    raise RuntimeError(f"{kind} server did not start")
+
+
+def batch_body(rows):
+    return json.dumps({"rows": [
+        {"from": random.choice(CURRENCIES), "to": random.choice(CURRENCIES), "amount": random.random() * 1000}
+        for _ in range(rows)
+    ]}).encode()
+
+
+def build_request(host, path, body=None):
+    if body is None:
+        return f"GET {path} HTTP/1.1\r\nHost: {host}\r\n\r\n".encode()
+    head = (f"POST {path} HTTP/1.1\r\nHost: {host}\r\nContent-Type: application/json\r\n"
+            f"Content-Length: {len(body)}\r\n\r\n")
+    return head.encode() + body
+
+
+async def read_response(reader):
+    """Read one HTTP/1.1 response (Content-Length or chunked); returns (status, keep_alive)."""
+    status_line = await reader.readline()
+    if not status_line:
+        raise ConnectionError("server closed the connection")
+    status = int(status_line.split()[1])
+    headers = {}
+    while True:
+        line = await reader.readline()
+        if line in (b"\r\n", b""):
+            break
+        name, _, value = line.decode("latin-1").partition(":")
+        headers[name.strip().lower()] = value.strip().lower()
+    if headers.get("transfer-encoding") == "chunked":
+        while True:
+            size = int((await reader.readline()).split(b";")[0], 16)
+            await reader.readexactly(size + 2)
+            if size == 0:
+                break
+    elif "content-length" in headers:
+        await reader.readexactly(int(headers["content-length"]))
+    else:
+        await reader.read()
+        return status, False
+    return status, headers.get("connection") != "close"
+
+
+async def run_load(base_url, total, concurrency, batch_every, batch_rows):
+    """
+    Send `total` requests over `concurrency` keep-alive connections.
+    Returns (latencies, errors, elapsed seconds).
+    """
+    host, port = base_url.split("//")[1].split(":")
+    port = int(port)
+    body = batch_body(batch_rows)
+    latencies = []
+    errors = 0
+    issued = 0
+
+    def next_request():
+        nonlocal issued
+        if issued >= total:
+            return None
+        issued += 1
+        if batch_every and issued % batch_every == 0:
+            return build_request(host, "/api/convert/batch", body)
+        f, t = random.sample(CURRENCIES, 2)
+        return build_request(host, f"/api/rate/{f}/{t}")
+
+    async def worker():
+        nonlocal errors
+        reader = writer = None
+        while True:
+            request = next_request()
+            if request is None:
+                break
+            started = time.perf_counter()
+            try:
+                if writer is None:
+                    reader, writer = await asyncio.open_connection(host, port)
+                writer.write(request)
+                await writer.drain()
+                status, keep_alive = await read_response(reader)
+                if status != 200:
+                    errors += 1
+            except (OSError, ValueError, IndexError, asyncio.IncompleteReadError):
+                errors += 1
+                keep_alive = False
+            latencies.append(time.perf_counter() - started)
+            if not keep_alive and writer is not None:
+                writer.close()
+                reader = writer = None
+        if writer is not None:
+            writer.close()
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return latencies, errors, time.perf_counter() - started
+
+
+def summarize(name, latencies, errors, elapsed):
+    latencies = sorted(latencies)
+
+    def pct(p):
+        return latencies[min(len(latencies) - 1, int(p / 100 * len(latencies)))] * 1000 if latencies else 0.0
+
+    return {
+        "mode": name,
+        "requests": len(latencies),
+        "errors": errors,
+        "seconds": round(elapsed, 3),
+        "requests_per_sec": round(len(latencies) / elapsed, 1) if elapsed else 0.0,
+        "p50_ms": round(pct(50), 1),
+        "p95_ms": round(pct(95), 1),
+        "p99_ms": round(pct(99), 1),
+        "max_ms": round(latencies[-1] * 1000, 1) if latencies else 0.0,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=500)
+    parser.add_argument("--delay", type=float, default=0.5, help="stub provider latency in seconds")
+    parser.add_argument("--threads", type=int, default=8, help="WSGI request threads")
+    parser.add_argument("--batch-every", type=int, default=0,
+                        help="make every Nth request a /api/convert/batch call (0 = rate lookups only)")
+    parser.add_argument("--batch-rows", type=int, default=1000)
+    parser.add_argument("--mode", choices=["both", "wsgi", "asgi"], default="both")
+    parser.add_argument("--json", help="also write the results to this file")
+    parser.add_argument("--serve", choices=["wsgi", "asgi"], help=argparse.SUPPRESS)
+    parser.add_argument("--port", type=int, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.serve:
+        serve(args.serve, args.port, args.delay, args.threads)
+        return
+
+    results = []
+    for kind in ("wsgi", "asgi"):
+        if args.mode not in ("both", kind):
+            continue
+        child, url = start_server(kind, args.delay, args.threads)
+        try:
+            name = f"wsgi ({args.threads} threads)" if kind == "wsgi" else "asgi"
+            results.append(summarize(name, *asyncio.run(
+                run_load(url, args.requests, args.concurrency, args.batch_every, args.batch_rows))))
+        finally:
+            child.kill()
+            child.wait()
+
+    print(f"{args.requests} requests, {args.concurrency} concurrent, upstream delay {args.delay}s")
+    print(f"{'mode':<20}{'req/s':>10}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'max ms':>10}{'errors':>8}")
+    for r in results:
+        print(f"{r['mode']:<20}{r['requests_per_sec']:>10}{r['p50_ms']:>10}{r['p95_ms']:>10}"
+              f"{r['p99_ms']:>10}{r['max_ms']:>10}{r['errors']:>8}")
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump({"args": vars(args), "results": results}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,74 @@
+"""
+Local stand-in for the exchange-rate providers, so benchmarks never touch the network.
+
+Serves exchangerate-api style responses ({"base": ..., "rates": {...}}) for
+any /latest/<BASE> path, optionally after an artificial delay. A request can
+override the delay with ?delay=<seconds> and ask for an error answer with
+?status=<code>; server.requests lists the paths served, for tests.
+"""
+
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+USD_RATES = {"USD": 1.0, "INR": 88.78, "EUR": 0.86, "GBP": 0.75, "JPY": 151.2}
+
+
+class _Handler(BaseHTTPRequestHandler):
+    delay = 0.0
+
+    def log_message(self, *args):
+        pass
+
+    def do_GET(self):
+        self.server.requests.append(self.path)
+        url = urlsplit(self.path)
+        query = parse_qs(url.query)
+        delay = float(query.get("delay", [self.delay])[0])
+        status = int(query.get("status", [200])[0])
+        if delay:
+            threading.Event().wait(delay)
+        base = url.path.rstrip("/").split("/")[-1].upper()
+        if base not in USD_RATES:
+            base = "USD"
+        rates = {code: value / USD_RATES[base] for code, value in USD_RATES.items()}
+        payload = {"base": base, "rates": rates} if status == 200 else {"message": f"stub status {status}"}
+        body = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+def start_stub_provider(delay=0.0):
+    """Start the stub on a free localhost port; returns (server, base_url)."""
+    handler = type("StubHandler", (_Handler,), {"delay": delay})
+    server = ThreadingHTTPServer(("127.0.0.1", 0), handler)
+    server.daemon_threads = True
+    server.requests = []
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_port}"
+
+
+def stub_pair_providers(base_url):
+    """Drop-in replacement for providers.pair_providers pointing at the stub."""
+    def build(from_currency, to_currency):
+        return [{
+            "name": "stub",
+            "url": f"{base_url}/latest/{from_currency}",
+            "extract": lambda r: r.get("rates", {}).get(to_currency),
+        }]
+    return build
+
+
+def stub_table_providers(base_url):
+    """Drop-in replacement for providers.table_providers pointing at the stub."""
+    def build(base):
+        return [{
+            "name": "stub",
+            "url": f"{base_url}/latest/{base}",
+            "extract": lambda r: r.get("rates"),
+        }]
+    return build
@@ -0,0 +1,339 @@
+"""
+Benchmark suite for the conversion, forecast, alert, analytics and persistence hot paths.
+
+Run from the repository root:
+    python benchmarks/suite.py [--only rate,http] [--sizes 1000,10000,100000,1000000]
+                               [--alerts 100,1000,10000] [--rounds 5] [--min-calls 5]
+                               [--json results.json] [--save benchmarks/results.jsonl]
+                               [--compare benchmarks/results.jsonl] [--max-regression 0.25]
+
+Benchmarks (select groups with --only):
+    rate       get_exchange_rate: answered from the cached rate table, and with
+               the cache dropped so every call fetches from the stub provider
+    http       POST / convert and forecast through the Flask test client
+    forecast   refresh_forecasts: the vectorized refit of every pair
+    analytics  HistoryAggregates rebuild and summary (compute_history_analytics)
+               on synthetic histories of --sizes rows
+    rollups    HistoryRollups rebuild and a /dashboard query on the same histories
+    alerts     evaluate_alerts and load_alerts with --alerts alerts
+    history    appending one conversion to a log already holding --sizes rows,
+               JSON Lines and SQLite
+
+Nothing touches the network: providers point at a local stub, SMS is in demo
+mode, and the app runs (JSON storage, no scheduler) in a temporary directory.
+10M-row histories need several GB of memory; pass them explicitly with --sizes.
+
+Each benchmark is warmed up with one call, then calibrated on the median of a
+few probe calls so one round runs for about --min-time seconds and at least
+--min-calls calls; even the slowest paths average several calls per round
+instead of timing one. The per-call median and minimum over --rounds rounds
+are reported. --save
+appends the run (with the git commit) to a JSON Lines file to track results
+over time, and --compare exits with status 1 when a median is more than
+--max-regression slower than in the last run saved to that file (or in a
+--json result file). Compare runs made on the same machine.
+"""
+
+import argparse
+import json
+import math
+import os
+import platform
+import random
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+GROUPS = ("rate", "http", "forecast", "analytics", "rollups", "alerts", "history")
+PAIRS = [("USD", "INR"), ("EUR", "USD"), ("GBP", "INR"), ("USD", "JPY"), ("EUR", "GBP"), ("INR", "USD")]
+# History the app itself starts with for the rate/http/forecast/alerts groups
+APP_HISTORY_ROWS = 10000
+# Calibration: the median of this many probes estimates one call's cost; calls
+# too fast to time alone are probed in batches lasting at least PROBE_TIME seconds
+CALIBRATION_PROBES = 5
+PROBE_TIME = 0.001
+
+# Used only when the repository has no templates: the request path minus page rendering
+STUB_TEMPLATE = "{{ result }} {{ history|length }} {{ notifications|length }} {{ forecast_summary }}"
+
+
+def synthetic_history(count, seed=0):
+    """`count` conversions across PAIRS and both modes, one every ~40 seconds ending now."""
+    rng = random.Random(seed)
+    start = datetime.now() - timedelta(seconds=40 * count)
+    entries = []
+    for i in range(count):
+        f, t = rng.choice(PAIRS)
+        amount = round(rng.uniform(1, 5000), 2)
+        entries.append({
+            "from": f,
+            "to": t,
+            "amount": amount,
+            "result": round(amount * 1.1, 2),
+            "rate": 1.1,
+            "mode": "live" if rng.random() < 0.8 else "simulated",
+            "time": (start + timedelta(seconds=40 * i)).strftime("%Y-%m-%d %H:%M:%S"),
+        })
+    return entries
+
+
+def synthetic_alerts(count, seed=0):
+    """Active alerts spread over PAIRS with targets the rate never reaches, so a pass fires nothing."""
+    rng = random.Random(seed)
+    return [{
+        "from": f,
+        "to": t,
+        "target_rate": round(rng.uniform(1e6, 2e6), 4),
+        "phone_number": f"+1555{i:07d}",
+        "created_at": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+        "triggered_at": None,
+        "sms_sent": False,
+        "weekly_high_notified": True,
+    } for i, (f, t) in ((i, rng.choice(PAIRS)) for i in range(count))]
+
+
+def calibrate(fn, min_time):
+    """Estimated seconds per call: the median of a few probes, batching calls too fast to time alone."""
+    batch = 1
+    while True:
+        probes = []
+        for _ in range(CALIBRATION_PROBES):
+            started = time.perf_counter()
+            for _ in range(batch):
+                fn()
+            probes.append(time.perf_counter() - started)
+            # A slow benchmark needs no more than one round's worth of probing
+            if sum(probes) >= min_time:
+                break
+        per_batch = statistics.median(probes)
+        if per_batch >= PROBE_TIME or batch >= 100_000:
+            return per_batch / batch
+        batch *= 10
+
+
+def measure(fn, rounds, min_time, min_calls=1):
+    """Per-call seconds for each of `rounds` rounds, and the calls per round (at least min_calls)."""
+    # Warm up separately, so a slow first call (imports, cache fills) doesn't skew calibration
+    fn()
+    per_call = calibrate(fn, min_time)
+    number = max(1, min_calls, min(1_000_000, math.ceil(min_time / per_call) if per_call > 0 else 1_000_000))
+    samples = []
+    for _ in range(rounds):
+        started = time.perf_counter()
+        for _ in range(number):
+            fn()
+        samples.append((time.perf_counter() - started) / number)
+    return samples, number
+
+
+def start_app(workdir):
+    """Import the app inside workdir against the stub provider; returns the app module."""
+    from stub_provider import start_stub_provider, stub_pair_providers, stub_table_providers
+
+    os.chdir(workdir)
+    os.environ["STORAGE_BACKEND"] = "json"
+    os.environ.setdefault("LOG_LEVEL", "WARNING")
+    with open("history.jsonl", "w", encoding="utf-8") as f:
+        f.writelines(json.dumps(e, ensure_ascii=False) + "\n" for e in synthetic_history(APP_HISTORY_ROWS))
+
+    import providers
+    _, stub_url = start_stub_provider()
+    providers.pair_providers = stub_pair_providers(stub_url)
+    providers.table_providers = stub_table_providers(stub_url)
+
+    import app as web
+    web.SMS_ENABLED = False
+    if not os.path.exists(os.path.join(web.app.root_path, web.app.template_folder, "index.html")):
+        print("[INFO] No templates in this checkout; page rendering is stubbed out")
+        os.makedirs("templates", exist_ok=True)
+        for name in ("index.html", "dashboard.html", "history.html", "forecast.html"):
+            with open(os.path.join("templates", name), "w", encoding="utf-8") as f:
+                f.write(STUB_TEMPLATE)
+        web.app.template_folder = os.path.abspath("templates")
+    web.create_app(with_scheduler=False)
+    return web
+
+
+def seed_alerts(web, alerts):
+    web.alert_store.file.save(alerts)
+    web.load_alerts()
+
+
+def app_benchmarks(web, groups, alert_sizes):
+    """(name, fn) pairs for the benchmarks that run against the app module."""
+    client = web.app.test_client()
+    convert = {"from_currency": "USD", "to_currency": "INR", "amount": "250", "mode": "live", "convert": "1"}
+    forecast = {"from_currency": "USD", "to_currency": "INR", "amount": "250", "mode": "live",
+                "days": "7", "forecast": "1"}
+
+    def fetch_rate():
+        web.rate_cache.invalidate()
+        web.get_exchange_rate("USD", "INR")
+
+    def post(form):
+        response = client.post("/", data=form)
+        assert response.status_code == 200, response.status_code
+
+    if "rate" in groups:
+        yield "rate.cached", lambda: web.get_exchange_rate("USD", "INR")
+        yield "rate.uncached", fetch_rate
+    if "http" in groups:
+        yield "http.convert", lambda: post(convert)
+        yield "http.forecast", lambda: post(forecast)
+    if "forecast" in groups:
+        yield "forecast.refresh_all", web.refresh_forecasts
+    if "alerts" in groups:
+        for size in alert_sizes:
+            seed_alerts(web, synthetic_alerts(size))
+            yield f"alerts.evaluate[{size}]", web.evaluate_alerts
+            yield f"alerts.load[{size}]", web.load_alerts
+        seed_alerts(web, [])
+
+
+def history_benchmarks(workdir, groups, sizes):
+    """(name, fn) pairs for the benchmarks on synthetic histories, smallest first."""
+    from analytics import HistoryAggregates
+    from history_store import HistoryLog
+    from rollups import HistoryRollups
+    from storage import SqliteDatabase, SqliteHistoryStore
+
+    for size in sizes:
+        entries = synthetic_history(size)
+        if "analytics" in groups:
+            aggregates = HistoryAggregates(path=os.path.join(workdir, f"aggregates-{size}.json"))
+            yield f"analytics.rebuild[{size}]", lambda: aggregates.rebuild(entries)
+            yield f"analytics.summary[{size}]", aggregates.summary
+        if "rollups" in groups:
+            rollups = HistoryRollups()
+            yield f"rollups.rebuild[{size}]", lambda: rollups.rebuild(entries)
+            end = datetime.strptime(entries[-1]["time"], "%Y-%m-%d %H:%M:%S")
+            yield f"rollups.dashboard[{size}]", lambda: rollups.dashboard("day", end - timedelta(days=90), end)
+        if "history" in groups:
+            entry = dict(entries[-1])
+            path = os.path.join(workdir, f"history-{size}.jsonl")
+            with open(path, "w", encoding="utf-8") as f:
+                f.writelines(json.dumps(e, ensure_ascii=False) + "\n" for e in entries)
+            log = HistoryLog(path, legacy_path=None, compact_every=0)
+            log.entries()
+            yield f"history.append.json[{size}]", lambda: log.append(entry)
+            store = SqliteHistoryStore(SqliteDatabase(os.path.join(workdir, f"history-{size}.db"), migrate=False),
+                                       compact_every=0)
+            store.append_many(entries)
+            yield f"history.append.sqlite[{size}]", lambda: store.append(entry)
+        del entries
+
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT,
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except Exception:
+        return None
+
+
+def load_baseline(path):
+    """The results of a --json file, or of the last run in a --save file."""
+    with open(path, "r", encoding="utf-8") as f:
+        text = f.read().strip()
+    if not text:
+        return None
+    try:
+        return json.loads(text)
+    except json.JSONDecodeError:
+        return json.loads(text.splitlines()[-1])
+
+
+def fmt(seconds):
+    for unit, scale in (("s", 1), ("ms", 1e-3), ("us", 1e-6)):
+        if seconds >= scale:
+            return f"{seconds / scale:.3g} {unit}"
+    return f"{seconds / 1e-9:.3g} ns"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--only", help=f"comma-separated groups ({', '.join(GROUPS)})")
+    parser.add_argument("--sizes", default="1000,10000,100000,1000000", help="history rows")
+    parser.add_argument("--alerts", default="100,1000,10000", help="alert counts")
+    parser.add_argument("--rounds", type=int, default=5)
+    parser.add_argument("--min-time", type=float, default=0.2, help="minimum seconds per round")
+    parser.add_argument("--min-calls", type=int, default=5, help="minimum calls per round")
+    parser.add_argument("--json", help="write this run's results to this file")
+    parser.add_argument("--save", help="append this run to this JSON Lines file")
+    parser.add_argument("--compare", help="baseline: a --json file or a --save file (its last run)")
+    parser.add_argument("--max-regression", type=float, default=0.25,
+                        help="fail when a median is this fraction slower than the baseline")
+    args = parser.parse_args()
+
+    groups = set(args.only.split(",")) if args.only else set(GROUPS)
+    unknown = groups - set(GROUPS)
+    if unknown:
+        parser.error(f"unknown group(s): {', '.join(sorted(unknown))}")
+    sizes = [int(s) for s in args.sizes.split(",") if s]
+    alert_sizes = [int(s) for s in args.alerts.split(",") if s]
+    # Read before the run, so --save and --compare can name the same file
+    baseline = load_baseline(args.compare) if args.compare and os.path.exists(args.compare) else None
+    if args.compare and baseline is None:
+        print(f"[WARN] No baseline in {args.compare}; nothing to compare against")
+    out_paths = [os.path.abspath(p) if p else None for p in (args.json, args.save)]
+
+    workdir = tempfile.mkdtemp(prefix="bench-")
+    benchmarks = history_benchmarks(workdir, groups, sizes)
+    if groups & {"rate", "http", "forecast", "alerts"}:
+        web = start_app(workdir)
+        benchmarks = (b for source in (app_benchmarks(web, groups, alert_sizes), benchmarks) for b in source)
+
+    previous = (baseline or {}).get("results", {})
+    results = {}
+    regressions = []
+    print(f"{'benchmark':<34}{'calls':>9}{'median':>12}{'min':>12}{'vs baseline':>14}")
+    for name, fn in benchmarks:
+        samples, number = measure(fn, args.rounds, args.min_time, args.min_calls)
+        result = {
+            "median_s": statistics.median(samples),
+            "min_s": min(samples),
+            "rounds": len(samples),
+            "calls_per_round": number,
+        }
+        results[name] = result
+        change = ""
+        if name in previous:
+            ratio = result["median_s"] / previous[name]["median_s"]
+            change = f"{ratio:.2f}x"
+            if ratio > 1 + args.max_regression:
+                change += " !"
+                regressions.append((name, ratio))
+        print(f"{name:<34}{number:>9}{fmt(result['median_s']):>12}{fmt(result['min_s']):>12}{change:>14}")
+
+    run = {
+        "time": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+        "commit": git_commit(),
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "args": {"sizes": sizes, "alerts": alert_sizes, "rounds": args.rounds, "min_time": args.min_time,
+                 "min_calls": args.min_calls},
+        "results": results,
+    }
+    json_path, save_path = out_paths
+    if json_path:
+        with open(json_path, "w", encoding="utf-8") as f:
+            json.dump(run, f, indent=2)
+    if save_path:
+        with open(save_path, "a", encoding="utf-8") as f:
+            f.write(json.dumps(run) + "\n")
+
+    if regressions:
+        for name, ratio in regressions:
+            print(f"[WARN] {name} is {ratio:.2f}x its baseline median "
+                  f"(limit {1 + args.max_regression:.2f}x)")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
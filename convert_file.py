@@ -0,0 +1,202 @@
+#!/usr/bin/env python3
+"""
+Offline bulk conversion for large ledgers.
+
+Streams a CSV or Parquet file through fixed-size chunks, converts every row
+against one snapshot of the rate matrix and writes the rows back out in the
+same format with `rate` (rounded to 6 decimals, like the app) and
+`converted` columns appended. Memory use is bounded by the chunk size, not
+the file size.
+
+Rates come from FALLBACK_RATES overlaid with the last known rates in
+rate_history.json and then the app's rate snapshot (rate_snapshot.bin), so
+no network access is needed.
+
+    python convert_file.py ledger.csv ledger_converted.csv
+    python convert_file.py ledger.parquet out.parquet --to USD --chunk-size 200000
+"""
+
+import argparse
+import csv
+import json
+import os
+import sys
+import time
+
+import numpy as np
+
+from currencies import CURRENCIES, FALLBACK_RATES
+from rate_matrix import RateMatrix, convert_arrays
+from snapshot import SNAPSHOT_FILE, RateSnapshot
+
+# Parquet support is optional
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+    PARQUET_AVAILABLE = True
+except ImportError:
+    PARQUET_AVAILABLE = False
+
+DEFAULT_CHUNK_SIZE = 50000
+DEFAULT_RATES_FILE = "rate_history.json"
+
+
+def offline_matrix(rates_path=DEFAULT_RATES_FILE, snapshot_path=SNAPSHOT_FILE):
+    """
+    Rate matrix from FALLBACK_RATES with the {"FROM_TO": rate} entries of
+    rates_path laid over it (inverse pairs are filled in when not listed),
+    then every pair the rate snapshot at snapshot_path has.
+    """
+    nested = {code: dict(row) for code, row in FALLBACK_RATES.items()}
+    source = "fallback"
+    if rates_path and os.path.exists(rates_path):
+        try:
+            with open(rates_path, "r", encoding="utf-8") as f:
+                observed = json.load(f)
+            pairs = {}
+            for key, value in observed.items():
+                f_code, _, t_code = key.partition("_")
+                value = float(value)
+                if f_code != t_code and value > 0:
+                    pairs[(f_code, t_code)] = value
+            for (f_code, t_code), value in pairs.items():
+                nested.setdefault(f_code, {})[t_code] = value
+                if (t_code, f_code) not in pairs:
+                    nested.setdefault(t_code, {})[f_code] = 1 / value
+            source = f"fallback+{rates_path}"
+        except Exception as e:
+            print(f"[WARN] Failed to load {rates_path}: {e}", file=sys.stderr)
+    snapshot = RateSnapshot(snapshot_path) if snapshot_path else None
+    if snapshot is not None and snapshot.load():
+        for f_code in CURRENCIES:
+            for t_code in CURRENCIES:
+                value = snapshot.rate(f_code, t_code)
+                if f_code != t_code and value is not None:
+                    nested.setdefault(f_code, {})[t_code] = value
+        source += f"+{snapshot_path}"
+    matrix = RateMatrix(CURRENCIES)
+    matrix.load_nested(nested, source=source)
+    return matrix
+
+
+def convert_chunk(matrix, snapshot, froms, tos, amounts):
+    """Vectorized conversion of one chunk; returns (rates, results, valid)."""
+    froms = [str(code).strip().upper() for code in froms]
+    tos = [str(code).strip().upper() for code in tos]
+    return convert_arrays(snapshot, matrix.indices(froms), matrix.indices(tos), amounts)
+
+
+def _parse_amount(value):
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return float("nan")
+
+
+def convert_csv(in_path, out_path, matrix, from_col="from", to_col="to", amount_col="amount",
+                target=None, chunk_size=DEFAULT_CHUNK_SIZE):
+    """Stream a CSV file through convert_chunk. Returns (rows, converted)."""
+    snapshot = matrix.snapshot()
+    total = converted = 0
+    with open(in_path, "r", newline="", encoding="utf-8") as src, \
+            open(out_path, "w", newline="", encoding="utf-8") as dst:
+        reader = csv.reader(src)
+        header = next(reader, None)
+        if header is None:
+            return 0, 0
+        columns = {name: i for i, name in enumerate(header)}
+        for name in (from_col, amount_col) + (() if target else (to_col,)):
+            if name not in columns:
+                raise ValueError(f"Column '{name}' not found in {in_path}")
+        fi, ai = columns[from_col], columns[amount_col]
+        ti = None if target else columns[to_col]
+        width = len(header)
+
+        writer = csv.writer(dst)
+        writer.writerow(header + ["rate", "converted"])
+        while True:
+            chunk = [row for _, row in zip(range(chunk_size), reader)]
+            if not chunk:
+                break
+            froms = [row[fi] if fi < len(row) else "" for row in chunk]
+            tos = [target] * len(chunk) if target else [row[ti] if ti < len(row) else "" for row in chunk]
+            amounts = [_parse_amount(row[ai]) if ai < len(row) else float("nan") for row in chunk]
+            rates, results, valid = convert_chunk(matrix, snapshot, froms, tos, amounts)
+            # Rows are padded (or their extra fields moved after) so rate/converted line up with the header
+            writer.writerows(
+                row[:width] + [""] * (width - len(row))
+                + ([str(round(float(rates[i]), 6)), f"{results[i]:.2f}"] if valid[i] else ["", ""])
+                + row[width:]
+                for i, row in enumerate(chunk)
+            )
+            total += len(chunk)
+            converted += int(valid.sum())
+    return total, converted
+
+
+def convert_parquet(in_path, out_path, matrix, from_col="from", to_col="to", amount_col="amount",
+                    target=None, chunk_size=DEFAULT_CHUNK_SIZE):
+    """Stream a Parquet file batch by batch through convert_chunk. Returns (rows, converted)."""
+    if not PARQUET_AVAILABLE:
+        raise RuntimeError("Parquet support needs pyarrow (pip install pyarrow)")
+    snapshot = matrix.snapshot()
+    total = converted = 0
+    source = pq.ParquetFile(in_path)
+    writer = None
+    try:
+        for batch in source.iter_batches(batch_size=chunk_size):
+            froms = batch.column(from_col).to_pylist()
+            tos = [target] * batch.num_rows if target else batch.column(to_col).to_pylist()
+            amounts = batch.column(amount_col).cast(pa.float64()).to_numpy(zero_copy_only=False)
+            rates, results, valid = convert_chunk(matrix, snapshot, froms, tos, amounts)
+            out = pa.Table.from_batches([batch])
+            out = out.append_column("rate", pa.array(np.where(valid, np.round(rates, 6), np.nan), mask=~valid))
+            out = out.append_column("converted", pa.array(np.where(valid, results, np.nan), mask=~valid))
+            if writer is None:
+                writer = pq.ParquetWriter(out_path, out.schema)
+            writer.write_table(out)
+            total += batch.num_rows
+            converted += int(valid.sum())
+    finally:
+        if writer is not None:
+            writer.close()
+    return total, converted
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Convert the amounts in a large CSV or Parquet file offline.")
+    parser.add_argument("input", help="input .csv or .parquet file")
+    parser.add_argument("output", help="output file (written in the input's format)")
+    parser.add_argument("--from-col", default="from", help="source currency column (default: from)")
+    parser.add_argument("--to-col", default="to", help="target currency column (default: to)")
+    parser.add_argument("--amount-col", default="amount", help="amount column (default: amount)")
+    parser.add_argument("--to", dest="target", help="convert every row to this currency instead of --to-col")
+    parser.add_argument("--chunk-size", type=int, default=DEFAULT_CHUNK_SIZE, help="rows per chunk")
+    parser.add_argument("--rates", default=DEFAULT_RATES_FILE,
+                        help="last known {FROM_TO: rate} file laid over the fallback rates")
+    parser.add_argument("--snapshot", default=SNAPSHOT_FILE,
+                        help=f"rate snapshot laid over both (default: {SNAPSHOT_FILE}; '' to skip)")
+    args = parser.parse_args(argv)
+
+    parquet = args.input.lower().endswith((".parquet", ".pq"))
+    matrix = offline_matrix(args.rates, args.snapshot)
+    target = args.target.upper() if args.target else None
+    convert = convert_parquet if parquet else convert_csv
+
+    started = time.perf_counter()
+    try:
+        total, converted = convert(args.input, args.output, matrix, args.from_col, args.to_col,
+                                   args.amount_col, target, max(1, args.chunk_size))
+    except (ValueError, KeyError, RuntimeError, OSError) as e:
+        print(f"[ERROR] {e}", file=sys.stderr)
+        return 1
+    elapsed = time.perf_counter() - started
+
+    rate = total / elapsed if elapsed > 0 else float("inf")
+    print(f"[INFO] {total} rows ({converted} converted, {total - converted} skipped) "
+          f"in {elapsed:.2f}s - {rate:,.0f} rows/sec")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
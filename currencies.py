@@ -0,0 +1,17 @@
+"""
+Supported currencies and the static fallback rates.
+
+Kept free of Flask and network imports so offline tools (convert_file.py)
+can share them with the web app.
+"""
+
+CURRENCIES = ["USD", "INR", "EUR", "GBP", "JPY"]
+
+# Fallback exchange rates (approximate, as of 2025)
+FALLBACK_RATES = {
+    "USD": {"INR": 88, "EUR": 0.92, "GBP": 0.79, "JPY": 146},
+    "INR": {"USD": 0.011, "EUR": 0.010, "GBP": 0.0090, "JPY": 1.65},
+    "EUR": {"USD": 1.09, "INR": 96, "GBP": 0.86, "JPY": 159},
+    "GBP": {"USD": 1.27, "INR": 112, "EUR": 1.16, "JPY": 185},
+    "JPY": {"USD": 0.0068, "INR": 0.61, "EUR": 0.0063, "GBP": 0.0054},
+}
@@ -0,0 +1,187 @@
+"""
+Vectorized multi-horizon rate forecasts.
+
+Every model works on a (pairs, days) array of daily closes, so all pairs in
+CURRENCIES are fitted and simulated together:
+
+- EWMA level (flat forecast)
+- Holt-Winters with damped trend, plus an additive seasonal term when a
+  season length is given and at least two seasons of data exist
+- AR(1) on daily log returns, simulated as Monte Carlo paths (with phi = 0 and
+  no history this is a plain geometric random walk / GBM)
+
+The point forecast is the average of the three model means; the confidence
+band comes from the Monte Carlo percentiles.
+"""
+
+import os
+
+import numpy as np
+
+
+FORECAST_PATHS = int(os.getenv("FORECAST_PATHS", "2000"))
+FORECAST_CONFIDENCE = float(os.getenv("FORECAST_CONFIDENCE", "0.90"))
+# Daily log-return volatility assumed when a pair has too little history (~0.4%/day)
+DEFAULT_DAILY_VOLATILITY = 0.004
+MIN_RETURNS_FOR_FIT = 3
+
+EWMA_ALPHA = 0.3
+HW_ALPHA = 0.5
+HW_BETA = 0.1
+HW_GAMMA = 0.1
+HW_DAMPING = 0.9
+
+
+def align_histories(histories):
+    """
+    Stack {pair: closes} into (keys, array of shape (pairs, days), lengths).
+    Shorter series are left-padded with their first close; lengths holds the
+    real number of closes per row.
+    """
+    keys = list(histories)
+    series = [np.asarray(histories[k], dtype=float).ravel() for k in keys]
+    for key, s in zip(keys, series):
+        if s.size == 0:
+            raise ValueError(f"No history for {key}")
+        if np.any(s <= 0) or np.any(~np.isfinite(s)):
+            raise ValueError(f"History for {key} must be positive and finite")
+    days = max(s.size for s in series) if series else 0
+    out = np.empty((len(series), days))
+    for i, s in enumerate(series):
+        out[i, days - s.size:] = s
+        out[i, :days - s.size] = s[0]
+    lengths = np.array([s.size for s in series], dtype=int)
+    return keys, out, lengths
+
+
+def ewma_level(series, alpha=EWMA_ALPHA):
+    """Exponentially weighted level of each row, as one matrix-vector product."""
+    days = series.shape[1]
+    weights = alpha * (1 - alpha) ** np.arange(days - 1, -1, -1)
+    # The oldest observation carries the remaining weight so the weights sum to 1
+    weights[0] = (1 - alpha) ** (days - 1)
+    return series @ weights
+
+
+def holt_winters(series, horizon, alpha=HW_ALPHA, beta=HW_BETA, gamma=HW_GAMMA,
+                 damping=HW_DAMPING, season_length=None):
+    """Damped-trend Holt-Winters forecast, shape (pairs, horizon)."""
+    pairs, days = series.shape
+    seasonal = season_length is not None and season_length > 1 and days >= 2 * season_length
+    level = series[:, 0].copy()
+    trend = series[:, 1] - series[:, 0] if days > 1 else np.zeros(pairs)
+    if seasonal:
+        first = series[:, :season_length]
+        season = first - first.mean(axis=1, keepdims=True)
+    for t in range(1, days):
+        y = series[:, t]
+        previous = level
+        if seasonal:
+            s = t % season_length
+            level = alpha * (y - season[:, s]) + (1 - alpha) * (previous + damping * trend)
+            season[:, s] = gamma * (y - level) + (1 - gamma) * season[:, s]
+        else:
+            level = alpha * y + (1 - alpha) * (previous + damping * trend)
+        trend = beta * (level - previous) + (1 - beta) * damping * trend
+
+    damped_steps = np.cumsum(damping ** np.arange(1, horizon + 1))
+    forecast = level[:, None] + trend[:, None] * damped_steps[None, :]
+    if seasonal:
+        idx = (days - 1 + np.arange(1, horizon + 1)) % season_length
+        forecast = forecast + season[:, idx]
+    return forecast
+
+
+def fit_ar1(series, lengths):
+    """
+    Per-row AR(1) fit on daily log returns, ignoring left padding.
+    Rows with fewer than MIN_RETURNS_FOR_FIT returns get mu = phi = 0 and the
+    default volatility. Returns (mu, phi, sigma, last_return).
+    """
+    pairs, days = series.shape
+    returns = np.diff(np.log(series), axis=1)
+    if returns.shape[1] == 0:
+        zeros = np.zeros(pairs)
+        return zeros, zeros, np.full(pairs, DEFAULT_DAILY_VOLATILITY), zeros
+    n = lengths - 1
+    # mask[i, t] is True for returns that come from real (unpadded) closes
+    mask = np.arange(returns.shape[1])[None, :] >= (days - lengths)[:, None]
+    count = np.maximum(n, 1)
+    mu = np.where(mask, returns, 0.0).sum(axis=1) / count
+    centered = np.where(mask, returns - mu[:, None], 0.0)
+    denom = (centered ** 2).sum(axis=1)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        phi = np.where(denom > 0, (centered[:, 1:] * centered[:, :-1]).sum(axis=1) / denom, 0.0)
+        sigma = np.sqrt(denom / np.maximum(n - 1, 1))
+    phi = np.clip(phi, -0.99, 0.99)
+
+    enough = n >= MIN_RETURNS_FOR_FIT
+    mu = np.where(enough, mu, 0.0)
+    phi = np.where(enough, phi, 0.0)
+    # Short or flat histories would give zero-width bands; use the default volatility instead
+    sigma = np.where(enough & (sigma > 0), sigma, DEFAULT_DAILY_VOLATILITY)
+    last_return = np.where(enough, returns[:, -1], 0.0)
+    return mu, phi, sigma, last_return
+
+
+def simulate_paths(last_close, mu, phi, sigma, last_return, horizon, paths=FORECAST_PATHS, seed=None):
+    """
+    AR(1) log-return Monte Carlo paths, shape (horizon, pairs, paths).
+    Steps are the outer axis so every update works on one contiguous block.
+    """
+    rng = np.random.default_rng(seed)
+    returns = rng.standard_normal((horizon, last_close.size, paths))
+    returns *= sigma[None, :, None]
+    mu_b = mu[:, None]
+    phi_b = phi[:, None]
+    previous = last_return[:, None]
+    for h in range(horizon):
+        returns[h] += mu_b + phi_b * (previous - mu_b)
+        previous = returns[h]
+    np.cumsum(returns, axis=0, out=returns)
+    np.exp(returns, out=returns)
+    returns *= last_close[None, :, None]
+    return returns
+
+
+def forecast_pairs(histories, horizon=7, paths=FORECAST_PATHS, confidence=FORECAST_CONFIDENCE,
+                   season_length=None, seed=None):
+    """
+    Forecast every pair in {pair: daily closes} over `horizon` days.
+    Returns {pair: {"point", "lower", "upper", "ewma", "holt_winters",
+    "monte_carlo", "volatility", "observations"}} with NumPy arrays of length horizon.
+    """
+    if horizon < 1:
+        raise ValueError("horizon must be at least 1")
+    keys, series, lengths = align_histories(histories)
+    if not keys:
+        return {}
+
+    ewma = ewma_level(series)
+    hw = holt_winters(series, horizon, season_length=season_length)
+    mu, phi, sigma, last_return = fit_ar1(series, lengths)
+    simulated = simulate_paths(series[:, -1], mu, phi, sigma, last_return, horizon, paths, seed)
+
+    tail = (1 - confidence) / 2 * 100
+    lower, upper = np.percentile(simulated, [tail, 100 - tail], axis=2).transpose(0, 2, 1)
+    mc_mean = simulated.mean(axis=2).T
+    point = (ewma[:, None] + hw + mc_mean) / 3
+
+    results = {}
+    for i, key in enumerate(keys):
+        results[key] = {
+            "point": point[i],
+            "lower": lower[i],
+            "upper": upper[i],
+            "ewma": np.full(horizon, ewma[i]),
+            "holt_winters": hw[i],
+            "monte_carlo": mc_mean[i],
+            "volatility": float(sigma[i]),
+            "observations": int(lengths[i]),
+        }
+    return results
+
+
+def forecast_series(closes, horizon=7, **kwargs):
+    """Single-series convenience wrapper around forecast_pairs."""
+    return forecast_pairs({"series": closes}, horizon, **kwargs)["series"]
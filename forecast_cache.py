@@ -0,0 +1,85 @@
+"""
+Precomputed per-pair rate forecasts.
+
+A scheduled job fits every pair at once and stores the result here, keyed by
+(from, to), with a version number that increases on every refresh. Requests
+read the cached rate path, take the first `days` steps and scale them by the
+amount. Nothing is fitted on the request path unless a pair is missing or the
+requested horizon is longer than the cached one. The cache holds at most
+FORECAST_CACHE_MAX_ENTRIES pairs, evicting the least recently used.
+"""
+
+import os
+import threading
+import time
+from collections import OrderedDict
+
+
+FORECAST_CACHE_MAX_ENTRIES = int(os.getenv("FORECAST_CACHE_MAX_ENTRIES", "256"))
+
+
+class ForecastCache:
+    """Versioned {(from, to): forecast} store with LRU eviction."""
+
+    def __init__(self, max_entries=FORECAST_CACHE_MAX_ENTRIES):
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+        self.max_entries = max(1, max_entries)
+        self.version = 0
+
+    def replace_all(self, forecasts, base_rates, horizon):
+        """Swap in a full refresh: forecasts {pair: result}, base_rates {pair: rate fitted from}."""
+        with self._lock:
+            self.version += 1
+            generated_at = time.time()
+            self._entries = OrderedDict(
+                (pair, self._entry(result, base_rates[pair], horizon, generated_at))
+                for pair, result in forecasts.items()
+            )
+            self._evict()
+            return self.version
+
+    def put(self, pair, result, base_rate, horizon):
+        """Store one pair computed on demand, stamped with the current version."""
+        with self._lock:
+            self._entries[pair] = self._entry(result, base_rate, horizon, time.time())
+            self._entries.move_to_end(pair)
+            self._evict()
+
+    def _evict(self):
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def _entry(self, result, base_rate, horizon, generated_at):
+        return {
+            "version": self.version,
+            "generated_at": generated_at,
+            "base_rate": base_rate,
+            "horizon": horizon,
+            "point": [float(v) for v in result["point"]],
+            "lower": [float(v) for v in result["lower"]],
+            "upper": [float(v) for v in result["upper"]],
+            "volatility": float(result["volatility"]),
+        }
+
+    def get(self, pair, days):
+        """
+        Cached forecast for pair truncated to `days` steps, or None when the
+        pair is missing or its cached horizon is too short.
+        """
+        with self._lock:
+            entry = self._entries.get(pair)
+            if entry is not None:
+                self._entries.move_to_end(pair)
+        if entry is None or entry["horizon"] < days:
+            return None
+        return {
+            **entry,
+            "point": entry["point"][:days],
+            "lower": entry["lower"][:days],
+            "upper": entry["upper"][:days],
+        }
+
+    def stats(self):
+        with self._lock:
+            return {"version": self.version, "pairs": len(self._entries)}
@@ -0,0 +1,275 @@
+"""
+Daily historical exchange rates, backfilled in bulk and looked up by date.
+
+The history is stored column-wise in HISTORICAL_RATES_FILE (.npz): a sorted
+array of date ordinals and, for each date, one float64 row with the units
+of every currency in CURRENCIES per 1 HISTORICAL_BASE (NaN when unknown).
+Any pair's rate on a date is the ratio of two cells of that row. An as-of
+lookup is a binary search (np.searchsorted) for the last date on or before
+the requested one, so weekends and holidays get the previous business day's
+rate, up to HISTORICAL_MAX_GAP_DAYS back.
+
+Backfills ask the history providers for a whole date range per request
+(HISTORICAL_CHUNK_DAYS days of the base currency), not one call per day
+and pair. The scheduler leader extends the history to today once a day.
+Other processes reload the file when it changes, checking at most every
+HISTORICAL_CHECK_INTERVAL seconds.
+
+    python historical.py backfill [--days 365 | --start 2024-01-01 --end 2024-12-31]
+    python historical.py backfill --from-file recorded.json   # replay saved provider responses, no network
+    python historical.py show [--pair USD-INR] [--date 2024-06-03]
+"""
+
+import argparse
+import json
+import os
+import sys
+import threading
+import time
+from datetime import date, timedelta
+
+import numpy as np
+
+import providers
+from currencies import CURRENCIES
+
+
+HISTORICAL_RATES_FILE = os.getenv("HISTORICAL_RATES_FILE", "historical_rates.npz")
+HISTORICAL_BASE = "USD"
+HISTORICAL_BACKFILL_DAYS = int(os.getenv("HISTORICAL_BACKFILL_DAYS", "365"))
+HISTORICAL_CHUNK_DAYS = 365
+HISTORICAL_MAX_GAP_DAYS = 7
+HISTORICAL_CHECK_INTERVAL = float(os.getenv("HISTORICAL_CHECK_INTERVAL", "60"))
+
+
+def parse_day(value):
+    """date from 'YYYY-MM-DD' (raises ValueError)."""
+    return date.fromisoformat(str(value)[:10])
+
+
+class HistoricalRates:
+    """Date-indexed base-currency rate rows with as-of lookups."""
+
+    def __init__(self, path=HISTORICAL_RATES_FILE, currencies=CURRENCIES, base=HISTORICAL_BASE,
+                 check_interval=HISTORICAL_CHECK_INTERVAL):
+        self.path = path
+        self.currencies = list(currencies)
+        self.index = {code: i for i, code in enumerate(self.currencies)}
+        self.base = base
+        self.check_interval = check_interval
+        self._lock = threading.Lock()
+        # Replaced together, never modified in place, so readers can use the pair without the lock
+        self._days = np.zeros(0, dtype=np.int32)
+        self._rates = np.zeros((0, len(self.currencies)))
+        self._file_key = None
+        self._checked_at = None
+
+    def load(self):
+        """(Re)load the file if it changed since the last load."""
+        with self._lock:
+            self._checked_at = time.monotonic()
+            try:
+                st = os.stat(self.path)
+            except FileNotFoundError:
+                return
+            key = (st.st_ino, st.st_mtime_ns, st.st_size)
+            if key == self._file_key:
+                return
+            self._file_key = key
+            try:
+                with np.load(self.path) as data:
+                    days, codes, rates = data["days"], list(data["codes"]), data["rates"]
+            except Exception as e:
+                print(f"[WARN] Failed to load {self.path}: {e}")
+                return
+            # Columns follow CURRENCIES even if the file was written with another list
+            columns = np.full((len(days), len(self.currencies)), np.nan)
+            for k, code in enumerate(codes):
+                i = self.index.get(str(code))
+                if i is not None:
+                    columns[:, i] = rates[:, k]
+            self._days, self._rates = days.astype(np.int32), columns
+
+    def _current(self):
+        if self._checked_at is None or time.monotonic() - self._checked_at >= self.check_interval:
+            self.load()
+        return self._days, self._rates
+
+    def save(self):
+        tmp_path = f"{self.path}.{os.getpid()}.tmp"
+        with self._lock:
+            days, rates = self._days, self._rates
+            # A file object, so numpy doesn't append .npz to the temp name
+            with open(tmp_path, "wb") as f:
+                np.savez(f, days=days, codes=np.array(self.currencies), rates=rates)
+            os.replace(tmp_path, self.path)
+            st = os.stat(self.path)
+            self._file_key = (st.st_ino, st.st_mtime_ns, st.st_size)
+
+    def merge(self, tables):
+        """Add or update days from {"YYYY-MM-DD": {quote: rate}} tables quoted against the base. Returns the days merged."""
+        rows = {}
+        for day, table in tables.items():
+            try:
+                ordinal = parse_day(day).toordinal()
+            except ValueError:
+                continue
+            if not isinstance(table, dict):
+                continue
+            row = np.full(len(self.currencies), np.nan)
+            for code, i in self.index.items():
+                value = 1.0 if code == self.base else table.get(code)
+                try:
+                    value = float(value)
+                except (TypeError, ValueError):
+                    continue
+                if value > 0:
+                    row[i] = value
+            if np.count_nonzero(~np.isnan(row)) > 1:
+                rows[ordinal] = row
+        if not rows:
+            return 0
+        self._current()
+        with self._lock:
+            merged = dict(zip(self._days.tolist(), self._rates))
+            for ordinal, row in rows.items():
+                old = merged.get(ordinal)
+                merged[ordinal] = row if old is None else np.where(np.isnan(row), old, row)
+            ordered = sorted(merged)
+            self._days = np.array(ordered, dtype=np.int32)
+            self._rates = np.vstack([merged[d] for d in ordered])
+        return len(rows)
+
+    def rate_on(self, from_currency, to_currency, as_of):
+        """(rate, date it was quoted) for the last stored date on or before as_of, or None."""
+        i, j = self.index.get(from_currency), self.index.get(to_currency)
+        if i is None or j is None:
+            return None
+        days, rates = self._current()
+        target = as_of.toordinal()
+        k = int(np.searchsorted(days, target, side="right")) - 1
+        # Step back over days that lack either currency, within the gap limit
+        while k >= 0 and target - days[k] <= HISTORICAL_MAX_GAP_DAYS:
+            value = rates[k, j] / rates[k, i]
+            if not np.isnan(value):
+                return float(value), date.fromordinal(int(days[k]))
+            k -= 1
+        return None
+
+    def rate(self, from_currency, to_currency, as_of):
+        found = self.rate_on(from_currency, to_currency, as_of)
+        return found[0] if found else None
+
+    def window_high(self, from_currency, to_currency, days=7, end=None):
+        """Highest daily rate over the `days` days ending at `end` (default today), or None."""
+        i, j = self.index.get(from_currency), self.index.get(to_currency)
+        if i is None or j is None:
+            return None
+        stored, rates = self._current()
+        end = (end or date.today()).toordinal()
+        lo = int(np.searchsorted(stored, end - days + 1, side="left"))
+        hi = int(np.searchsorted(stored, end, side="right"))
+        values = rates[lo:hi, j] / rates[lo:hi, i]
+        values = values[~np.isnan(values)]
+        return float(values.max()) if len(values) else None
+
+    def coverage(self):
+        """(first date, last date, stored days), or None when empty."""
+        days, _ = self._current()
+        if not len(days):
+            return None
+        return date.fromordinal(int(days[0])), date.fromordinal(int(days[-1])), len(days)
+
+    def backfill(self, start=None, end=None, fetch=None):
+        """
+        Fetch and store every day from start (default: the day after the last
+        stored one, or HISTORICAL_BACKFILL_DAYS ago) to end (default today),
+        one provider request per HISTORICAL_CHUNK_DAYS. Returns the days stored.
+        fetch(base, start, end) -> {date: {quote: rate}} replaces the providers.
+        """
+        fetch = fetch or fetch_history
+        end = end or date.today()
+        if start is None:
+            covered = self.coverage()
+            start = covered[1] + timedelta(days=1) if covered else end - timedelta(days=HISTORICAL_BACKFILL_DAYS - 1)
+        stored = 0
+        chunk_start = start
+        while chunk_start <= end:
+            chunk_end = min(end, chunk_start + timedelta(days=HISTORICAL_CHUNK_DAYS - 1))
+            tables = fetch(self.base, chunk_start, chunk_end)
+            if tables is None:
+                print(f"[WARN] No historical rates for {chunk_start}..{chunk_end}")
+            else:
+                stored += self.merge(tables)
+            chunk_start = chunk_end + timedelta(days=1)
+        if stored:
+            self.save()
+        return stored
+
+
+def fetch_history(base, start, end):
+    """{date: {quote: rate}} for base from start to end from the first working history provider, or None."""
+    return providers.fetch_first(providers.history_providers(base, start.isoformat(), end.isoformat()),
+                                 valid=providers.valid_series, mode="sequential")
+
+
+def read_recorded(path):
+    """
+    Day tables from saved provider responses: one response object, or a list
+    of them, as returned by the history providers (a "rates" mapping of days).
+    """
+    with open(path, "r", encoding="utf-8") as f:
+        data = json.load(f)
+    tables = {}
+    for response in data if isinstance(data, list) else [data]:
+        tables.update(response.get("rates", {}))
+    return tables
+
+
+# Shared store used by app.get_exchange_rate(as_of=...)
+historical_rates = HistoricalRates()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Historical exchange-rate store.")
+    parser.add_argument("command", choices=["backfill", "show"],
+                        help="backfill: fetch daily rates into the store; show: print its coverage or one rate")
+    parser.add_argument("--file", default=HISTORICAL_RATES_FILE, help=f"store (default: {HISTORICAL_RATES_FILE})")
+    parser.add_argument("--days", type=int, help="backfill this many days up to --end")
+    parser.add_argument("--start", type=parse_day, help="first day (YYYY-MM-DD)")
+    parser.add_argument("--end", type=parse_day, help="last day (YYYY-MM-DD, default today)")
+    parser.add_argument("--from-file", help="merge saved provider responses instead of calling the providers")
+    parser.add_argument("--pair", default="USD-INR", help="pair for show (default: USD-INR)")
+    parser.add_argument("--date", type=parse_day, help="show the pair's rate as of this day")
+    args = parser.parse_args(argv)
+
+    store = HistoricalRates(args.file)
+    if args.command == "backfill":
+        if args.from_file:
+            stored = store.merge(read_recorded(args.from_file))
+            if stored:
+                store.save()
+        else:
+            end = args.end or date.today()
+            start = args.start or (end - timedelta(days=args.days - 1) if args.days else None)
+            stored = store.backfill(start, end)
+        print(f"[INFO] Stored {stored} days in {args.file}")
+
+    covered = store.coverage()
+    if covered is None:
+        print(f"[WARN] {args.file} holds no rates")
+        return 1
+    print(f"{args.file}: {covered[2]} days from {covered[0]} to {covered[1]}")
+    if args.command == "show":
+        from_currency, _, to_currency = args.pair.upper().partition("-")
+        as_of = args.date or covered[1]
+        found = store.rate_on(from_currency, to_currency, as_of)
+        if found is None:
+            print(f"[WARN] No {from_currency}→{to_currency} rate on or before {as_of}")
+            return 1
+        print(f"{from_currency}→{to_currency} as of {as_of}: {found[0]:.6f} (quoted {found[1]})")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,297 @@
+"""
+Append-only conversion history stored as JSON Lines.
+
+Each conversion is one line appended with a single O_APPEND write, so saving
+costs the same no matter how long the history is. The file is only read on
+first access, and is rewritten (compacted) every HISTORY_COMPACT_EVERY appends
+to drop torn lines and apply the optional HISTORY_MAX_ENTRIES retention.
+An existing history.json is migrated the first time the log is loaded.
+
+Several worker processes can share one log: appends take a shared file lock
+and compaction an exclusive one, and every read first tails whatever other
+processes appended since. A compaction by another process (new inode) makes
+the next read reload the file and bump `generation`.
+"""
+
+import json
+import os
+import threading
+from bisect import bisect_left
+from itertools import chain
+
+from shared_state import file_lock
+
+
+HISTORY_FILE = os.getenv("HISTORY_FILE", "history.jsonl")
+LEGACY_HISTORY_FILE = "history.json"
+HISTORY_COMPACT_EVERY = int(os.getenv("HISTORY_COMPACT_EVERY", "5000"))
+# 0 keeps every entry
+HISTORY_MAX_ENTRIES = int(os.getenv("HISTORY_MAX_ENTRIES", "0"))
+
+
+def _encode(entry):
+    return (json.dumps(entry, ensure_ascii=False) + "\n").encode("utf-8")
+
+
+def matches(entry, from_currency=None, to_currency=None, mode=None, since=None, until=None):
+    """Whether entry passes the history filters (since inclusive, until exclusive, compared as time strings)."""
+    if from_currency and entry.get("from") != from_currency:
+        return False
+    if to_currency and entry.get("to") != to_currency:
+        return False
+    if mode and entry.get("mode") != mode:
+        return False
+    time = entry.get("time") or ""
+    return not ((since and time < since) or (until and time >= until))
+
+
+class HistoryLog:
+    """Lazily loaded, append-only history log."""
+
+    def __init__(self, path=HISTORY_FILE, legacy_path=LEGACY_HISTORY_FILE,
+                 compact_every=HISTORY_COMPACT_EVERY, max_entries=HISTORY_MAX_ENTRIES):
+        self.path = path
+        self.legacy_path = legacy_path
+        self.compact_every = compact_every
+        self.max_entries = max_entries
+        self._lock = threading.RLock()
+        self._entries = None
+        self._appends_since_compact = 0
+        self._dirty = False   # file holds lines that a compaction would drop
+        self._offset = 0      # bytes of the file already parsed into _entries
+        self._inode = None
+        # Bumped whenever the entries are replaced rather than appended to
+        self.generation = 0
+        # Index for page(), extended lazily: ascending positions in _entries per
+        # ("pair", from, to), ("from", code), ("to", code) and ("mode", mode)
+        self._index = {}
+        # Per position, the latest time seen up to it (the entry's own time when
+        # the log is in time order), so since/until bisect to a position range
+        self._times = []
+        # Positions older than an entry before them (workers racing to append)
+        self._late = []
+        self._indexed = (None, 0)   # (generation, entries covered)
+
+    def entries(self):
+        """All entries in append order, including lines other processes appended."""
+        with self._lock:
+            if self._entries is None:
+                self._entries = self._load()
+            else:
+                self._tail()
+            return self._entries
+
+    def _load(self):
+        self._offset = 0
+        self._inode = None
+        if not os.path.exists(self.path):
+            with file_lock(self.path):
+                # Another process may have migrated while we waited
+                if not os.path.exists(self.path):
+                    return self._migrate_legacy()
+        entries = []
+        try:
+            with open(self.path, "rb") as f:
+                self._inode = os.fstat(f.fileno()).st_ino
+                self._offset = self._parse(f.read(), entries)
+        except Exception as e:
+            print(f"[WARN] Failed to load {self.path}: {e}")
+        return entries
+
+    def _parse(self, data, entries):
+        """Append the complete lines of data to entries; returns the bytes consumed."""
+        end = data.rfind(b"\n") + 1
+        for line in data[:end].splitlines():
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                entries.append(json.loads(line))
+            except ValueError:
+                # A torn write from a crash; compaction will drop it
+                self._dirty = True
+        return end
+
+    def _tail(self):
+        """Pick up lines appended since the last read, or reload after a rewrite."""
+        try:
+            st = os.stat(self.path)
+        except FileNotFoundError:
+            return
+        if st.st_ino != self._inode or st.st_size < self._offset:
+            self._entries = self._load()
+            self.generation += 1
+            return
+        if st.st_size == self._offset:
+            return
+        try:
+            with open(self.path, "rb") as f:
+                f.seek(self._offset)
+                self._offset += self._parse(f.read(st.st_size - self._offset), self._entries)
+        except Exception as e:
+            print(f"[WARN] Failed to read {self.path}: {e}")
+
+    def _migrate_legacy(self):
+        """Copy history.json into the log once. The legacy file is left in place."""
+        if not self.legacy_path or not os.path.exists(self.legacy_path):
+            return []
+        try:
+            with open(self.legacy_path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            if not isinstance(data, list):
+                return []
+            self._rewrite(data)
+            print(f"[INFO] Migrated {len(data)} entries from {self.legacy_path} to {self.path}")
+            return data
+        except Exception as e:
+            print(f"[WARN] Failed to migrate {self.legacy_path}: {e}")
+            return []
+
+    def _write(self, payload):
+        fd = os.open(self.path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+        try:
+            os.write(fd, payload)
+        finally:
+            os.close(fd)
+
+    def _rewrite(self, entries):
+        """Replace the file with entries; caller holds the exclusive file lock."""
+        tmp_path = f"{self.path}.tmp"
+        payload = b"".join(_encode(entry) for entry in entries)
+        with open(tmp_path, "wb") as f:
+            f.write(payload)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.path)
+        self._inode = os.stat(self.path).st_ino
+        self._offset = len(payload)
+
+    def append(self, entry):
+        """Append one entry with a single write."""
+        self.append_many([entry])
+
+    def append_many(self, new_entries):
+        """Append several entries in one write."""
+        if not new_entries:
+            return
+        payload = b"".join(_encode(entry) for entry in new_entries)
+        with self._lock:
+            self.entries()
+            try:
+                with file_lock(self.path, shared=True):
+                    self._write(payload)
+                    size = os.path.getsize(self.path)
+            except Exception as e:
+                print(f"[WARN] Failed to append to {self.path}: {e}")
+                return
+            if size == self._offset + len(payload):
+                # Nobody else appended in between: our entries are the new tail
+                self._entries.extend(new_entries)
+                self._offset = size
+            else:
+                self._tail()
+            self._appends_since_compact += len(new_entries)
+            if self.compact_every and self._appends_since_compact >= self.compact_every:
+                self.compact()
+
+    def query(self, from_currency=None, to_currency=None, mode=None, since=None, until=None, limit=None):
+        """Matching entries, newest first (a scan; the SQLite store answers this from indexes)."""
+        found = []
+        for entry in reversed(self.entries()):
+            if matches(entry, from_currency, to_currency, mode, since, until):
+                found.append(entry)
+                if limit and len(found) >= limit:
+                    break
+        return found
+
+    def _update_index(self):
+        """Index the entries appended since the last page(), or everything after a reload."""
+        entries = self._entries
+        generation, covered = self._indexed
+        if generation != self.generation:
+            self._index, self._times, self._late = {}, [], []
+            covered = 0
+        index, times = self._index, self._times
+        latest = times[-1] if times else ""
+        for position in range(covered, len(entries)):
+            entry = entries[position]
+            from_currency, to_currency = entry.get("from"), entry.get("to")
+            for key in (("pair", from_currency, to_currency), ("from", from_currency),
+                        ("to", to_currency), ("mode", entry.get("mode"))):
+                index.setdefault(key, []).append(position)
+            time = entry.get("time") or ""
+            if time >= latest:
+                latest = time
+            else:
+                self._late.append(position)
+            times.append(latest)
+        self._indexed = (self.generation, len(entries))
+
+    def page(self, from_currency=None, to_currency=None, mode=None, since=None, until=None,
+             cursor=None, limit=50):
+        """
+        One page of matching entries, newest first, and the cursor for the next
+        page (None on the last one). Cursors are "<generation>.<position>"; one
+        issued before a compaction trimmed the log starts again from the newest.
+
+        Candidates come from the smallest index list among the filters, cut to
+        the since/until position range by bisection, so a page costs about the
+        same however long the log is.
+        """
+        with self._lock:
+            entries = self.entries()
+            self._update_index()
+            end = len(entries)
+            if cursor:
+                generation, _, position = cursor.partition(".")
+                if generation == str(self.generation) and position.isdigit():
+                    end = min(end, int(position))
+            # Every entry before `first` is older than since; every one from `last` on
+            # is at least until, apart from late ones, which are checked separately
+            first = bisect_left(self._times, since) if since else 0
+            last = min(end, bisect_left(self._times, until)) if until else end
+            late = self._late[bisect_left(self._late, last):bisect_left(self._late, end)]
+            keys = [("mode", mode)] if mode else []
+            if from_currency and to_currency:
+                keys.append(("pair", from_currency, to_currency))
+            else:
+                keys += [(side, code) for side, code in (("from", from_currency), ("to", to_currency)) if code]
+            if keys:
+                positions = min((self._index.get(key, []) for key in keys), key=len)
+                candidates = reversed(positions[bisect_left(positions, first):bisect_left(positions, last)])
+            else:
+                candidates = range(last - 1, first - 1, -1)
+            found = []
+            for position in chain(reversed(late), candidates):
+                entry = entries[position]
+                if not matches(entry, from_currency, to_currency, mode, since, until):
+                    continue
+                if len(found) == limit:
+                    return found, f"{self.generation}.{last}"
+                found.append(entry)
+                last = position
+            return found, None
+
+    def compact(self):
+        """Rewrite the log from memory, dropping torn lines and applying retention."""
+        with self._lock:
+            self.entries()
+            with file_lock(self.path):
+                self._compact()
+
+    def _compact(self):
+        # Catch up under the exclusive lock so no other process's lines are lost
+        self._tail()
+        entries = self._entries
+        trimmed = self.max_entries and len(entries) > self.max_entries
+        if trimmed:
+            del entries[:len(entries) - self.max_entries]
+            self.generation += 1
+        self._appends_since_compact = 0
+        if not trimmed and not self._dirty:
+            return
+        try:
+            self._rewrite(entries)
+            self._dirty = False
+        except Exception as e:
+            print(f"[WARN] Failed to compact {self.path}: {e}")
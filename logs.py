@@ -0,0 +1,128 @@
+"""
+Structured, buffered logging for the hot paths.
+
+Records are put on an in-memory queue (QueueHandler) and written to stdout by
+a QueueListener thread, so a request never blocks on the terminal or a pipe.
+Each record is one line - "[WARN] message key=value ..." with the same tags
+the rest of the app prints, or one JSON object per line with LOG_FORMAT=json:
+
+    log = get_logger("providers")
+    log.warning("Provider failed", provider="fixer.io", error=str(e))
+
+LOG_LEVEL (default INFO) is checked before anything is formatted or queued;
+per-call chatter such as "fetching from <provider>" is DEBUG.
+"""
+
+import atexit
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import sys
+import threading
+from datetime import datetime
+
+
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
+LOG_FORMAT = os.getenv("LOG_FORMAT", "text").lower()
+
+# Short tags matching the app's print() output
+_TAGS = {"WARNING": "WARN", "CRITICAL": "ERROR"}
+
+_root = logging.getLogger("currency")
+_root.setLevel(LOG_LEVEL)
+_root.propagate = False
+_queue = queue.SimpleQueue()
+_listener = None
+_listener_pid = None
+_listener_lock = threading.Lock()
+
+
+def _text(value):
+    text = str(value)
+    return json.dumps(text, ensure_ascii=False) if not text or any(c in text for c in ' "=\n') else text
+
+
+class StructuredFormatter(logging.Formatter):
+    """"[TAG] message key=value ..." or, with json_lines, one JSON object per record."""
+
+    def __init__(self, json_lines=False):
+        super().__init__()
+        self.json_lines = json_lines
+
+    def format(self, record):
+        fields = getattr(record, "fields", None) or {}
+        if self.json_lines:
+            return json.dumps({
+                "time": datetime.fromtimestamp(record.created).strftime("%Y-%m-%d %H:%M:%S.%f")[:-3],
+                "level": record.levelname.lower(),
+                "logger": record.name,
+                "message": record.getMessage(),
+                **fields,
+            }, ensure_ascii=False, default=str)
+        line = f"[{_TAGS.get(record.levelname, record.levelname)}] {record.getMessage()}"
+        if fields:
+            line += " " + " ".join(f"{key}={_text(value)}" for key, value in fields.items())
+        return line
+
+
+def _start_listener():
+    """Start this process's writer thread (again after a fork, where threads don't survive)."""
+    global _listener, _listener_pid
+    with _listener_lock:
+        if _listener_pid == os.getpid():
+            return
+        stream = logging.StreamHandler(sys.stdout)
+        stream.setFormatter(StructuredFormatter(json_lines=LOG_FORMAT == "json"))
+        _listener = logging.handlers.QueueListener(_queue, stream)
+        _listener.start()
+        _listener_pid = os.getpid()
+        atexit.register(flush)
+
+
+class _BufferedHandler(logging.handlers.QueueHandler):
+    def emit(self, record):
+        if _listener_pid != os.getpid():
+            _start_listener()
+        super().emit(record)
+
+
+_root.addHandler(_BufferedHandler(_queue))
+
+
+def flush():
+    """Write out everything queued so far (called at exit)."""
+    global _listener, _listener_pid
+    with _listener_lock:
+        if _listener is not None and _listener_pid == os.getpid():
+            _listener.stop()
+            _listener = None
+            _listener_pid = None
+
+
+class StructuredLogger:
+    """Logger whose calls take the message plus key=value fields."""
+
+    def __init__(self, logger):
+        self._logger = logger
+
+    def _log(self, level, message, fields):
+        if self._logger.isEnabledFor(level):
+            self._logger.log(level, message, extra={"fields": fields})
+
+    def debug(self, message, **fields):
+        self._log(logging.DEBUG, message, fields)
+
+    def info(self, message, **fields):
+        self._log(logging.INFO, message, fields)
+
+    def warning(self, message, **fields):
+        self._log(logging.WARNING, message, fields)
+
+    def error(self, message, **fields):
+        self._log(logging.ERROR, message, fields)
+
+
+def get_logger(name):
+    return StructuredLogger(logging.getLogger(f"currency.{name}"))
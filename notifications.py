@@ -0,0 +1,95 @@
+"""
+UI notifications produced by background jobs, shared by every worker.
+
+Alerts are evaluated and SMS results arrive in the scheduler leader, but the
+page that shows them may be served by any worker, so messages live in
+NOTIFICATIONS_FILE (a SharedJsonFile) rather than in process memory. Each
+message gets an increasing id; the home page shows what arrived since the
+last id any worker displayed, and /api/notifications lets the UI poll with
+?since=<id>. Only the newest NOTIFICATIONS_MAX messages are kept.
+"""
+
+import os
+import threading
+from datetime import datetime
+
+from shared_state import SharedJsonFile
+
+
+NOTIFICATIONS_FILE = os.getenv("NOTIFICATIONS_FILE", "notifications.json")
+NOTIFICATIONS_MAX = int(os.getenv("NOTIFICATIONS_MAX", "200"))
+
+
+def _empty():
+    return {"last_id": 0, "shown": 0, "items": []}
+
+
+class NotificationStore:
+    """Bounded ring of notification messages in a file shared between processes."""
+
+    def __init__(self, path=NOTIFICATIONS_FILE, maxlen=NOTIFICATIONS_MAX):
+        self._file = SharedJsonFile(path, default=_empty)
+        self.maxlen = maxlen
+        self._lock = threading.Lock()
+        self._doc = _empty()
+        self._loaded = False
+
+    def _read(self):
+        try:
+            doc = self._file.load()
+        except Exception as e:
+            print(f"[WARN] Failed to load {self._file.path}: {e}")
+            return dict(self._doc)
+        return {**_empty(), **doc} if isinstance(doc, dict) else _empty()
+
+    def _current(self):
+        """The document, reloaded when another process changed the file."""
+        with self._lock:
+            if not self._loaded or self._file.changed():
+                self._doc = self._read()
+                self._loaded = True
+            return self._doc
+
+    def push(self, message, level="info"):
+        with self._file.locked():
+            doc = self._read()
+            doc["last_id"] += 1
+            doc["items"] = doc["items"][-(self.maxlen - 1):] if self.maxlen > 1 else []
+            doc["items"].append({
+                "id": doc["last_id"],
+                "message": message,
+                "level": level,
+                "time": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+            })
+            try:
+                self._file.save(doc)
+            except Exception as e:
+                print(f"[WARN] Failed to save {self._file.path}: {e}")
+            with self._lock:
+                self._doc, self._loaded = doc, True
+            return doc["last_id"]
+
+    def since(self, last_seen=0):
+        """Notifications with id greater than last_seen, oldest first."""
+        return [item for item in self._current()["items"] if item["id"] > last_seen]
+
+    def take_unshown(self):
+        """Notifications no page has shown yet, marked as shown for every process."""
+        doc = self._current()
+        if doc["last_id"] <= doc["shown"]:
+            return []
+        with self._file.locked():
+            doc = self._read()
+            items = [item for item in doc["items"] if item["id"] > doc["shown"]]
+            doc["shown"] = doc["last_id"]
+            try:
+                self._file.save(doc)
+            except Exception as e:
+                print(f"[WARN] Failed to save {self._file.path}: {e}")
+            with self._lock:
+                self._doc, self._loaded = doc, True
+        return items
+
+    @property
+    def last_id(self):
+        return self._current()["last_id"]
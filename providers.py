@@ -0,0 +1,564 @@
+"""
+Exchange-rate provider clients.
+
+Providers are described as plain dicts (name, url, extract, optional headers),
+the same shape get_exchange_rate has always used. fetch_first() asks them for a
+value in one of three modes:
+
+- "sequential": one after another, like the original failover loop
+- "race": all at once, first valid answer wins
+- "hedge": start the best-ranked provider, and start the next one whenever the
+  previous has failed or has not answered within RATE_HEDGE_DELAY seconds
+
+Per-provider latency and error stats are kept so the list is tried fastest and
+most reliable first. Every call goes through one pooled requests.Session
+(created on first use), and each provider has a circuit breaker: after
+CIRCUIT_FAILURE_THRESHOLD consecutive failures it is skipped for
+CIRCUIT_COOLDOWN seconds, then a single trial call decides whether it comes back.
+Only transport errors and 5xx answers count as failures; a provider that
+answers without a usable value (an unknown currency, say) is still up.
+
+Abandoned threaded requests can't be cancelled and keep their worker until
+they time out, so at most PROVIDER_MAX_IN_FLIGHT requests per provider run at
+once; a provider at its limit is passed over rather than queued behind them.
+
+fetch_first_async() is the same policy for the ASGI serving mode: calls go
+through one shared httpx.AsyncClient, so in-flight requests wait on the event
+loop instead of holding a thread each. Stats and breakers are shared with the
+threaded path.
+"""
+
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from importlib.util import find_spec
+
+from logs import get_logger
+from metrics import PROVIDER_REQUEST_SECONDS
+
+# requests, httpx and asyncio are imported on first use, not at import, to keep cold starts fast.
+# httpx is optional: it is only needed by the ASGI serving mode.
+HTTPX_AVAILABLE = find_spec("httpx") is not None
+
+
+PROVIDER_TIMEOUT = float(os.getenv("PROVIDER_TIMEOUT", "15"))
+RATE_FETCH_MODE = os.getenv("RATE_FETCH_MODE", "hedge")
+RATE_HEDGE_DELAY = float(os.getenv("RATE_HEDGE_DELAY", "0.5"))
+CIRCUIT_FAILURE_THRESHOLD = int(os.getenv("CIRCUIT_FAILURE_THRESHOLD", "3"))
+CIRCUIT_COOLDOWN = float(os.getenv("CIRCUIT_COOLDOWN", "300"))
+ASYNC_MAX_CONNECTIONS = int(os.getenv("ASYNC_MAX_CONNECTIONS", "100"))
+PROVIDER_MAX_IN_FLIGHT = int(os.getenv("PROVIDER_MAX_IN_FLIGHT", "4"))
+PROVIDER_WORKERS = int(os.getenv("PROVIDER_WORKERS", "32"))
+
+# Latency assumed for a provider that has not been called yet
+DEFAULT_LATENCY = 1.0
+# Weight of the newest sample in the latency/error moving averages
+EWMA_ALPHA = 0.3
+
+USER_AGENT = {"User-Agent": "CurrencyConverter/1.0"}
+
+log = get_logger("providers")
+
+
+class ProviderError(Exception):
+    """A provider answered, but not with a usable value."""
+
+
+class CircuitOpenError(ProviderError):
+    """The provider's circuit breaker is open, so no request was made."""
+
+
+def pair_providers(from_currency, to_currency):
+    """Providers that can quote a single from→to rate."""
+    return [
+        {
+            "name": "exchangerate-api",
+            "url": f"https://api.exchangerate-api.com/v4/latest/{from_currency}",
+            "extract": lambda r: r.get("rates", {}).get(to_currency),
+            "headers": USER_AGENT
+        },
+        {
+            "name": "currencylayer",
+            "url": f"https://api.currencylayer.com/live?access_key=free&currencies={to_currency}&source={from_currency}&format=1",
+            "extract": lambda r: r.get("quotes", {}).get(f"{from_currency}{to_currency}")
+        },
+        {
+            "name": "exchangerate.host",
+            "url": f"https://api.exchangerate.host/latest?base={from_currency}&symbols={to_currency}",
+            "extract": lambda r: r.get("rates", {}).get(to_currency),
+            "headers": USER_AGENT
+        },
+        {
+            "name": "fixer.io",
+            "url": f"https://api.fixer.io/latest?base={from_currency}&symbols={to_currency}",
+            "extract": lambda r: r.get("rates", {}).get(to_currency)
+        }
+    ]
+
+
+def table_providers(base):
+    """Providers that return the full {quote: rate} table for one base currency."""
+    return [
+        {
+            "name": "exchangerate-api",
+            "url": f"https://api.exchangerate-api.com/v4/latest/{base}",
+            "extract": lambda r: r.get("rates"),
+            "headers": USER_AGENT
+        },
+        {
+            "name": "exchangerate.host",
+            "url": f"https://api.exchangerate.host/latest?base={base}",
+            "extract": lambda r: r.get("rates"),
+            "headers": USER_AGENT
+        }
+    ]
+
+
+def history_providers(base, start, end):
+    """Providers that return daily {date: {quote: rate}} tables for base from start to end (ISO dates)."""
+    # Named apart from the live providers, so slow range requests don't rank or trip the live ones
+    return [
+        {
+            "name": "frankfurter",
+            "url": f"https://api.frankfurter.app/{start}..{end}?from={base}",
+            "extract": lambda r: r.get("rates"),
+            "headers": USER_AGENT
+        },
+        {
+            "name": "exchangerate.host-timeseries",
+            "url": f"https://api.exchangerate.host/timeseries?start_date={start}&end_date={end}&base={base}",
+            "extract": lambda r: r.get("rates"),
+            "headers": USER_AGENT
+        }
+    ]
+
+
+def valid_rate(value):
+    # bool is an int subclass; True is not a rate
+    return isinstance(value, (int, float)) and not isinstance(value, bool) and value > 0
+
+
+def valid_table(value):
+    return isinstance(value, dict) and len(value) > 0
+
+
+def valid_series(value):
+    return isinstance(value, dict) and any(isinstance(table, dict) and table for table in value.values())
+
+
+class ProviderStats:
+    """Moving-average latency and error rate per provider name."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._stats = {}
+
+    def record(self, name, latency, ok):
+        with self._lock:
+            s = self._stats.setdefault(name, {
+                "calls": 0,
+                "successes": 0,
+                "errors": 0,
+                "latency": None,
+                "error_rate": 0.0,
+            })
+            s["calls"] += 1
+            if ok:
+                s["successes"] += 1
+            else:
+                s["errors"] += 1
+            if s["latency"] is None:
+                s["latency"] = latency
+            else:
+                s["latency"] = EWMA_ALPHA * latency + (1 - EWMA_ALPHA) * s["latency"]
+            s["error_rate"] = EWMA_ALPHA * (0.0 if ok else 1.0) + (1 - EWMA_ALPHA) * s["error_rate"]
+
+    def score(self, name):
+        """Lower is better: expected latency plus a timeout-sized penalty per recent error."""
+        with self._lock:
+            s = self._stats.get(name)
+            if s is None or s["latency"] is None:
+                return DEFAULT_LATENCY
+            return s["latency"] + s["error_rate"] * PROVIDER_TIMEOUT
+
+    def rank(self, providers):
+        # sorted() is stable, so untried providers keep their configured order
+        return sorted(providers, key=lambda p: self.score(p["name"]))
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                name: {
+                    **s,
+                    "latency": round(s["latency"], 4) if s["latency"] is not None else None,
+                    "error_rate": round(s["error_rate"], 4),
+                }
+                for name, s in self._stats.items()
+            }
+
+
+provider_stats = ProviderStats()
+
+
+class CircuitBreaker:
+    """Closed → open after repeated failures → half-open trial after a cooldown."""
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, failure_threshold=CIRCUIT_FAILURE_THRESHOLD, cooldown=CIRCUIT_COOLDOWN, clock=time.monotonic):
+        self.failure_threshold = failure_threshold
+        self.cooldown = cooldown
+        self._clock = clock
+        self._lock = threading.Lock()
+        self.state = self.CLOSED
+        self.failures = 0
+        self.opened_at = None
+        self._trial_running = False
+
+    def available(self):
+        """Cheap pre-check used for filtering; does not claim the half-open trial."""
+        with self._lock:
+            if self.state == self.CLOSED:
+                return True
+            if self.state == self.OPEN:
+                return self._clock() - self.opened_at >= self.cooldown
+            return not self._trial_running
+
+    def allow(self):
+        """Whether a call may go out now. Half-open lets exactly one trial through."""
+        with self._lock:
+            if self.state == self.CLOSED:
+                return True
+            if self.state == self.OPEN:
+                if self._clock() - self.opened_at < self.cooldown:
+                    return False
+                self.state = self.HALF_OPEN
+                self._trial_running = False
+            if self._trial_running:
+                return False
+            self._trial_running = True
+            return True
+
+    def record_success(self):
+        with self._lock:
+            self.state = self.CLOSED
+            self.failures = 0
+            self.opened_at = None
+            self._trial_running = False
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self.state == self.HALF_OPEN or self.failures >= self.failure_threshold:
+                self.state = self.OPEN
+                self.opened_at = self._clock()
+            self._trial_running = False
+
+    def snapshot(self):
+        with self._lock:
+            retry_in = None
+            if self.state == self.OPEN:
+                retry_in = round(max(0.0, self.cooldown - (self._clock() - self.opened_at)), 1)
+            return {"state": self.state, "failures": self.failures, "retry_in": retry_in}
+
+
+_breakers = {}
+_breakers_lock = threading.Lock()
+
+
+def get_breaker(name):
+    """Circuit breaker shared by every provider entry with this name."""
+    with _breakers_lock:
+        breaker = _breakers.get(name)
+        if breaker is None:
+            breaker = _breakers[name] = CircuitBreaker()
+        return breaker
+
+
+def breaker_states():
+    with _breakers_lock:
+        breakers = dict(_breakers)
+    return {name: breaker.snapshot() for name, breaker in breakers.items()}
+
+
+def _build_session():
+    import requests
+    from requests.adapters import HTTPAdapter
+
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=8, pool_maxsize=16, max_retries=0)
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
+
+
+# Keep-alive connection pool shared by every provider call, built on first use
+_session = None
+_session_lock = threading.Lock()
+
+
+def get_session():
+    global _session
+    if _session is None:
+        with _session_lock:
+            if _session is None:
+                _session = _build_session()
+    return _session
+
+# Shared pool for racing/hedged requests
+_executor = ThreadPoolExecutor(max_workers=PROVIDER_WORKERS, thread_name_prefix="rate-provider")
+# provider name -> threaded requests running now (including abandoned ones)
+_in_flight = {}
+_in_flight_lock = threading.Lock()
+
+
+def _claim_slot(name):
+    """Reserve one of the provider's PROVIDER_MAX_IN_FLIGHT request slots; False when all are taken."""
+    with _in_flight_lock:
+        if _in_flight.get(name, 0) >= PROVIDER_MAX_IN_FLIGHT:
+            return False
+        _in_flight[name] = _in_flight.get(name, 0) + 1
+        return True
+
+
+def _release_slot(name):
+    with _in_flight_lock:
+        _in_flight[name] -= 1
+
+
+def _call_in_slot(provider, valid, timeout):
+    try:
+        return call_provider(provider, valid, timeout)
+    finally:
+        _release_slot(provider["name"])
+
+
+def _trips_breaker(error, transport_errors):
+    """Whether a failed call counts against the provider's circuit breaker: transport errors and 5xx only."""
+    response = getattr(error, "response", None)
+    if response is not None:
+        return response.status_code >= 500
+    # ValueError: a body that isn't JSON (requests' JSONDecodeError is also a RequestException)
+    return isinstance(error, transport_errors) and not isinstance(error, ValueError)
+
+
+def _record_failure(breaker, error, transport_errors):
+    if _trips_breaker(error, transport_errors):
+        breaker.record_failure()
+    else:
+        # The provider answered: it is up, even though the answer was unusable
+        breaker.record_success()
+
+
+def _record_call(name, latency, ok):
+    provider_stats.record(name, latency, ok=ok)
+    PROVIDER_REQUEST_SECONDS.labels(name, "ok" if ok else "error").observe(latency)
+
+
+def call_provider(provider, valid=valid_rate, timeout=PROVIDER_TIMEOUT):
+    """Query one provider and return its extracted value, raising on any failure."""
+    name = provider["name"]
+    breaker = get_breaker(name)
+    if not breaker.allow():
+        raise CircuitOpenError(f"{name} circuit open - skipped")
+    started = time.perf_counter()
+    try:
+        response = get_session().get(provider["url"], timeout=timeout, headers=provider.get("headers", {}))
+        response.raise_for_status()
+        data = response.json()
+        if "error" in data:
+            error = data.get("error")
+            info = error.get("info", "Unknown error") if isinstance(error, dict) else error
+            raise ProviderError(f"API error from {name}: {info}")
+        value = provider["extract"](data)
+        if not valid(value):
+            raise ProviderError(f"Invalid value from {name}: {value}")
+    except Exception as e:
+        import requests
+
+        _record_call(name, time.perf_counter() - started, ok=False)
+        _record_failure(breaker, e, requests.exceptions.RequestException)
+        raise
+    _record_call(name, time.perf_counter() - started, ok=True)
+    breaker.record_success()
+    return value
+
+
+def fetch_sequential(providers, valid=valid_rate, timeout=PROVIDER_TIMEOUT):
+    """Try providers in order; return the first valid value or None."""
+    import requests
+
+    for provider in providers:
+        try:
+            log.debug("Fetching today's rate", provider=provider["name"])
+            return call_provider(provider, valid, timeout)
+        except requests.exceptions.Timeout:
+            log.warning("Provider timeout - trying next API", provider=provider["name"])
+        except requests.exceptions.RequestException as e:
+            log.warning("Provider request failed", provider=provider["name"], error=str(e))
+        except Exception as e:
+            log.warning("Provider failed", provider=provider["name"], error=str(e))
+    return None
+
+
+def fetch_hedged(providers, valid=valid_rate, timeout=PROVIDER_TIMEOUT, hedge_delay=RATE_HEDGE_DELAY):
+    """
+    Start providers one at a time, launching the next as soon as the previous
+    fails or hedge_delay passes without an answer. A hedge_delay of 0 races them all.
+    Providers already running PROVIDER_MAX_IN_FLIGHT requests are passed over.
+    Returns the first valid value or None; outstanding requests are abandoned.
+    """
+    pending = {}
+    queue = list(providers)
+
+    def launch():
+        while queue:
+            provider = queue.pop(0)
+            if _claim_slot(provider["name"]):
+                future = _executor.submit(_call_in_slot, provider, valid, timeout)
+                pending[future] = provider
+                return
+            log.warning("Provider busy - skipped", provider=provider["name"])
+
+    try:
+        launch()
+        while pending:
+            if queue and hedge_delay <= 0:
+                launch()
+                continue
+            wait_for = hedge_delay if queue else None
+            done, _ = wait(list(pending), timeout=wait_for, return_when=FIRST_COMPLETED)
+            if not done:
+                # Slow provider: hedge with the next one
+                launch()
+                continue
+            for future in done:
+                provider = pending.pop(future)
+                try:
+                    return future.result()
+                except Exception as e:
+                    log.warning("Provider failed", provider=provider["name"], error=str(e))
+                    if queue:
+                        launch()
+        return None
+    finally:
+        for future, provider in pending.items():
+            # A request that never started gives its slot back; running ones release it when they end
+            if future.cancel():
+                _release_slot(provider["name"])
+
+
+def fetch_first(providers, valid=valid_rate, mode=None, timeout=PROVIDER_TIMEOUT):
+    """Ask the ranked providers for a value using the configured fetch mode."""
+    mode = mode or RATE_FETCH_MODE
+    # Providers with an open circuit are skipped without a network call
+    ranked = [p for p in provider_stats.rank(providers) if get_breaker(p["name"]).available()]
+    if not ranked:
+        return None
+    if mode == "sequential":
+        return fetch_sequential(ranked, valid, timeout)
+    if mode == "race":
+        return fetch_hedged(ranked, valid, timeout, hedge_delay=0)
+    return fetch_hedged(ranked, valid, timeout)
+
+
+def build_async_client():
+    """Pooled httpx.AsyncClient for fetch_first_async, or None without httpx."""
+    if not HTTPX_AVAILABLE:
+        return None
+    import httpx
+
+    limits = httpx.Limits(max_connections=ASYNC_MAX_CONNECTIONS,
+                          max_keepalive_connections=ASYNC_MAX_CONNECTIONS)
+    return httpx.AsyncClient(limits=limits, headers=USER_AGENT)
+
+
+async def call_provider_async(client, provider, valid=valid_rate, timeout=PROVIDER_TIMEOUT):
+    """Async call_provider() over an httpx.AsyncClient."""
+    name = provider["name"]
+    breaker = get_breaker(name)
+    if not breaker.allow():
+        raise CircuitOpenError(f"{name} circuit open - skipped")
+    started = time.perf_counter()
+    try:
+        response = await client.get(provider["url"], timeout=timeout, headers=provider.get("headers", {}))
+        response.raise_for_status()
+        data = response.json()
+        if "error" in data:
+            error = data.get("error")
+            info = error.get("info", "Unknown error") if isinstance(error, dict) else error
+            raise ProviderError(f"API error from {name}: {info}")
+        value = provider["extract"](data)
+        if not valid(value):
+            raise ProviderError(f"Invalid value from {name}: {value}")
+    except Exception as e:
+        import httpx
+
+        _record_call(name, time.perf_counter() - started, ok=False)
+        _record_failure(breaker, e, httpx.TransportError)
+        raise
+    _record_call(name, time.perf_counter() - started, ok=True)
+    breaker.record_success()
+    return value
+
+
+async def fetch_hedged_async(client, providers, valid=valid_rate, timeout=PROVIDER_TIMEOUT,
+                             hedge_delay=RATE_HEDGE_DELAY):
+    """Async fetch_hedged(); a hedge_delay of None tries providers strictly one after another."""
+    import asyncio
+
+    pending = {}
+    queue = list(providers)
+
+    def launch():
+        provider = queue.pop(0)
+        task = asyncio.ensure_future(call_provider_async(client, provider, valid, timeout))
+        pending[task] = provider
+
+    try:
+        launch()
+        while pending:
+            if queue and hedge_delay is not None and hedge_delay <= 0:
+                launch()
+                continue
+            wait_for = hedge_delay if queue else None
+            done, _ = await asyncio.wait(list(pending), timeout=wait_for, return_when=asyncio.FIRST_COMPLETED)
+            if not done:
+                # Slow provider: hedge with the next one
+                launch()
+                continue
+            for task in done:
+                provider = pending.pop(task)
+                try:
+                    return task.result()
+                except Exception as e:
+                    log.warning("Provider failed", provider=provider["name"], error=str(e))
+                    if queue:
+                        launch()
+        return None
+    finally:
+        for task in pending:
+            task.cancel()
+
+
+async def fetch_first_async(client, providers, valid=valid_rate, mode=None, timeout=PROVIDER_TIMEOUT):
+    """
+    Async fetch_first(). Without an AsyncClient (httpx not installed) the
+    threaded fetch_first runs in a worker thread instead.
+    """
+    import asyncio
+
+    if client is None:
+        return await asyncio.to_thread(fetch_first, providers, valid, mode, timeout)
+    mode = mode or RATE_FETCH_MODE
+    ranked = [p for p in provider_stats.rank(providers) if get_breaker(p["name"]).available()]
+    if not ranked:
+        return None
+    if mode == "sequential":
+        return await fetch_hedged_async(client, ranked, valid, timeout, hedge_delay=None)
+    if mode == "race":
+        return await fetch_hedged_async(client, ranked, valid, timeout, hedge_delay=0)
+    return await fetch_hedged_async(client, ranked, valid, timeout)
@@ -0,0 +1,281 @@
+"""
+In-process TTL cache for exchange rates.
+
+Entries are keyed by (base, quote). A fresh entry is served directly; a stale
+entry (older than the TTL but within the stale window) is served immediately
+while one background refresh runs; anything older is fetched synchronously.
+Concurrent lookups for the same key share a single upstream fetch.
+
+get_async() is the same policy for coroutine fetches on an event loop:
+concurrent awaiters share one task instead of one thread each. Sync and
+async callers share the same in-flight fetches, so a thread and a coroutine
+missing the same key at once still cost one upstream call.
+
+A failed fetch (an exception, or None) is remembered for RATE_CACHE_ERROR_TTL
+seconds: lookups in that window fail straight away (or keep serving the
+stale value) instead of retrying the provider on every call. Except for the
+thread that ran a sync fetch, callers get a new FetchFailed chained to the
+fetch's exception, never the shared exception object itself.
+
+get() must not be called from an event loop thread while that loop runs a
+get_async() fetch of the same key: it can neither wait for the task without
+blocking the loop nor start a second fetch, so it raises RuntimeError. Use
+get_async() on the loop.
+"""
+
+import os
+import threading
+import time
+
+
+RATE_CACHE_TTL = float(os.getenv("RATE_CACHE_TTL", "60"))
+RATE_CACHE_STALE_TTL = float(os.getenv("RATE_CACHE_STALE_TTL", "600"))
+RATE_CACHE_ERROR_TTL = float(os.getenv("RATE_CACHE_ERROR_TTL", "5"))
+
+
+class FetchFailed(Exception):
+    """A shared or recently failed fetch; __cause__ is the original exception."""
+
+
+def _failed(error):
+    """A new exception for one caller, chained to the shared one."""
+    failure = FetchFailed(str(error) or type(error).__name__)
+    failure.__cause__ = error
+    return failure
+
+
+class _Flight:
+    """One in-progress fetch that other callers, threads or coroutines, can wait on."""
+
+    def __init__(self, thread=None):
+        self.done = threading.Event()
+        self.value = None
+        self.error = None
+        self.thread = thread   # ident of the event loop thread running an async fetch
+        self.task = None
+        self._waiters = []     # (loop, future) of coroutines waiting on the result
+
+    def add_waiter(self, loop):
+        """A future on loop resolved with the result. Call with the cache lock held, before finish()."""
+        future = loop.create_future()
+        self._waiters.append((loop, future))
+        return future
+
+    def finish(self):
+        """Wake every waiter. Call with the cache lock held."""
+        self.done.set()
+        for loop, future in self._waiters:
+            loop.call_soon_threadsafe(self._resolve, future)
+        self._waiters = []
+
+    def _resolve(self, future):
+        if future.done():
+            return
+        if self.error is not None:
+            future.set_exception(_failed(self.error))
+        else:
+            future.set_result(self.value)
+
+
+class RateCache:
+    """Thread-safe TTL cache with stale-while-revalidate and single-flight fetching."""
+
+    def __init__(self, ttl=RATE_CACHE_TTL, stale_ttl=RATE_CACHE_STALE_TTL, error_ttl=RATE_CACHE_ERROR_TTL,
+                 clock=time.monotonic):
+        self.ttl = ttl
+        self.stale_ttl = stale_ttl
+        self.error_ttl = error_ttl
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._entries = {}   # key -> (value, fetched_at)
+        self._flights = {}   # key -> _Flight, shared by get() and get_async()
+        self._failures = {}  # key -> (error or None, failed_at)
+        self._stats = {
+            "hits": 0,
+            "stale_hits": 0,
+            "misses": 0,
+            "coalesced": 0,
+            "refreshes": 0,
+            "errors": 0,
+            "failed_hits": 0,
+        }
+
+    def _recent_failure(self, key, now):
+        """(error,) for a fetch of key that failed within error_ttl, else None. Call with the lock held."""
+        failure = self._failures.get(key)
+        if failure is None:
+            return None
+        if now - failure[1] >= self.error_ttl:
+            del self._failures[key]
+            return None
+        return (failure[0],)
+
+    def _record(self, key, flight):
+        """Store a finished flight's outcome and wake its waiters. Call with the lock held."""
+        if flight.error is not None or flight.value is None:
+            self._stats["errors"] += 1
+            self._failures[key] = (flight.error, self._clock())
+        else:
+            self._entries[key] = (flight.value, self._clock())
+            self._failures.pop(key, None)
+        self._flights.pop(key, None)
+        flight.finish()
+
+    def get(self, key, fetch):
+        """
+        Return the cached value for key, calling fetch() when it is missing or expired.
+        fetch() returning None is treated as a failed fetch and is not cached;
+        for error_ttl seconds after a failure, get() returns None or re-raises
+        the error without calling fetch.
+        """
+        now = self._clock()
+        with self._lock:
+            failure = self._recent_failure(key, now)
+            entry = self._entries.get(key)
+            if entry is not None:
+                value, fetched_at = entry
+                age = now - fetched_at
+                if age < self.ttl:
+                    self._stats["hits"] += 1
+                    return value
+                if age < self.ttl + self.stale_ttl:
+                    self._stats["stale_hits"] += 1
+                    if key not in self._flights and failure is None:
+                        flight = _Flight()
+                        self._flights[key] = flight
+                        self._stats["refreshes"] += 1
+                        threading.Thread(
+                            target=self._run_flight, args=(key, fetch, flight), daemon=True
+                        ).start()
+                    return value
+
+            if failure is not None:
+                self._stats["failed_hits"] += 1
+                if failure[0] is not None:
+                    raise _failed(failure[0])
+                return None
+
+            flight = self._flights.get(key)
+            if flight is not None:
+                if flight.thread == threading.get_ident():
+                    # This thread's event loop runs the fetch: waiting would deadlock it
+                    raise RuntimeError(f"get({key!r}) called on the event loop fetching it; use get_async()")
+                self._stats["coalesced"] += 1
+                leader = False
+            else:
+                flight = _Flight()
+                self._flights[key] = flight
+                self._stats["misses"] += 1
+                leader = True
+
+        if leader:
+            self._run_flight(key, fetch, flight)
+            if flight.error is not None:
+                raise flight.error
+        else:
+            flight.done.wait()
+            if flight.error is not None:
+                raise _failed(flight.error)
+        return flight.value
+
+    def _run_flight(self, key, fetch, flight):
+        try:
+            flight.value = fetch()
+        except Exception as e:
+            flight.error = e
+        with self._lock:
+            self._record(key, flight)
+
+    async def get_async(self, key, fetch):
+        """
+        Coroutine version of get(): fetch is an async callable. A fetch already
+        in flight, started by either get() or get_async(), is awaited instead
+        of starting another one.
+        """
+        # Imported here so the threaded server never pays for asyncio at startup
+        import asyncio
+
+        loop = asyncio.get_running_loop()
+        now = self._clock()
+        with self._lock:
+            failure = self._recent_failure(key, now)
+            entry = self._entries.get(key)
+            if entry is not None:
+                value, fetched_at = entry
+                age = now - fetched_at
+                if age < self.ttl:
+                    self._stats["hits"] += 1
+                    return value
+                if age < self.ttl + self.stale_ttl:
+                    self._stats["stale_hits"] += 1
+                    if key not in self._flights and failure is None:
+                        self._stats["refreshes"] += 1
+                        self._start_async_flight(loop, key, fetch)
+                    return value
+
+            if failure is not None:
+                self._stats["failed_hits"] += 1
+                if failure[0] is not None:
+                    raise _failed(failure[0])
+                return None
+
+            flight = self._flights.get(key)
+            if flight is not None:
+                self._stats["coalesced"] += 1
+            else:
+                flight = self._start_async_flight(loop, key, fetch)
+                self._stats["misses"] += 1
+            # Each caller awaits its own future: a cancelled caller doesn't cancel the shared fetch
+            future = flight.add_waiter(loop)
+
+        return await future
+
+    def _start_async_flight(self, loop, key, fetch):
+        """Register a flight and run fetch() as a task on loop. Call with the lock held."""
+        flight = _Flight(thread=threading.get_ident())
+        self._flights[key] = flight
+        # Kept on the flight so the task isn't garbage-collected while nobody awaits it
+        flight.task = loop.create_task(self._run_async_flight(key, fetch, flight))
+        return flight
+
+    async def _run_async_flight(self, key, fetch, flight):
+        try:
+            flight.value = await fetch()
+        except BaseException as e:
+            flight.error = e if isinstance(e, Exception) else RuntimeError(f"rate fetch aborted: {e!r}")
+        with self._lock:
+            self._record(key, flight)
+
+    def peek(self, key):
+        """Return the cached value for key regardless of age, or None."""
+        with self._lock:
+            entry = self._entries.get(key)
+        return entry[0] if entry else None
+
+    def invalidate(self, key=None):
+        """Drop one key, or every key when none is given."""
+        with self._lock:
+            if key is None:
+                self._entries.clear()
+                self._failures.clear()
+            else:
+                self._entries.pop(key, None)
+                self._failures.pop(key, None)
+
+    def stats(self):
+        """Snapshot of the hit/miss/refresh counters plus the derived hit ratio."""
+        with self._lock:
+            snapshot = dict(self._stats)
+            snapshot["entries"] = len(self._entries)
+        lookups = (snapshot["hits"] + snapshot["stale_hits"] + snapshot["misses"] + snapshot["coalesced"]
+                   + snapshot["failed_hits"])
+        served_from_cache = snapshot["hits"] + snapshot["stale_hits"] + snapshot["coalesced"]
+        snapshot["hit_ratio"] = round(served_from_cache / lookups, 4) if lookups else 0.0
+        snapshot["ttl"] = self.ttl
+        snapshot["stale_ttl"] = self.stale_ttl
+        snapshot["error_ttl"] = self.error_ttl
+        return snapshot
+
+
+# Shared cache used by app.get_exchange_rate
+rate_cache = RateCache()
@@ -0,0 +1,127 @@
+"""
+Dense exchange-rate matrix over a fixed list of currencies.
+
+One provider table (units of every quote currency per 1 unit of a base) is
+enough to fill the whole matrix: matrix[i, j] is the number of units of
+currencies[j] per unit of currencies[i], so cross rates are plain lookups.
+"""
+
+import threading
+import time
+
+import numpy as np
+
+
+class RateMatrix:
+    """All-pairs rate matrix built from a single base-currency table."""
+
+    def __init__(self, currencies):
+        self.currencies = list(currencies)
+        self.index = {code: i for i, code in enumerate(self.currencies)}
+        n = len(self.currencies)
+        matrix = np.full((n, n), np.nan)
+        np.fill_diagonal(matrix, 1.0)
+        self.matrix = matrix
+        self.base = None
+        self.source = None
+        self.updated_at = None
+        self._lock = threading.Lock()
+
+    def load_table(self, base, rates, source=None):
+        """
+        Rebuild the matrix from a {quote: rate} table quoted against base.
+        Currencies missing from the table stay NaN and are reported as unknown.
+        """
+        vector = np.full(len(self.currencies), np.nan)
+        for code, i in self.index.items():
+            if code == base:
+                vector[i] = 1.0
+                continue
+            value = rates.get(code)
+            try:
+                value = float(value)
+            except (TypeError, ValueError):
+                continue
+            if value > 0:
+                vector[i] = value
+
+        with np.errstate(divide="ignore", invalid="ignore"):
+            matrix = vector[np.newaxis, :] / vector[:, np.newaxis]
+        np.fill_diagonal(matrix, 1.0)
+
+        with self._lock:
+            # Readers only ever see a fully built matrix
+            self.matrix = matrix
+            self.base = base
+            self.source = source if source is not None else rates
+            self.updated_at = time.time()
+
+    def load_nested(self, rates, source=None):
+        """
+        Fill the matrix directly from a nested {from: {to: rate}} table such as
+        FALLBACK_RATES. Pairs the table doesn't list stay unknown.
+        """
+        n = len(self.currencies)
+        matrix = np.full((n, n), np.nan)
+        for code, i in self.index.items():
+            for other, value in rates.get(code, {}).items():
+                j = self.index.get(other)
+                if j is not None and value and value > 0:
+                    matrix[i, j] = float(value)
+        np.fill_diagonal(matrix, 1.0)
+        with self._lock:
+            self.matrix = matrix
+            self.base = None
+            self.source = source if source is not None else rates
+            self.updated_at = time.time()
+
+    def indices(self, codes):
+        """Matrix index for each currency code, -1 for unknown codes."""
+        index = self.index
+        return np.fromiter((index.get(code, -1) for code in codes), dtype=np.intp, count=len(codes))
+
+    def rate(self, from_currency, to_currency):
+        """Return the from→to rate, or None if either side is unknown."""
+        i = self.index.get(from_currency)
+        j = self.index.get(to_currency)
+        if i is None or j is None:
+            return None
+        value = self.matrix[i, j]
+        if np.isnan(value):
+            return None
+        return float(value)
+
+    def is_loaded(self):
+        return self.updated_at is not None
+
+    def snapshot(self):
+        """Return an independent copy of the current matrix."""
+        return self.matrix.copy()
+
+    def to_dict(self):
+        """Nested {from: {to: rate}} view, skipping unknown pairs."""
+        matrix = self.matrix
+        table = {}
+        for code, i in self.index.items():
+            row = {}
+            for other, j in self.index.items():
+                if i != j and not np.isnan(matrix[i, j]):
+                    row[other] = round(float(matrix[i, j]), 6)
+            table[code] = row
+        return table
+
+
+def convert_arrays(matrix, from_idx, to_idx, amounts):
+    """
+    Vectorized conversion against one matrix snapshot.
+    Returns (rates, results, valid) arrays; rows with an unknown currency,
+    unknown pair or non-positive/non-finite amount are marked invalid.
+    """
+    amounts = np.asarray(amounts, dtype=float)
+    known = (from_idx >= 0) & (to_idx >= 0)
+    rates = np.full(amounts.shape, np.nan)
+    rates[known] = matrix[from_idx[known], to_idx[known]]
+    with np.errstate(invalid="ignore"):
+        valid = known & ~np.isnan(rates) & np.isfinite(amounts) & (amounts > 0)
+    results = np.round(amounts * rates, 2)
+    return rates, results, valid
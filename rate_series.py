@@ -0,0 +1,284 @@
+"""
+Persistent time series of observed exchange rates.
+
+Observations are appended to a JSON Lines file and indexed in memory as one
+bucket per pair per calendar day (high, low, close, sum, count). Rolling-window
+queries such as the weekly high only touch one bucket per day in the window,
+so they never need the network.
+
+Every RATE_SERIES_COMPACT_EVERY appended lines the file is rewritten: ticks
+older than RATE_SERIES_TICK_DAYS are folded into one summary row per pair per
+day carrying that day's bucket, so the file grows with the number of days
+rather than the number of refreshes. Appends take a shared file lock and the
+rewrite an exclusive one.
+"""
+
+import json
+import math
+import os
+import threading
+import time
+from datetime import datetime
+
+from shared_state import file_lock
+
+
+RATE_SERIES_FILE = os.getenv("RATE_SERIES_FILE", "rate_series.jsonl")
+RATE_SEED_FILE = "rate_history.json"
+# Minimum seconds between persisted observations of an unchanged pair
+RATE_SERIES_MIN_INTERVAL = float(os.getenv("RATE_SERIES_MIN_INTERVAL", "300"))
+RATE_SERIES_COMPACT_EVERY = int(os.getenv("RATE_SERIES_COMPACT_EVERY", "5000"))
+# Days of individual ticks kept by compaction; older days keep one summary row
+RATE_SERIES_TICK_DAYS = int(os.getenv("RATE_SERIES_TICK_DAYS", "30"))
+
+TIME_FORMAT = "%Y-%m-%d %H:%M:%S"
+
+# Longest window accepted by the stats API
+RATE_STATS_MAX_DAYS = 365
+
+# Bucket layout: [high, low, close, sum, count]
+HIGH, LOW, CLOSE, SUM, COUNT = range(5)
+
+# rate_history.json holds undated rates; they are stamped well before any
+# rolling window so they never count as current observations
+SEED_TIME = datetime(2000, 1, 1)
+
+
+def pair_key(from_currency, to_currency):
+    return f"{from_currency}_{to_currency}"
+
+
+def _row_bucket(row):
+    """The bucket a file row stands for: one tick, or a compacted day."""
+    rate = float(row["rate"])
+    if "count" in row:
+        return [float(row["high"]), float(row["low"]), rate, float(row["sum"]), int(row["count"])]
+    return [rate, rate, rate, rate, 1]
+
+
+def _merge(bucket, later):
+    """Fold a later bucket of the same day into bucket."""
+    if later[HIGH] > bucket[HIGH]:
+        bucket[HIGH] = later[HIGH]
+    if later[LOW] < bucket[LOW]:
+        bucket[LOW] = later[LOW]
+    bucket[CLOSE] = later[CLOSE]
+    bucket[SUM] += later[SUM]
+    bucket[COUNT] += later[COUNT]
+
+
+class RateSeries:
+    """Append-only rate observations with a per-day bucket index."""
+
+    def __init__(self, path=RATE_SERIES_FILE, seed_path=RATE_SEED_FILE,
+                 compact_every=RATE_SERIES_COMPACT_EVERY, tick_days=RATE_SERIES_TICK_DAYS):
+        self.path = path
+        self.seed_path = seed_path
+        self.compact_every = compact_every
+        self.tick_days = tick_days
+        self._appends_since_compact = 0
+        self._lock = threading.Lock()
+        self._days = {}          # pair -> {date ordinal: bucket}
+        self._last_saved = {}    # pair -> (rate, epoch seconds)
+        self._loaded = False
+
+    def load(self):
+        """Build the index from the series file, seeding it from rate_history.json on first run."""
+        with self._lock:
+            if self._loaded:
+                return
+            self._loaded = True
+            if not os.path.exists(self.path):
+                self._seed()
+                return
+            try:
+                with open(self.path, "r", encoding="utf-8") as f:
+                    for line in f:
+                        self._appends_since_compact += 1
+                        try:
+                            row = json.loads(line)
+                            when = datetime.strptime(row["time"], TIME_FORMAT)
+                            self._add_bucket(row["pair"], _row_bucket(row), when)
+                        except (ValueError, KeyError, TypeError):
+                            # Skip a torn or malformed line rather than losing the file
+                            continue
+            except Exception as e:
+                print(f"[WARN] Failed to load {self.path}: {e}")
+
+    def _seed(self):
+        if not self.seed_path or not os.path.exists(self.seed_path):
+            return
+        try:
+            with open(self.seed_path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            rows = []
+            for pair, rate in data.items():
+                base, _, quote = pair.partition("_")
+                if not quote or base == quote:
+                    continue
+                rows.append((pair, float(rate), SEED_TIME))
+            for pair, rate, ts in rows:
+                self._add(pair, rate, ts)
+            self._append(rows)
+        except Exception as e:
+            print(f"[WARN] Failed to seed rate series from {self.seed_path}: {e}")
+
+    def _add(self, pair, rate, when):
+        self._add_bucket(pair, [rate, rate, rate, rate, 1], when)
+
+    def _add_bucket(self, pair, bucket, when):
+        days = self._days.setdefault(pair, {})
+        day = when.toordinal()
+        if day in days:
+            _merge(days[day], bucket)
+        else:
+            days[day] = bucket
+
+    def _append(self, rows):
+        if not rows:
+            return
+        lines = "".join(
+            json.dumps({"pair": pair, "rate": rate, "time": when.strftime(TIME_FORMAT)}) + "\n"
+            for pair, rate, when in rows
+        )
+        try:
+            with file_lock(self.path, shared=True):
+                with open(self.path, "a", encoding="utf-8") as f:
+                    f.write(lines)
+        except Exception as e:
+            print(f"[WARN] Failed to append to {self.path}: {e}")
+            return
+        self._appends_since_compact += len(rows)
+        if self.compact_every and self._appends_since_compact >= self.compact_every:
+            self._compact()
+
+    def compact(self):
+        """Fold ticks older than tick_days into one row per pair per day and rewrite the file."""
+        with self._lock:
+            self._compact()
+
+    def _compact(self):
+        # Works from the file rather than this process's index, so rows other
+        # workers appended are kept; the index already holds the same buckets
+        self._appends_since_compact = 0
+        cutoff = datetime.now().toordinal() - self.tick_days + 1
+        try:
+            with file_lock(self.path):
+                if not os.path.exists(self.path):
+                    return
+                days = {}     # (pair, day) -> [bucket, time of the day's last row]
+                recent = []
+                with open(self.path, "r", encoding="utf-8") as f:
+                    for line in f:
+                        try:
+                            row = json.loads(line)
+                            when = datetime.strptime(row["time"], TIME_FORMAT)
+                            bucket = _row_bucket(row)
+                            key = (row["pair"], when.toordinal())
+                        except (ValueError, KeyError, TypeError):
+                            continue
+                        if key[1] >= cutoff:
+                            recent.append(line if line.endswith("\n") else line + "\n")
+                        elif key in days:
+                            _merge(days[key][0], bucket)
+                            days[key][1] = row["time"]
+                        else:
+                            days[key] = [bucket, row["time"]]
+                summaries = sorted(days.items(), key=lambda item: item[1][1])
+                lines = [
+                    json.dumps({"pair": pair, "rate": bucket[CLOSE], "time": stamp, "high": bucket[HIGH],
+                                "low": bucket[LOW], "sum": bucket[SUM], "count": bucket[COUNT]}) + "\n"
+                    for (pair, _), (bucket, stamp) in summaries
+                ]
+                tmp_path = f"{self.path}.tmp"
+                with open(tmp_path, "w", encoding="utf-8") as f:
+                    f.write("".join(lines + recent))
+                    f.flush()
+                    os.fsync(f.fileno())
+                os.replace(tmp_path, self.path)
+        except Exception as e:
+            print(f"[WARN] Failed to compact {self.path}: {e}")
+
+    def record(self, from_currency, to_currency, rate, when=None):
+        self.record_many([(from_currency, to_currency, rate)], when)
+
+    def record_many(self, observations, when=None):
+        """
+        Add (from, to, rate) observations. Every one updates the index; an
+        unchanged rate is only written to disk once per RATE_SERIES_MIN_INTERVAL.
+        """
+        self.load()
+        when = (when or datetime.now()).replace(microsecond=0)
+        now = time.time()
+        to_write = []
+        with self._lock:
+            for from_currency, to_currency, rate in observations:
+                if from_currency == to_currency or rate is None or rate <= 0:
+                    continue
+                pair = pair_key(from_currency, to_currency)
+                rate = float(rate)
+                self._add(pair, rate, when)
+                last = self._last_saved.get(pair)
+                if last is None or last[0] != rate or now - last[1] >= RATE_SERIES_MIN_INTERVAL:
+                    self._last_saved[pair] = (rate, now)
+                    to_write.append((pair, rate, when))
+            self._append(to_write)
+
+    def window_stats(self, from_currency, to_currency, days=7, end=None):
+        """
+        Rolling stats over the last `days` calendar days ending at `end` (default today):
+        high, low, mean, volatility (std-dev of daily log returns) and counts.
+        Returns None when the window holds no observations.
+        """
+        self.load()
+        end_day = (end or datetime.now()).toordinal()
+        with self._lock:
+            buckets = self._days.get(pair_key(from_currency, to_currency))
+            if not buckets:
+                return None
+            first_day = end_day - days + 1
+            if days <= len(buckets):
+                window = [buckets[d] for d in range(first_day, end_day + 1) if d in buckets]
+            else:
+                # A window longer than the stored history: walk the stored days instead of the calendar
+                window = [buckets[d] for d in sorted(buckets) if first_day <= d <= end_day]
+            if not window:
+                return None
+            high = max(b[HIGH] for b in window)
+            low = min(b[LOW] for b in window)
+            total = sum(b[SUM] for b in window)
+            count = sum(b[COUNT] for b in window)
+            closes = [b[CLOSE] for b in window]
+
+        returns = [math.log(b / a) for a, b in zip(closes, closes[1:])]
+        volatility = None
+        if len(returns) >= 2:
+            mean_return = sum(returns) / len(returns)
+            volatility = math.sqrt(sum((r - mean_return) ** 2 for r in returns) / (len(returns) - 1))
+        return {
+            "high": high,
+            "low": low,
+            "mean": total / count,
+            "volatility": volatility,
+            "observations": count,
+            "days_with_data": len(window),
+        }
+
+    def daily_closes(self, from_currency, to_currency, days=None):
+        """[(date, close)] for the pair in date order, optionally only the last `days` days."""
+        self.load()
+        with self._lock:
+            buckets = self._days.get(pair_key(from_currency, to_currency), {})
+            items = sorted((day, bucket[CLOSE]) for day, bucket in buckets.items())
+        if days is not None:
+            cutoff = datetime.now().toordinal() - days + 1
+            items = [item for item in items if item[0] >= cutoff]
+        return [(datetime.fromordinal(day).date(), close) for day, close in items]
+
+    def pairs(self):
+        self.load()
+        with self._lock:
+            return list(self._days.keys())
+
+
+rate_series = RateSeries()
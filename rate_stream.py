@@ -0,0 +1,150 @@
+"""
+Server-side fan-out of live rates to streaming (Server-Sent Events) clients.
+
+One background poller per process reads the current rates for every pair
+that has at least one subscriber, every RATE_STREAM_INTERVAL seconds, and
+pushes a delta to the subscribers of each pair whose rate changed. The rates
+come through the shared rate cache, so upstream fetches stay at one table per
+cache TTL however many clients are connected. The poller starts with the
+first subscriber and stops when the last one leaves.
+
+A subscription keeps only the newest pending event per pair: a slow client
+skips intermediate rates instead of buffering them, so memory per client is
+bounded by the number of pairs it follows.
+"""
+
+import json
+import os
+import threading
+from datetime import datetime
+
+from logs import get_logger
+
+
+RATE_STREAM_INTERVAL = float(os.getenv("RATE_STREAM_INTERVAL", "5"))
+# Seconds between keep-alive comments on an idle stream
+RATE_STREAM_HEARTBEAT = float(os.getenv("RATE_STREAM_HEARTBEAT", "15"))
+
+log = get_logger("rate_stream")
+
+
+def format_event(event):
+    """One rate event as a text/event-stream frame."""
+    return f"event: rate\nid: {event['id']}\ndata: {json.dumps(event, ensure_ascii=False)}\n\n"
+
+
+HEARTBEAT_FRAME = ": keep-alive\n\n"
+# No caching, and no response buffering by nginx-style proxies
+STREAM_HEADERS = {"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+
+
+class Subscription:
+    """Pending events for one client; wake() is called (from the poller thread) when there are new ones."""
+
+    def __init__(self, pairs, wake):
+        self.pairs = frozenset(pairs)
+        self._wake = wake
+        self._lock = threading.Lock()
+        self._pending = {}   # pair -> newest undelivered event
+
+    def push(self, pair, event):
+        with self._lock:
+            self._pending[pair] = event
+        try:
+            self._wake()
+        except Exception as e:
+            # e.g. the client's event loop already closed; it unsubscribes on its way out
+            log.debug("Stream wake-up failed", error=str(e))
+
+    def drain(self):
+        """Pending events, oldest first, and clear them."""
+        with self._lock:
+            events, self._pending = list(self._pending.values()), {}
+        return sorted(events, key=lambda event: event["id"])
+
+
+class RateStream:
+    """Per-pair subscriber sets fed by a single background poller."""
+
+    def __init__(self, fetch_rates, interval=RATE_STREAM_INTERVAL):
+        # fetch_rates(pairs) -> {(from, to): rate}, or None when no rates are available
+        self._fetch_rates = fetch_rates
+        self.interval = interval
+        self._lock = threading.Lock()
+        self._subscribers = {}   # pair -> set of Subscription
+        self._latest = {}        # pair -> last published event
+        self._next_id = 1
+        self._worker = None
+        self._kick = threading.Event()
+
+    def subscribe(self, pairs, wake):
+        """Follow pairs ((from, to) tuples); the current rate of each known pair is queued right away."""
+        subscription = Subscription(pairs, wake)
+        with self._lock:
+            for pair in subscription.pairs:
+                self._subscribers.setdefault(pair, set()).add(subscription)
+            known = [self._latest[pair] for pair in subscription.pairs if pair in self._latest]
+            if len(known) < len(subscription.pairs):
+                # New pairs: poll now instead of at the end of the current interval
+                self._kick.set()
+            if self._worker is None or not self._worker.is_alive():
+                self._worker = threading.Thread(target=self._run, name="rate-stream", daemon=True)
+                self._worker.start()
+        for event in known:
+            subscription.push((event["from"], event["to"]), event)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            for pair in subscription.pairs:
+                subscribers = self._subscribers.get(pair)
+                if subscribers is not None:
+                    subscribers.discard(subscription)
+                    if not subscribers:
+                        del self._subscribers[pair]
+
+    def subscriber_count(self):
+        with self._lock:
+            return len({s for subscribers in self._subscribers.values() for s in subscribers})
+
+    def _run(self):
+        while True:
+            with self._lock:
+                if not self._subscribers:
+                    # Cleared under the lock, so the next subscribe() starts a new poller
+                    self._worker = None
+                    return
+                pairs = list(self._subscribers)
+            self._kick.clear()
+            try:
+                rates = self._fetch_rates(pairs)
+            except Exception as e:
+                log.warning("Rate stream poll failed", error=str(e))
+                rates = None
+            if rates:
+                self.publish(rates)
+            self._kick.wait(self.interval)
+
+    def publish(self, rates):
+        """Send each changed rate to the subscribers of its pair. Returns the number of events."""
+        now = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        deliveries = []
+        with self._lock:
+            for pair, rate in rates.items():
+                previous = self._latest.get(pair)
+                if rate is None or (previous is not None and previous["rate"] == rate):
+                    continue
+                event = {
+                    "id": self._next_id,
+                    "from": pair[0],
+                    "to": pair[1],
+                    "rate": rate,
+                    "previous": previous["rate"] if previous else None,
+                    "time": now,
+                }
+                self._next_id += 1
+                self._latest[pair] = event
+                deliveries.extend((subscription, pair, event) for subscription in self._subscribers.get(pair, ()))
+        for subscription, pair, event in deliveries:
+            subscription.push(pair, event)
+        return len({event["id"] for _, _, event in deliveries})
@@ -0,0 +1,262 @@
+"""
+Time-bucket rollups of the conversion history for the dashboard.
+
+Conversions are summed per (pair, mode) into hourly, daily and monthly
+buckets. Each granularity is a pair of 2-D NumPy arrays - one row per
+(pair, mode), one column per bucket - holding running (prefix) sums along
+time, so the count or amount over any bucket range is one subtraction per
+row however long the history is, and a chart of N buckets costs O(N).
+A conversion landing in the newest bucket updates one cell per array.
+
+The rollups live in memory: built from the history on first use, then kept
+current by folding in only the entries appended since. With the SQLite store
+they are built from per-hour groups the database computes (merge()), so the
+rows themselves never reach Python.
+"""
+
+import threading
+from datetime import date
+
+import numpy as np
+
+
+GRANULARITIES = ("hour", "day", "month")
+# Longest series a single query may ask for
+ROLLUP_MAX_POINTS = 5000
+
+
+def bucket_of(granularity, when):
+    """Bucket number of a date/datetime: hours or days since 0001-01-01, or months since year 0."""
+    if granularity == "hour":
+        return when.toordinal() * 24 + getattr(when, "hour", 0)
+    if granularity == "day":
+        return when.toordinal()
+    return when.year * 12 + when.month - 1
+
+
+def bucket_label(granularity, bucket):
+    if granularity == "hour":
+        return f"{date.fromordinal(bucket // 24).isoformat()} {bucket % 24:02d}:00"
+    if granularity == "day":
+        return date.fromordinal(bucket).isoformat()
+    return f"{bucket // 12:04d}-{bucket % 12 + 1:02d}"
+
+
+def _buckets(value):
+    """(hour, day, month) bucket numbers of 'YYYY-MM-DD HH:MM:SS' (or just the date), without strptime."""
+    year, month = int(value[0:4]), int(value[5:7])
+    day = date(year, month, int(value[8:10])).toordinal()
+    return day * 24 + int(value[11:13] or 0), day, year * 12 + month - 1
+
+
+class _Grid:
+    """Prefix sums of conversion counts and amounts per row, for one granularity."""
+
+    def __init__(self):
+        self.start = None   # bucket number of column 0
+        self.length = 0     # columns in use
+        self.counts = np.zeros((0, 0), dtype=np.int64)
+        self.amounts = np.zeros((0, 0))
+
+    @property
+    def end(self):
+        return self.start + self.length - 1
+
+    def _reserve(self, rows, lo, hi):
+        """Room for `rows` rows and buckets lo..hi; new columns carry the running sums forward."""
+        if self.start is None:
+            self.start = lo
+        shift = max(0, self.start - lo)
+        length = max(self.length + shift, hi - self.start + shift + 1)
+        cap_rows, cap_cols = self.counts.shape
+        if shift or rows > cap_rows or length > cap_cols:
+            # Grow geometrically so appends stay amortized O(1)
+            shape = (max(rows, 2 * cap_rows, 8), max(length, 2 * cap_cols, 64))
+            for name in ("counts", "amounts"):
+                old = getattr(self, name)
+                new = np.zeros(shape, dtype=old.dtype)
+                new[:old.shape[0], shift:shift + self.length] = old[:, :self.length]
+                setattr(self, name, new)
+            self.start -= shift
+            self.length += shift
+        if length > self.length:
+            for arr in (self.counts, self.amounts):
+                arr[:, self.length:length] = arr[:, self.length - 1:self.length] if self.length else 0
+            self.length = length
+
+    def add(self, rows, row_ids, buckets, amounts, counts=1):
+        lo, hi = int(buckets.min()), int(buckets.max())
+        self._reserve(rows, lo, hi)
+        first, last = lo - self.start, hi - self.start + 1
+        for arr, values in ((self.counts, counts), (self.amounts, amounts)):
+            delta = np.zeros((arr.shape[0], last - first), dtype=arr.dtype)
+            np.add.at(delta, (row_ids, buckets - lo), values)
+            arr[:, first:last] += np.cumsum(delta, axis=1)
+            arr[:, last:self.length] += delta.sum(axis=1)[:, None]
+
+    def _at(self, columns):
+        """Prefix sums at the given column offsets (clamped; before the first column is 0)."""
+        clipped = np.clip(columns, 0, max(self.length - 1, 0))
+        before = (columns < 0)[None, :]
+        return (np.where(before, 0, self.counts[:, clipped]),
+                np.where(before, 0.0, self.amounts[:, clipped]))
+
+    def totals(self, lo, hi):
+        """Per-row (counts, amounts) over buckets lo..hi."""
+        if self.start is None or hi < self.start or lo > self.end:
+            rows = self.counts.shape[0]
+            return np.zeros(rows, dtype=np.int64), np.zeros(rows)
+        (c_hi, c_lo), (a_hi, a_lo) = (
+            pair.T for pair in self._at(np.array([hi - self.start, lo - self.start - 1]))
+        )
+        return c_hi - c_lo, a_hi - a_lo
+
+    def series(self, lo, hi, row_ids):
+        """(counts, amounts) per bucket lo..hi, summed over row_ids."""
+        n = hi - lo + 1
+        if self.start is None or not len(row_ids):
+            return np.zeros(n, dtype=np.int64), np.zeros(n)
+        columns = np.arange(lo - self.start - 1, hi - self.start + 1)
+        counts, amounts = self._at(columns)
+        counts, amounts = counts[row_ids].sum(axis=0), amounts[row_ids].sum(axis=0)
+        return np.diff(counts), np.diff(amounts)
+
+
+class HistoryRollups:
+    """Hourly, daily and monthly conversion counts and amounts per (pair, mode)."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._keys = {}     # (pair, mode) -> row
+        self._grids = {g: _Grid() for g in GRANULARITIES}
+        # Entries folded in so far, and the history generation they came from
+        self.count = 0
+        self.generation = None
+
+    def _reset(self):
+        self._keys = {}
+        self._grids = {g: _Grid() for g in GRANULARITIES}
+        self.count = 0
+
+    def rebuild(self, entries, generation=None):
+        with self._lock:
+            self._reset()
+            self._fold(entries)
+            self.generation = generation
+
+    def merge(self, groups, reset=False, generation=None):
+        """
+        Fold in rows grouped by pair, mode and hour (SqliteHistoryStore.summarize
+        with by_hour); reset first when the groups cover the whole history.
+        """
+        with self._lock:
+            if reset:
+                self._reset()
+            row_ids, buckets, counts, amounts = [], [], [], []
+            for from_currency, to_currency, mode, hour, rows, valid, amount, _ in groups:
+                self.count += rows
+                if not valid:
+                    continue
+                try:
+                    hour_buckets = _buckets(hour)
+                except (ValueError, TypeError):
+                    # Rows without a time have no bucket, as in _fold
+                    continue
+                key = (f"{from_currency}→{to_currency}", mode)
+                row_ids.append(self._keys.setdefault(key, len(self._keys)))
+                buckets.append(hour_buckets)
+                counts.append(valid)
+                amounts.append(amount)
+            self.generation = generation
+            self._add(row_ids, buckets, amounts, counts)
+
+    def catch_up(self, entries):
+        """Fold in entries past the current count."""
+        with self._lock:
+            self._fold(entries[self.count:])
+
+    def _fold(self, entries):
+        row_ids, buckets, amounts = [], [], []
+        # Conversions cluster in time, so most entries reuse an hour already parsed
+        parsed = {}
+        for entry in entries:
+            try:
+                hour = entry["time"][:13]
+                entry_buckets = parsed.get(hour)
+                if entry_buckets is None:
+                    entry_buckets = parsed[hour] = _buckets(hour)
+                amount = float(entry.get("amount", 0))
+            except (KeyError, ValueError, TypeError):
+                # Counted as folded in, but without a time it has no bucket
+                continue
+            key = (f"{entry.get('from')}→{entry.get('to')}", entry.get("mode", "live"))
+            row_ids.append(self._keys.setdefault(key, len(self._keys)))
+            buckets.append(entry_buckets)
+            amounts.append(amount)
+        self.count += len(entries)
+        self._add(row_ids, buckets, amounts)
+
+    def _add(self, row_ids, buckets, amounts, counts=None):
+        if not row_ids:
+            return
+        row_ids = np.array(row_ids, dtype=np.intp)
+        amounts = np.array(amounts)
+        counts = 1 if counts is None else np.array(counts, dtype=np.int64)
+        # Columns in GRANULARITIES order: hour, day, month
+        buckets = np.array(buckets, dtype=np.int64)
+        for column, granularity in enumerate(GRANULARITIES):
+            self._grids[granularity].add(len(self._keys), row_ids, buckets[:, column], amounts, counts)
+
+    def dashboard(self, granularity="day", start=None, end=None, pair=None, mode=None, top_pairs=5):
+        """
+        Chart data for conversions between start and end (dates or datetimes,
+        inclusive; default: all of the history) at the given granularity,
+        optionally restricted to one pair ("USD→INR") and/or mode.
+        """
+        if granularity not in GRANULARITIES:
+            raise ValueError(f"granularity must be one of {', '.join(GRANULARITIES)}")
+        with self._lock:
+            grid = self._grids[granularity]
+            if grid.start is None and (start is None or end is None):
+                lo = hi = None
+            else:
+                lo = bucket_of(granularity, start) if start is not None else grid.start
+                hi = bucket_of(granularity, end) if end is not None else grid.end
+                if hi < lo:
+                    raise ValueError("end must not be before start")
+                if hi - lo + 1 > ROLLUP_MAX_POINTS:
+                    raise ValueError(f"range spans {hi - lo + 1} {granularity} buckets; "
+                                     f"the limit is {ROLLUP_MAX_POINTS}, use a coarser granularity")
+
+            keys = list(self._keys)
+            selected = [row for row, (key_pair, key_mode) in enumerate(keys)
+                        if (pair is None or key_pair == pair) and (mode is None or key_mode == mode)]
+            if lo is None:
+                labels, counts, amounts = [], np.zeros(0), np.zeros(0)
+                row_counts, row_amounts = np.zeros(len(keys)), np.zeros(len(keys))
+            else:
+                labels = [bucket_label(granularity, b) for b in range(lo, hi + 1)]
+                counts, amounts = grid.series(lo, hi, np.array(selected, dtype=np.intp))
+                row_counts, row_amounts = grid.totals(lo, hi)
+
+        pair_counts, mode_counts = {}, {}
+        for row in selected:
+            key_pair, key_mode = keys[row]
+            pair_counts[key_pair] = pair_counts.get(key_pair, 0) + int(row_counts[row])
+            mode_counts[key_mode] = mode_counts.get(key_mode, 0) + int(row_counts[row])
+        top = sorted(((p, c) for p, c in pair_counts.items() if c), key=lambda kv: kv[1], reverse=True)[:top_pairs]
+        return {
+            "granularity": granularity,
+            "start": labels[0] if labels else None,
+            "end": labels[-1] if labels else None,
+            # Named daily_* for the dashboard template; the buckets follow `granularity`
+            "daily_labels": labels,
+            "daily_values": [round(float(v), 2) for v in amounts],
+            "count_values": [int(v) for v in counts],
+            "total_count": int(counts.sum()),
+            "total_amount": round(float(amounts.sum()), 2),
+            "pair_labels": [kv[0] for kv in top],
+            "pair_values": [kv[1] for kv in top],
+            "mode_labels": list(mode_counts),
+            "mode_values": list(mode_counts.values()),
+        }
@@ -0,0 +1,125 @@
+"""
+File-based state shared between worker processes.
+
+Under gunicorn every worker is its own process with its own module globals,
+so anything that must agree across workers lives on disk and is guarded by
+advisory locks (fcntl.flock on a sibling ".lock" file):
+
+- file_lock(): shared/exclusive lock context manager
+- SharedJsonFile: a JSON document (alerts.json, subscribers.json,
+  notifications.json) that each worker reloads when another worker has
+  changed it, and updates with a locked read-modify-write
+- LeaderLock: non-blocking exclusive lock held for the life of one process,
+  used to elect the single worker that runs the scheduled jobs
+
+fcntl is POSIX-only. Without it (Windows) locking is a no-op and every
+process considers itself the leader, which is right for the single-process
+dev server.
+"""
+
+import json
+import os
+import threading
+from contextlib import contextmanager
+
+try:
+    import fcntl
+    LOCKING_AVAILABLE = True
+except ImportError:
+    LOCKING_AVAILABLE = False
+
+
+@contextmanager
+def file_lock(path, shared=False):
+    """Hold an advisory lock on `path`.lock for the duration of the block."""
+    if not LOCKING_AVAILABLE:
+        yield
+        return
+    fd = os.open(f"{path}.lock", os.O_RDWR | os.O_CREAT, 0o644)
+    try:
+        fcntl.flock(fd, fcntl.LOCK_SH if shared else fcntl.LOCK_EX)
+        yield
+    finally:
+        # Closing the descriptor releases the lock
+        os.close(fd)
+
+
+def _stamp(path):
+    try:
+        st = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return (st.st_ino, st.st_size, st.st_mtime_ns)
+
+
+def write_atomic(path, data):
+    """Write JSON to a per-process temp file and rename it over path."""
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(data, f, ensure_ascii=False, indent=2)
+    os.replace(tmp_path, path)
+
+
+class SharedJsonFile:
+    """A JSON document on disk that several processes read and update."""
+
+    def __init__(self, path, default=list):
+        self.path = path
+        self.default = default
+        self._stamp = None
+        self._thread_lock = threading.RLock()
+
+    def changed(self):
+        """True when the file differs from what this process last loaded or saved."""
+        return _stamp(self.path) != self._stamp
+
+    def load(self):
+        """Read the document (default() when missing); raises on unreadable JSON."""
+        with self._thread_lock:
+            stamp = _stamp(self.path)
+            if stamp is None:
+                self._stamp = None
+                return self.default()
+            with open(self.path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            self._stamp = stamp
+            return data
+
+    def save(self, data):
+        with self._thread_lock:
+            write_atomic(self.path, data)
+            self._stamp = _stamp(self.path)
+
+    @contextmanager
+    def locked(self):
+        """Exclusive cross-process lock for a reload-modify-save sequence."""
+        with self._thread_lock, file_lock(self.path):
+            yield
+
+
+class LeaderLock:
+    """Process-lifetime exclusive lock; whoever holds it is the leader."""
+
+    def __init__(self, path):
+        self.path = path
+        self._fd = None
+
+    @property
+    def is_leader(self):
+        return self._fd is not None or not LOCKING_AVAILABLE
+
+    def try_acquire(self):
+        """Take leadership if nobody holds it. Returns True when this process is the leader."""
+        if self.is_leader:
+            return True
+        fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            os.close(fd)
+            return False
+        os.ftruncate(fd, 0)
+        os.write(fd, f"{os.getpid()}\n".encode())
+        # Kept open: the lock is released when this process exits
+        self._fd = fd
+        return True
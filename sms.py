@@ -1,18 +1,28 @@
 import os
-from twilio.rest import Client
-from dotenv import load_dotenv
+import threading
 
-load_dotenv()
-
-ACCOUNT_SID = os.getenv("TWILIO_ACCOUNT_SID")
-AUTH_TOKEN = os.getenv("TWILIO_AUTH_TOKEN")
-FROM_NUMBER = os.getenv("TWILIO_PHONE_NUMBER")
+# Read from the environment (and .env) by init_sms on the first send
+ACCOUNT_SID = None
+AUTH_TOKEN = None
+FROM_NUMBER = None
 
 sms_enabled = False
 client = None
+_initialized = False
+_init_lock = threading.Lock()
 
-def init_sms():
-    global sms_enabled, client
+def init_sms(verify=False):
+    """
+    Load the Twilio credentials and build the client. Called lazily by
+    send_sms; pass verify=True to also check the credentials with a network
+    call to the Twilio API. Until it succeeds, the next send tries again.
+    """
+    global ACCOUNT_SID, AUTH_TOKEN, FROM_NUMBER, sms_enabled, client, _initialized
+    from dotenv import load_dotenv
+    load_dotenv()
+    ACCOUNT_SID = os.getenv("TWILIO_ACCOUNT_SID")
+    AUTH_TOKEN = os.getenv("TWILIO_AUTH_TOKEN")
+    FROM_NUMBER = os.getenv("TWILIO_PHONE_NUMBER")
 
     if not ACCOUNT_SID or not AUTH_TOKEN or not FROM_NUMBER:
         print("[SMS] Missing Twilio credentials")
@@ -20,16 +30,25 @@ def init_sms():
         return
 
     try:
+        from twilio.rest import Client
         client = Client(ACCOUNT_SID, AUTH_TOKEN)
-        client.api.accounts(ACCOUNT_SID).fetch()
+        if verify:
+            client.api.accounts(ACCOUNT_SID).fetch()
+            print("[SMS] Twilio SMS Connected Successfully!")
         sms_enabled = True
-        print("[SMS] Twilio SMS Connected Successfully!")
     except Exception as e:
         sms_enabled = False
         print("[SMS ERROR] Twilio Initialization Failed:", e)
+        return
+    # Set last: send_sms reads client without the lock once this is True
+    _initialized = True
 
 
 def send_sms(to, message):
+    if not _initialized:
+        with _init_lock:
+            if not _initialized:
+                init_sms()
     if not sms_enabled:
         print("[SMS DISABLED] SMS not sent.")
         return False
@@ -46,7 +65,3 @@ def send_sms(to, message):
     except Exception as e:
         print("[SMS ERROR] Failed to send:", e)
         return False
-
-
-# Initialize on import
-init_sms()
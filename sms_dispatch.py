@@ -0,0 +1,213 @@
+"""
+Bulk SMS dispatch for large subscriber lists.
+
+dispatch_bulk() fans one message out to many recipients with a bounded
+thread pool. A shared token bucket keeps the send rate at the provider
+limit, and failed sends are retried with exponential backoff. Every
+outcome is appended to a per-message delivery ledger (sms_ledger.jsonl).
+Re-running a batch with the same id, after a crash or once it finished,
+only sends to the recipients that have not been delivered yet. Batches
+started today stay in the ledger; compact() drops older finished (and any
+abandoned) batches from memory and from the file.
+
+The send function is injected (phone, message) -> bool, so a fake in-process
+client can stand in for Twilio.
+"""
+
+import json
+import os
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+
+SMS_LEDGER_FILE = os.getenv("SMS_LEDGER_FILE", "sms_ledger.jsonl")
+SMS_WORKERS = int(os.getenv("SMS_WORKERS", "8"))
+# Twilio long codes accept roughly one message per second; raise for toll-free/short codes
+SMS_RATE_PER_SEC = float(os.getenv("SMS_RATE_PER_SEC", "1"))
+SMS_BURST = int(os.getenv("SMS_BURST", "1"))
+SMS_MAX_ATTEMPTS = int(os.getenv("SMS_MAX_ATTEMPTS", "4"))
+SMS_BACKOFF = float(os.getenv("SMS_BACKOFF", "1.0"))
+
+SENT = "sent"
+FAILED = "failed"
+
+
+class TokenBucket:
+    """Blocking token bucket: `rate` tokens per second, up to `capacity` banked."""
+
+    def __init__(self, rate, capacity=1, clock=time.monotonic, sleep=time.sleep):
+        self.rate = rate
+        self.capacity = max(1, capacity)
+        self._clock = clock
+        self._sleep = sleep
+        self._tokens = float(self.capacity)
+        self._updated = clock()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        while True:
+            with self._lock:
+                now = self._clock()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                wait = (1 - self._tokens) / self.rate
+            self._sleep(wait)
+
+
+class DeliveryLedger:
+    """Append-only JSON Lines record of delivery outcomes for unfinished and today's batches."""
+
+    def __init__(self, path=SMS_LEDGER_FILE):
+        self.path = path
+        self._lock = threading.Lock()
+        self._status = {}     # batch -> {phone: status}, until compact() drops the batch
+        self._batches = {}    # batch -> {"total": n, "message": str}, unfinished batches only
+        self._started = {}    # batch -> "YYYY-MM-DD" it was last started
+        self._load()
+
+    def _load(self):
+        if not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        self._apply(json.loads(line))
+                    except ValueError:
+                        continue
+        except Exception as e:
+            print(f"[WARN] Failed to load {self.path}: {e}")
+
+    def _apply(self, record):
+        batch = record.get("batch")
+        kind = record.get("type")
+        if kind == "batch_started":
+            self._batches[batch] = {"total": record.get("total", 0), "message": record.get("message")}
+            self._started[batch] = (record.get("time") or "")[:10]
+        elif kind == "batch_finished":
+            # Keep the deliveries so a same-day re-run skips them; compact() forgets old batches
+            self._batches.pop(batch, None)
+        elif kind == "batch_abandoned":
+            self._batches.pop(batch, None)
+            self._status.pop(batch, None)
+            self._started.pop(batch, None)
+        else:
+            self._status.setdefault(batch, {})[record.get("phone")] = record.get("status")
+
+    def _write(self, record):
+        record["time"] = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        with self._lock:
+            self._apply(record)
+            try:
+                with open(self.path, "a", encoding="utf-8") as f:
+                    f.write(json.dumps(record, ensure_ascii=False) + "\n")
+                    f.flush()
+            except Exception as e:
+                print(f"[WARN] Failed to write {self.path}: {e}")
+
+    def start_batch(self, batch, total, message):
+        self._write({"type": "batch_started", "batch": batch, "total": total, "message": message})
+
+    def finish_batch(self, batch):
+        self._write({"type": "batch_finished", "batch": batch})
+
+    def abandon_batch(self, batch):
+        """Give up on an unfinished batch; it will not be resumed."""
+        self._write({"type": "batch_abandoned", "batch": batch})
+
+    def compact(self):
+        """
+        Forget finished batches started before today and rewrite the file with
+        the records of the batches left. Returns the records kept.
+        """
+        today = datetime.now().strftime("%Y-%m-%d")
+        with self._lock:
+            for batch in set(self._status) | set(self._started):
+                if batch not in self._batches and self._started.get(batch) != today:
+                    self._status.pop(batch, None)
+                    self._started.pop(batch, None)
+            if not os.path.exists(self.path):
+                return 0
+            tmp_path = f"{self.path}.{os.getpid()}.tmp"
+            kept = 0
+            try:
+                with open(self.path, "r", encoding="utf-8") as f, open(tmp_path, "w", encoding="utf-8") as out:
+                    for line in f:
+                        try:
+                            batch = json.loads(line).get("batch")
+                        except ValueError:
+                            continue
+                        if batch in self._batches or batch in self._started:
+                            out.write(line if line.endswith("\n") else line + "\n")
+                            kept += 1
+                os.replace(tmp_path, self.path)
+            except Exception as e:
+                print(f"[WARN] Failed to compact {self.path}: {e}")
+                if os.path.exists(tmp_path):
+                    os.remove(tmp_path)
+            return kept
+
+    def record(self, batch, phone, status, attempts, error=None):
+        record = {"type": "delivery", "batch": batch, "phone": phone, "status": status, "attempts": attempts}
+        if error:
+            record["error"] = error
+        self._write(record)
+
+    def delivered(self, batch, phone):
+        with self._lock:
+            return self._status.get(batch, {}).get(phone) == SENT
+
+    def incomplete_batches(self):
+        """{batch: message} for batches that were started but never finished."""
+        with self._lock:
+            return {batch: info.get("message") for batch, info in self._batches.items()}
+
+
+def _deliver(batch, phone, message, send, bucket, ledger, max_attempts, backoff, sleep):
+    error = None
+    for attempt in range(1, max_attempts + 1):
+        bucket.acquire()
+        try:
+            if send(phone, message):
+                ledger.record(batch, phone, SENT, attempt)
+                return True
+            error = "provider rejected message"
+        except Exception as e:
+            error = str(e)
+        if attempt < max_attempts:
+            # Exponential backoff with jitter so retries don't arrive in lockstep
+            sleep(backoff * (2 ** (attempt - 1)) * (0.5 + random.random()))
+    ledger.record(batch, phone, FAILED, max_attempts, error)
+    return False
+
+
+def dispatch_bulk(batch, phones, message, send, ledger=None, workers=SMS_WORKERS,
+                  rate=SMS_RATE_PER_SEC, burst=SMS_BURST, max_attempts=SMS_MAX_ATTEMPTS,
+                  backoff=SMS_BACKOFF, sleep=time.sleep):
+    """
+    Send message to every phone in the batch that the ledger has not already
+    marked as sent. Returns {"sent", "failed", "skipped"} counts.
+    """
+    ledger = ledger if ledger is not None else DeliveryLedger()
+    bucket = TokenBucket(rate, burst, sleep=sleep)
+    unique = list(dict.fromkeys(p for p in phones if p))
+    todo = [p for p in unique if not ledger.delivered(batch, p)]
+    summary = {"sent": 0, "failed": 0, "skipped": len(unique) - len(todo)}
+
+    ledger.start_batch(batch, len(unique), message)
+    if todo:
+        with ThreadPoolExecutor(max_workers=max(1, workers), thread_name_prefix="sms-bulk") as pool:
+            results = pool.map(
+                lambda phone: _deliver(batch, phone, message, send, bucket, ledger, max_attempts, backoff, sleep),
+                todo
+            )
+            for ok in results:
+                summary["sent" if ok else "failed"] += 1
+    ledger.finish_batch(batch)
+    return summary
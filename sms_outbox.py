@@ -0,0 +1,58 @@
+"""
+Outbound SMS queue.
+
+Callers enqueue (phone, message) and return immediately; a daemon worker
+thread sends them one by one through the injected send function and reports
+each outcome to an optional callback. Nothing on the HTTP request path waits
+on Twilio.
+"""
+
+import queue
+import threading
+
+from logs import get_logger
+
+log = get_logger("sms_outbox")
+
+
+class SmsOutbox:
+    """FIFO of outbound messages drained by a background worker."""
+
+    def __init__(self, send):
+        self._send = send
+        self._queue = queue.Queue()
+        self._worker = None
+        self._lock = threading.Lock()
+
+    def enqueue(self, phone_number, message, on_result=None):
+        """Queue one SMS; on_result(ok) is called from the worker once it is sent."""
+        self._ensure_worker()
+        self._queue.put((phone_number, message, on_result))
+
+    def _ensure_worker(self):
+        with self._lock:
+            if self._worker is None or not self._worker.is_alive():
+                self._worker = threading.Thread(target=self._run, name="sms-outbox", daemon=True)
+                self._worker.start()
+
+    def _run(self):
+        while True:
+            phone_number, message, on_result = self._queue.get()
+            try:
+                ok = self._send(phone_number, message)
+            except Exception as e:
+                log.error("Outbox send failed", to=phone_number, error=str(e))
+                ok = False
+            if on_result is not None:
+                try:
+                    on_result(ok)
+                except Exception as e:
+                    log.warning("SMS result callback failed", error=str(e))
+            self._queue.task_done()
+
+    def pending(self):
+        return self._queue.qsize()
+
+    def join(self):
+        """Block until every queued message has been handled."""
+        self._queue.join()
@@ -0,0 +1,227 @@
+"""
+Memory-mapped snapshot of the live rate matrix and its daily history.
+
+The scheduler leader writes the full rate matrix plus SNAPSHOT_DAYS days of
+daily closes for every pair to SNAPSHOT_FILE every SNAPSHOT_INTERVAL seconds.
+Every process maps the file read-only instead of parsing it: the arrays are
+views on the OS page cache, shared by all workers without a copy, and a
+lookup is one index into the matrix. Simulated-mode and offline lookups are
+answered from it, with FALLBACK_RATES only covering pairs it doesn't have.
+
+File layout (little-endian, every array 8-byte aligned):
+
+    header  magic b"RATESNAP", format version, currency count n, day count d,
+            created_at and matrix_updated_at (epoch seconds), first_day (date ordinal)
+    codes   n x 8 bytes, ASCII, NUL-padded
+    matrix  n x n float64      units of codes[j] per unit of codes[i]
+    closes  d x n x n float64  daily close of each pair from first_day on, NaN when unknown
+
+A new snapshot is written to a temp file and renamed over the old one, so a
+process still mapping the old file keeps a consistent view; readers check
+for a newer file at most every SNAPSHOT_CHECK_INTERVAL seconds. Windows
+can't rename over a file that is mapped, so there (os.name == "nt") the
+arrays are read into memory instead and no handle stays open.
+
+    python snapshot.py show [--file rate_snapshot.bin]
+"""
+
+import argparse
+import os
+import struct
+import sys
+import threading
+import time
+from datetime import date, datetime
+
+import numpy as np
+
+
+SNAPSHOT_FILE = os.getenv("SNAPSHOT_FILE", "rate_snapshot.bin")
+SNAPSHOT_INTERVAL = int(os.getenv("SNAPSHOT_INTERVAL", "900"))
+SNAPSHOT_DAYS = int(os.getenv("SNAPSHOT_DAYS", "365"))
+SNAPSHOT_CHECK_INTERVAL = float(os.getenv("SNAPSHOT_CHECK_INTERVAL", "60"))
+
+MAGIC = b"RATESNAP"
+FORMAT_VERSION = 1
+HEADER = struct.Struct("<8sIII4xddq")
+CODE_WIDTH = 8
+# Windows refuses to replace a file while any process has it mapped
+SNAPSHOT_MMAP = os.name != "nt"
+
+
+def write_snapshot(path, currencies, matrix, closes, matrix_updated_at=None, days=SNAPSHOT_DAYS):
+    """
+    Write matrix (n x n, in currencies order) and closes ({(from, to): [(date, close)]},
+    the last `days` days are kept) to path, replacing any previous snapshot atomically.
+    """
+    n = len(currencies)
+    index = {code: i for i, code in enumerate(currencies)}
+    days = max(1, days)
+    first_day = date.today().toordinal() - days + 1
+    history = np.full((days, n, n), np.nan)
+    for (from_currency, to_currency), series in closes.items():
+        i, j = index.get(from_currency), index.get(to_currency)
+        if i is None or j is None:
+            continue
+        for day, close in series:
+            offset = day.toordinal() - first_day
+            if 0 <= offset < days:
+                history[offset, i, j] = close
+
+    header = HEADER.pack(MAGIC, FORMAT_VERSION, n, days, time.time(), matrix_updated_at or time.time(), first_day)
+    codes = b"".join(code.encode("ascii")[:CODE_WIDTH].ljust(CODE_WIDTH, b"\0") for code in currencies)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(header)
+        f.write(codes)
+        f.write(np.ascontiguousarray(matrix, dtype="<f8").tobytes())
+        f.write(history.astype("<f8").tobytes())
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+
+class _Mapped:
+    """One mapped snapshot file."""
+
+    def __init__(self, path):
+        with open(path, "rb") as f:
+            raw = f.read(HEADER.size)
+            if len(raw) < HEADER.size:
+                raise ValueError("truncated header")
+            magic, version, n, days, created_at, updated_at, first_day = HEADER.unpack(raw)
+            if magic != MAGIC or version != FORMAT_VERSION:
+                raise ValueError(f"not a version {FORMAT_VERSION} rate snapshot")
+            codes = f.read(n * CODE_WIDTH)
+        self.currencies = [codes[k:k + CODE_WIDTH].rstrip(b"\0").decode("ascii")
+                           for k in range(0, len(codes), CODE_WIDTH)]
+        self.index = {code: i for i, code in enumerate(self.currencies)}
+        self.created_at = created_at
+        self.matrix_updated_at = updated_at
+        self.first_day = first_day
+        offset = HEADER.size + n * CODE_WIDTH
+        if SNAPSHOT_MMAP:
+            self.matrix = np.memmap(path, dtype="<f8", mode="r", offset=offset, shape=(n, n))
+            self.closes = np.memmap(path, dtype="<f8", mode="r", offset=offset + 8 * n * n, shape=(days, n, n))
+        else:
+            data = np.fromfile(path, dtype="<f8", count=n * n * (1 + days), offset=offset)
+            if len(data) < n * n * (1 + days):
+                raise ValueError("truncated data")
+            self.matrix = data[:n * n].reshape(n, n)
+            self.closes = data[n * n:].reshape(days, n, n)
+
+
+class RateSnapshot:
+    """Read-only view of the latest snapshot file, remapped when a newer one appears."""
+
+    def __init__(self, path=SNAPSHOT_FILE, check_interval=SNAPSHOT_CHECK_INTERVAL):
+        self.path = path
+        self.check_interval = check_interval
+        self._lock = threading.Lock()
+        self._mapped = None
+        self._file_key = None   # (inode, mtime, size) of the mapped file
+        self._checked_at = 0.0
+
+    def load(self):
+        """Map the file if it is new or has been replaced. Returns whether a snapshot is available."""
+        with self._lock:
+            self._checked_at = time.monotonic()
+            try:
+                st = os.stat(self.path)
+            except FileNotFoundError:
+                return self._mapped is not None
+            key = (st.st_ino, st.st_mtime_ns, st.st_size)
+            if key != self._file_key:
+                try:
+                    self._mapped = _Mapped(self.path)
+                except Exception as e:
+                    print(f"[WARN] Failed to map rate snapshot {self.path}: {e}")
+                self._file_key = key
+            return self._mapped is not None
+
+    def _current(self):
+        if time.monotonic() - self._checked_at >= self.check_interval:
+            self.load()
+        return self._mapped
+
+    def rate(self, from_currency, to_currency):
+        """The from→to rate in the snapshot, or None."""
+        mapped = self._current()
+        if mapped is None:
+            return None
+        i, j = mapped.index.get(from_currency), mapped.index.get(to_currency)
+        if i is None or j is None:
+            return None
+        value = float(mapped.matrix[i, j])
+        return None if np.isnan(value) else value
+
+    def matrix(self, currencies, fill=None):
+        """
+        The snapshot matrix reordered to currencies (a new array), with unknown
+        pairs taken from `fill` (same shape) or left NaN. None without a snapshot.
+        """
+        mapped = self._current()
+        if mapped is None:
+            return None
+        rows = np.array([mapped.index.get(code, -1) for code in currencies])
+        known = rows >= 0
+        result = np.full((len(currencies), len(currencies)), np.nan)
+        result[np.ix_(known, known)] = mapped.matrix[np.ix_(rows[known], rows[known])]
+        if fill is not None:
+            result = np.where(np.isnan(result), fill, result)
+        return result
+
+    def daily_closes(self, from_currency, to_currency):
+        """[(date, close)] for the pair in date order."""
+        mapped = self._current()
+        if mapped is None:
+            return []
+        i, j = mapped.index.get(from_currency), mapped.index.get(to_currency)
+        if i is None or j is None:
+            return []
+        column = np.asarray(mapped.closes[:, i, j])
+        days = np.flatnonzero(~np.isnan(column))
+        return [(date.fromordinal(mapped.first_day + int(d)), float(column[d])) for d in days]
+
+    def info(self):
+        mapped = self._current()
+        if mapped is None:
+            return {"available": False, "path": self.path}
+        return {
+            "available": True,
+            "path": self.path,
+            "currencies": mapped.currencies,
+            "days": len(mapped.closes),
+            "created_at": datetime.fromtimestamp(mapped.created_at).strftime("%Y-%m-%d %H:%M:%S"),
+            "rates_updated_at": datetime.fromtimestamp(mapped.matrix_updated_at).strftime("%Y-%m-%d %H:%M:%S"),
+            "age_seconds": round(time.time() - mapped.matrix_updated_at, 1),
+        }
+
+
+# Shared read-only view used by app.py for simulated/offline rates
+offline_snapshot = RateSnapshot()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Inspect a rate snapshot file.")
+    parser.add_argument("command", choices=["show"], help="show: print the header and the rate matrix")
+    parser.add_argument("--file", default=SNAPSHOT_FILE, help=f"snapshot file (default: {SNAPSHOT_FILE})")
+    args = parser.parse_args(argv)
+
+    snapshot = RateSnapshot(args.file)
+    if not snapshot.load():
+        print(f"[WARN] No rate snapshot at {args.file}")
+        return 1
+    info = snapshot.info()
+    print(f"{args.file}: {len(info['currencies'])} currencies, {info['days']} days of closes, "
+          f"rates from {info['rates_updated_at']} (written {info['created_at']})")
+    codes = info["currencies"]
+    matrix = snapshot.matrix(codes)
+    print("".join(f"{code:>14}" for code in [""] + codes))
+    for code, row in zip(codes, matrix):
+        print(f"{code:>14}" + "".join(f"{value:>14.6g}" for value in row))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,508 @@
+"""
+Pluggable storage for conversion history, rate alerts and subscribers.
+
+STORAGE_BACKEND selects the implementation:
+
+- "json" (default): history.jsonl (HistoryLog), alerts.json and
+  subscribers.json (SharedJsonFile) - the original file layout
+- "sqlite": one database (STORAGE_DB, default currency.db) in WAL mode, with
+  history indexed by pair and time, alerts by pair and phone, and
+  subscribers unique by phone. Every batch is written in one transaction.
+
+Both backends expose the same stores. The history store has the HistoryLog
+interface (entries/append/append_many/compact/query/page/generation); the
+SQLite one adds summarize(), which groups rows for the analytics counters and
+dashboard rollups inside the database so no worker loads the history. Alerts and
+subscribers are record stores: `items` is the in-memory list the app works
+with, `load()`/`changed()` keep it in step with other workers, `add()` and
+`update()` persist changes (a whole-document rewrite for JSON, single-row
+inserts and updates for SQLite), and `locked()` guards a refresh-then-write
+sequence across processes.
+
+An empty SQLite database imports the JSON files the first time it is opened;
+`python storage.py migrate` does the same on demand.
+"""
+
+import argparse
+import json
+import os
+import sqlite3
+import sys
+import threading
+from contextlib import contextmanager
+
+from alert_index import is_active
+from history_store import (HISTORY_COMPACT_EVERY, HISTORY_FILE, HISTORY_MAX_ENTRIES,
+                           LEGACY_HISTORY_FILE, HistoryLog)
+from shared_state import SharedJsonFile, file_lock
+
+
+STORAGE_BACKEND = os.getenv("STORAGE_BACKEND", "json").lower()
+STORAGE_DB = os.getenv("STORAGE_DB", "currency.db")
+ALERTS_FILE = "alerts.json"
+SUBSCRIBERS_FILE = "subscribers.json"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value INTEGER NOT NULL);
+INSERT OR IGNORE INTO meta (key, value) VALUES
+    ('migrated', 0), ('history_trim', 0), ('alerts', 0), ('subscribers', 0);
+
+CREATE TABLE IF NOT EXISTS history (
+    id INTEGER PRIMARY KEY,
+    from_currency TEXT,
+    to_currency TEXT,
+    mode TEXT,
+    time TEXT,
+    amount REAL,
+    rate REAL,
+    data TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS history_pair_time ON history (from_currency, to_currency, time);
+CREATE INDEX IF NOT EXISTS history_time ON history (time);
+
+CREATE TABLE IF NOT EXISTS alerts (
+    id INTEGER PRIMARY KEY,
+    from_currency TEXT,
+    to_currency TEXT,
+    phone TEXT,
+    target_rate REAL,
+    active INTEGER NOT NULL,
+    data TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS alerts_active_pair ON alerts (from_currency, to_currency, target_rate) WHERE active = 1;
+CREATE INDEX IF NOT EXISTS alerts_phone ON alerts (phone);
+
+CREATE TABLE IF NOT EXISTS subscribers (
+    id INTEGER PRIMARY KEY,
+    phone TEXT NOT NULL UNIQUE,
+    created_at TEXT,
+    data TEXT NOT NULL
+);
+"""
+
+HISTORY_COLUMNS = ("from_currency", "to_currency", "mode", "time", "amount", "rate")
+
+
+def _number(value):
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def _dumps(record):
+    return json.dumps(record, ensure_ascii=False)
+
+
+def _history_row(entry):
+    return (entry.get("from"), entry.get("to"), entry.get("mode"), entry.get("time"),
+            _number(entry.get("amount")), _number(entry.get("rate")), _dumps(entry))
+
+
+def _insert_sql(table, columns, ignore=False):
+    placeholders = ", ".join("?" * (len(columns) + 1))
+    verb = "INSERT OR IGNORE" if ignore else "INSERT"
+    return f"{verb} INTO {table} ({', '.join(columns)}, data) VALUES ({placeholders})"
+
+
+# --- JSON backend ---
+
+class JsonRecordStore:
+    """A list of records kept in one JSON document shared by every worker."""
+
+    def __init__(self, path, key=None):
+        self.path = path
+        # Field that must be unique (checked against a set, not a list scan)
+        self.key = key
+        self.file = SharedJsonFile(path)
+        self.items = []
+        self._keys = set()
+
+    def changed(self):
+        return self.file.changed()
+
+    def locked(self):
+        return self.file.locked()
+
+    def load(self):
+        data = self.file.load()
+        self.items = data if isinstance(data, list) else []
+        if self.key:
+            self._keys = {item.get(self.key) for item in self.items}
+        return self.items
+
+    def add(self, record):
+        """Append and save. Returns False, writing nothing, when the key is already stored."""
+        if self.key:
+            if record.get(self.key) in self._keys:
+                return False
+            self._keys.add(record.get(self.key))
+        self.items.append(record)
+        self.file.save(self.items)
+        return True
+
+    def update(self, records):
+        """Save after records (members of items) were changed in place."""
+        self.file.save(self.items)
+
+
+# --- SQLite backend ---
+
+class SqliteDatabase:
+    """One WAL-mode connection per process, shared by its threads."""
+
+    def __init__(self, path=STORAGE_DB, migrate=True):
+        self.path = path
+        self.migrate = migrate
+        self._conn = None
+        self._pid = None
+        self._lock = threading.RLock()
+
+    def connect(self):
+        with self._lock:
+            # A forked worker must not reuse its parent's connection
+            if self._conn is None or self._pid != os.getpid():
+                conn = sqlite3.connect(self.path, timeout=30, isolation_level=None, check_same_thread=False)
+                conn.execute("PRAGMA journal_mode=WAL")
+                conn.execute("PRAGMA synchronous=NORMAL")
+                conn.executescript(SCHEMA)
+                self._conn, self._pid = conn, os.getpid()
+                if self.migrate:
+                    migrate_json(self)
+            return self._conn
+
+    @contextmanager
+    def transaction(self):
+        """One write transaction (BEGIN IMMEDIATE ... COMMIT), rolled back on error."""
+        with self._lock:
+            conn = self.connect()
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                yield conn
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+            conn.execute("COMMIT")
+
+    def read(self, sql, params=()):
+        with self._lock:
+            return self.connect().execute(sql, params).fetchall()
+
+    def version(self, key):
+        """Counter bumped by every write to a table, so other processes can tell it changed."""
+        rows = self.read("SELECT value FROM meta WHERE key = ?", (key,))
+        return rows[0][0] if rows else 0
+
+    @staticmethod
+    def bump(conn, key):
+        """Increment key's counter inside the caller's transaction; returns the new value."""
+        conn.execute("UPDATE meta SET value = value + 1 WHERE key = ?", (key,))
+        return conn.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()[0]
+
+
+class SqliteHistoryStore:
+    """Conversion history as indexed rows, with the HistoryLog interface."""
+
+    def __init__(self, db, compact_every=HISTORY_COMPACT_EVERY, max_entries=HISTORY_MAX_ENTRIES):
+        self.db = db
+        self.compact_every = compact_every
+        self.max_entries = max_entries
+        self._lock = threading.RLock()
+        self._entries = None
+        self._last_id = 0
+        self._trims = None
+        self._appends_since_compact = 0
+        # Bumped whenever the entries are replaced rather than appended to
+        self.generation = 0
+
+    def _check_trims(self):
+        """Bump generation when rows were trimmed (here or by another process) since the last check."""
+        trims = self.db.version("history_trim")
+        if self._trims is not None and trims != self._trims:
+            self.generation += 1
+            self._entries = None
+        self._trims = trims
+
+    def entries(self):
+        """All entries in insertion order, including rows other processes inserted."""
+        with self._lock:
+            self._check_trims()
+            if self._entries is None:
+                self._entries = []
+                self._last_id = 0
+            rows = self.db.read("SELECT id, data FROM history WHERE id > ? ORDER BY id", (self._last_id,))
+            self._entries.extend(json.loads(data) for _, data in rows)
+            if rows:
+                self._last_id = rows[-1][0]
+            return self._entries
+
+    def append(self, entry):
+        self.append_many([entry])
+
+    def append_many(self, new_entries):
+        """Insert several entries in one transaction."""
+        if not new_entries:
+            return
+        rows = [_history_row(entry) for entry in new_entries]
+        with self._lock:
+            try:
+                with self.db.transaction() as conn:
+                    conn.executemany(_insert_sql("history", HISTORY_COLUMNS), rows)
+            except Exception as e:
+                print(f"[WARN] Failed to append history to {self.db.path}: {e}")
+                return
+            self._appends_since_compact += len(new_entries)
+            if self.compact_every and self._appends_since_compact >= self.compact_every:
+                self.compact()
+
+    def compact(self):
+        """Apply HISTORY_MAX_ENTRIES retention (rows are never torn, so there is nothing else to drop)."""
+        with self._lock:
+            self._appends_since_compact = 0
+            if not self.max_entries:
+                return
+            try:
+                with self.db.transaction() as conn:
+                    cur = conn.execute(
+                        "DELETE FROM history WHERE id <= "
+                        "(SELECT id FROM history ORDER BY id DESC LIMIT 1 OFFSET ?)",
+                        (self.max_entries,)
+                    )
+                    if cur.rowcount:
+                        self.db.bump(conn, "history_trim")
+            except Exception as e:
+                print(f"[WARN] Failed to trim history in {self.db.path}: {e}")
+
+    def summarize(self, after_id=0, by_hour=False):
+        """
+        Rows with id > after_id grouped by pair and mode (and hour when by_hour)
+        in SQL, so only the groups reach Python. Returns (groups, last_id,
+        last_time); a group is (from, to, mode, hour, rows, rows_with_amount,
+        amount_sum, largest_amount), hour being "YYYY-MM-DD HH" or None.
+        Check `generation` afterwards: a change means rows were trimmed and
+        anything folded from earlier calls is stale.
+        """
+        hour = "substr(time, 1, 13)" if by_hour else "NULL"
+        with self._lock:
+            self._check_trims()
+            newest = self.db.read("SELECT id, time FROM history ORDER BY id DESC LIMIT 1")
+            last_id, last_time = newest[0] if newest else (0, None)
+            if last_id <= after_id:
+                return [], last_id, last_time
+            groups = self.db.read(
+                f"SELECT from_currency, to_currency, COALESCE(mode, 'live'), {hour}, COUNT(*), COUNT(amount), "
+                f"TOTAL(amount), MAX(amount) FROM history WHERE id > ? AND id <= ? GROUP BY 1, 2, 3, 4",
+                (after_id, last_id)
+            )
+            return groups, last_id, last_time
+
+    @staticmethod
+    def _where(from_currency, to_currency, mode, since, until):
+        clauses, params = [], []
+        for column, value in (("from_currency", from_currency), ("to_currency", to_currency), ("mode", mode)):
+            if value:
+                clauses.append(f"{column} = ?")
+                params.append(value)
+        if since:
+            clauses.append("time >= ?")
+            params.append(since)
+        if until:
+            clauses.append("time < ?")
+            params.append(until)
+        return clauses, params
+
+    def _select(self, clauses, params, limit):
+        sql = "SELECT id, time, data FROM history"
+        if clauses:
+            sql += " WHERE " + " AND ".join(clauses)
+        sql += " ORDER BY time DESC, id DESC"
+        if limit:
+            sql += " LIMIT ?"
+            params = params + [int(limit)]
+        return self.db.read(sql, params)
+
+    def query(self, from_currency=None, to_currency=None, mode=None, since=None, until=None, limit=None):
+        """Matching entries, newest first, answered from the pair/time indexes."""
+        clauses, params = self._where(from_currency, to_currency, mode, since, until)
+        return [json.loads(data) for _, _, data in self._select(clauses, params, limit)]
+
+    def page(self, from_currency=None, to_currency=None, mode=None, since=None, until=None,
+             cursor=None, limit=50):
+        """
+        One page of matching entries, newest first, and the cursor for the next
+        page (None on the last one). Cursors are "<time>|<id>" of the last row
+        returned, so every page is one index range scan however deep it is.
+        """
+        clauses, params = self._where(from_currency, to_currency, mode, since, until)
+        if cursor:
+            time, _, rowid = cursor.rpartition("|")
+            if rowid.isdigit():
+                clauses.append("(time, id) < (?, ?)")
+                params += [time, int(rowid)]
+        rows = self._select(clauses, params, limit + 1)
+        found = [json.loads(data) for _, _, data in rows[:limit]]
+        if len(rows) <= limit:
+            return found, None
+        rowid, time, _ = rows[limit - 1]
+        return found, f"{time}|{rowid}"
+
+
+class SqliteRecordStore:
+    """Records as rows of one table; `items` mirrors the table in insertion order."""
+
+    table = None
+    columns = ()
+    # Rows are only ever inserted, so picking up other workers' changes only needs the new rows
+    append_only = False
+
+    def __init__(self, db):
+        self.db = db
+        self.items = []
+        self._rowids = {}   # id(record) -> rowid, for update()
+        self._last_rowid = 0
+        self._version = None
+        self._thread_lock = threading.RLock()
+
+    def values(self, record):
+        """Indexed column values for record, in `columns` order (by default the record's values under those names)."""
+        return tuple(record.get(column) for column in self.columns)
+
+    def changed(self):
+        return self.db.version(self.table) != self._version
+
+    @contextmanager
+    def locked(self):
+        """Exclusive cross-process lock for a refresh-then-write sequence."""
+        with self._thread_lock, file_lock(f"{self.db.path}.{self.table}"):
+            yield
+
+    def load(self):
+        with self._thread_lock:
+            version = self.db.version(self.table)
+            if not (self.append_only and self._version is not None):
+                self.items = []
+                self._rowids = {}
+                self._last_rowid = 0
+            rows = self.db.read(f"SELECT id, data FROM {self.table} WHERE id > ? ORDER BY id",
+                                (self._last_rowid,))
+            for rowid, data in rows:
+                item = json.loads(data)
+                self._rowids[id(item)] = rowid
+                self.items.append(item)
+                self._last_rowid = rowid
+            self._version = version
+            return self.items
+
+    def add(self, record):
+        """Insert one row. Returns False, writing nothing, when a unique column already holds its value."""
+        with self._thread_lock:
+            with self.db.transaction() as conn:
+                cur = conn.execute(_insert_sql(self.table, self.columns, ignore=True),
+                                   (*self.values(record), _dumps(record)))
+                if not cur.rowcount:
+                    return False
+                current = self.db.bump(conn, self.table) - 1 == self._version
+            # Otherwise another process wrote in between; the next load() picks up both rows
+            if current:
+                self.items.append(record)
+                self._rowids[id(record)] = cur.lastrowid
+                self._last_rowid = cur.lastrowid
+                self._version += 1
+            return True
+
+    def update(self, records):
+        """Write back records (members of items) that were changed in place."""
+        assignments = ", ".join(f"{column} = ?" for column in self.columns + ("data",))
+        rows = [(*self.values(record), _dumps(record), self._rowids[id(record)])
+                for record in records if id(record) in self._rowids]
+        if not rows:
+            return
+        with self._thread_lock:
+            with self.db.transaction() as conn:
+                conn.executemany(f"UPDATE {self.table} SET {assignments} WHERE id = ?", rows)
+                current = self.db.bump(conn, self.table) - 1 == self._version
+            if current:
+                self._version += 1
+
+
+class SqliteAlertStore(SqliteRecordStore):
+    table = "alerts"
+    columns = ("from_currency", "to_currency", "phone", "target_rate", "active")
+
+    def values(self, alert):
+        return (alert.get("from"), alert.get("to"), alert.get("phone_number"),
+                _number(alert.get("target_rate")), int(is_active(alert)))
+
+
+class SqliteSubscriberStore(SqliteRecordStore):
+    table = "subscribers"
+    columns = ("phone", "created_at")
+    append_only = True
+
+
+def _read_list(path):
+    if not os.path.exists(path):
+        return []
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        return data if isinstance(data, list) else []
+    except Exception as e:
+        print(f"[WARN] Failed to read {path}: {e}")
+        return []
+
+
+def migrate_json(db, history_path=HISTORY_FILE, legacy_history_path=LEGACY_HISTORY_FILE,
+                 alerts_path=ALERTS_FILE, subscribers_path=SUBSCRIBERS_FILE):
+    """
+    Import the JSON files into db once, in a single transaction. Returns the
+    imported counts, or None when db was already migrated. The files are left in place.
+    """
+    if db.version("migrated"):
+        return None
+    if os.path.exists(history_path):
+        history = HistoryLog(history_path, legacy_path=None, compact_every=0).entries()
+    else:
+        history = _read_list(legacy_history_path)
+    alerts = _read_list(alerts_path)
+    subscribers = [s for s in _read_list(subscribers_path) if isinstance(s, dict) and s.get("phone")]
+    alert_store, subscriber_store = SqliteAlertStore(db), SqliteSubscriberStore(db)
+    with db.transaction() as conn:
+        # Another worker may have migrated while we were reading
+        if conn.execute("SELECT value FROM meta WHERE key = 'migrated'").fetchone()[0]:
+            return None
+        conn.executemany(_insert_sql("history", HISTORY_COLUMNS), (_history_row(e) for e in history))
+        conn.executemany(_insert_sql("alerts", alert_store.columns),
+                         ((*alert_store.values(a), _dumps(a)) for a in alerts))
+        conn.executemany(_insert_sql("subscribers", subscriber_store.columns, ignore=True),
+                         ((*subscriber_store.values(s), _dumps(s)) for s in subscribers))
+        conn.execute("UPDATE meta SET value = 1 WHERE key = 'migrated'")
+    counts = {"history": len(history), "alerts": len(alerts), "subscribers": len(subscribers)}
+    print(f"[INFO] Migrated {counts['history']} history entries, {counts['alerts']} alerts and "
+          f"{counts['subscribers']} subscribers into {db.path}")
+    return counts
+
+
+def open_stores(backend=STORAGE_BACKEND, db_path=STORAGE_DB):
+    """(history, alerts, subscribers) stores for the configured backend."""
+    if backend == "sqlite":
+        db = SqliteDatabase(db_path)
+        return SqliteHistoryStore(db), SqliteAlertStore(db), SqliteSubscriberStore(db)
+    if backend != "json":
+        print(f"[WARN] Unknown STORAGE_BACKEND '{backend}', using json")
+    return HistoryLog(), JsonRecordStore(ALERTS_FILE), JsonRecordStore(SUBSCRIBERS_FILE, key="phone")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Storage maintenance.")
+    parser.add_argument("command", choices=["migrate"], help="migrate: import the JSON files into SQLite")
+    parser.add_argument("--db", default=STORAGE_DB, help=f"SQLite database (default: {STORAGE_DB})")
+    args = parser.parse_args(argv)
+
+    if migrate_json(SqliteDatabase(args.db, migrate=False)) is None:
+        print(f"[INFO] {args.db} was already migrated")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,20 @@
+import importlib
+import os
+import sys
+
+import pytest
+
+# The modules live at the repository root
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+@pytest.fixture(scope="module")
+def web(tmp_path_factory):
+    """The Flask app, imported with its data files in a temporary directory."""
+    previous = os.getcwd()
+    os.chdir(tmp_path_factory.mktemp("app"))
+    os.environ["STORAGE_BACKEND"] = "json"
+    try:
+        yield importlib.import_module("app")
+    finally:
+        os.chdir(previous)
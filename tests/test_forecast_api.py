@@ -0,0 +1,26 @@
+"""
+Amount validation on the forecast API. The HTML views share the same check
+in build_forecast_view.
+"""
+
+import pytest
+
+
+@pytest.fixture
+def client(web):
+    return web.app.test_client()
+
+
+@pytest.mark.parametrize("amount", ["nan", "inf", "-inf", "0", "-5", "abc", ""])
+def test_api_forecast_rejects_bad_amounts(client, amount):
+    response = client.get(f"/api/forecast/USD/INR?amount={amount}")
+    assert response.status_code == 400
+    body = response.get_json()
+    assert body["success"] is False
+    assert "finite number greater than 0" in body["error"]
+
+
+@pytest.mark.parametrize("amount", ["nan", "inf", "0"])
+def test_build_forecast_view_rejects_bad_amounts(web, amount):
+    with pytest.raises(ValueError):
+        web.build_forecast_view("USD", "INR", float(amount))
@@ -0,0 +1,158 @@
+"""
+Historical rates (historical.py) and /api/rate?date=, against a recorded
+frankfurter range response (fixtures/frankfurter_usd_2024-05-29_2024-06-12.json).
+
+The recording covers weekdays only; 2024-06-01/02 and 06-08/09 are weekends,
+and the 2024-06-05 row has no INR quote.
+"""
+
+import os
+from datetime import date, timedelta
+
+import numpy as np
+import pytest
+
+import historical
+from historical import HistoricalRates, read_recorded
+
+
+RECORDED = os.path.join(os.path.dirname(__file__), "fixtures", "frankfurter_usd_2024-05-29_2024-06-12.json")
+
+
+@pytest.fixture
+def store(tmp_path):
+    rates = HistoricalRates(str(tmp_path / "historical_rates.npz"))
+    assert rates.merge(read_recorded(RECORDED)) == 11
+    return rates
+
+
+def test_read_recorded_accepts_one_response_or_a_list(tmp_path):
+    tables = read_recorded(RECORDED)
+    assert len(tables) == 11
+    assert tables["2024-06-03"]["INR"] == 83.10
+
+    listed = tmp_path / "recorded.json"
+    listed.write_text(f"[{open(RECORDED).read()}, {{\"rates\": {{\"2024-06-13\": {{\"INR\": 83.6}}}}}}]")
+    assert set(read_recorded(str(listed))) == set(tables) | {"2024-06-13"}
+
+
+def test_merge_partial_row_keeps_known_quotes(store):
+    # 2024-06-05 was recorded without INR: the other quotes are stored, INR stays unknown
+    assert store.rate("USD", "EUR", date(2024, 6, 5)) == pytest.approx(0.9189)
+    assert store.rate_on("USD", "INR", date(2024, 6, 5)) == (pytest.approx(83.60), date(2024, 6, 4))
+
+    # A later partial row fills the gap without wiping the quotes it doesn't carry
+    assert store.merge({"2024-06-05": {"INR": 83.40}}) == 1
+    assert store.rate_on("USD", "INR", date(2024, 6, 5)) == (pytest.approx(83.40), date(2024, 6, 5))
+    assert store.rate("USD", "EUR", date(2024, 6, 5)) == pytest.approx(0.9189)
+
+
+def test_merge_skips_unusable_rows(store):
+    # Only the base quote, a bad date, a non-table and non-positive rates add nothing
+    assert store.merge({"2024-06-13": {"XXX": 2.0}, "2024-13-01": {"INR": 83.0},
+                        "2024-06-14": None, "2024-06-15": {"INR": 0, "EUR": "n/a"}}) == 0
+    assert store.coverage() == (date(2024, 5, 29), date(2024, 6, 12), 11)
+
+
+def test_rate_on_resolves_weekend_to_previous_business_day(store):
+    assert store.rate_on("USD", "INR", date(2024, 6, 2)) == (pytest.approx(83.30), date(2024, 5, 31))
+    # Cross rates are the ratio of two base quotes
+    rate, quoted = store.rate_on("EUR", "INR", date(2024, 6, 8))
+    assert quoted == date(2024, 6, 7)
+    assert rate == pytest.approx(83.50 / 0.9254)
+
+
+def test_rate_on_returns_none_past_max_gap(store):
+    last = date(2024, 6, 12)
+    assert store.rate_on("USD", "INR", last + timedelta(days=historical.HISTORICAL_MAX_GAP_DAYS)) is not None
+    assert store.rate_on("USD", "INR", last + timedelta(days=historical.HISTORICAL_MAX_GAP_DAYS + 1)) is None
+    assert store.rate_on("USD", "INR", date(2024, 5, 28)) is None
+    assert store.rate_on("USD", "XXX", last) is None
+
+
+def test_window_high_bounds(store):
+    # 06-05..06-07: 06-05 has no INR, so the high is 06-07's
+    assert store.window_high("USD", "INR", days=3, end=date(2024, 6, 7)) == pytest.approx(83.50)
+    # One more day reaches back to 06-04, the highest close in the recording
+    assert store.window_high("USD", "INR", days=4, end=date(2024, 6, 7)) == pytest.approx(83.60)
+    # Both ends are inclusive
+    assert store.window_high("USD", "INR", days=1, end=date(2024, 6, 4)) == pytest.approx(83.60)
+    # A weekend-only window holds nothing
+    assert store.window_high("USD", "INR", days=2, end=date(2024, 6, 9)) is None
+
+
+def test_backfill_fetches_in_chunks_and_saves(store):
+    calls = []
+    recorded = read_recorded(RECORDED)
+
+    def fetch(base, start, end):
+        calls.append((base, start, end))
+        return {day: table for day, table in recorded.items() if start <= date.fromisoformat(day) <= end}
+
+    start, end = date(2023, 3, 1), date(2025, 5, 9)
+    store.backfill(start, end, fetch=fetch)
+
+    chunk = timedelta(days=historical.HISTORICAL_CHUNK_DAYS)
+    assert [c[0] for c in calls] == ["USD"] * 3
+    assert calls[0][1:] == (start, start + chunk - timedelta(days=1))
+    assert calls[1][1] == calls[0][2] + timedelta(days=1)
+    assert calls[2][1:] == (start + 2 * chunk, end)
+
+    # Saved: a fresh store reads the same days back from the file
+    reloaded = HistoricalRates(store.path)
+    assert reloaded.coverage() == (date(2024, 5, 29), date(2024, 6, 12), 11)
+    assert reloaded.rate("USD", "JPY", date(2024, 6, 10)) == pytest.approx(157.09)
+
+
+def test_backfill_resumes_after_last_stored_day(store):
+    calls = []
+    store.backfill(end=date(2024, 6, 20), fetch=lambda base, start, end: calls.append((start, end)))
+    assert calls == [(date(2024, 6, 13), date(2024, 6, 20))]
+
+
+def test_backfill_skips_failed_chunks(tmp_path):
+    rates = HistoricalRates(str(tmp_path / "historical_rates.npz"))
+    assert rates.backfill(date(2024, 6, 1), date(2024, 6, 7), fetch=lambda base, start, end: None) == 0
+    assert not os.path.exists(rates.path)
+
+
+def test_load_maps_columns_by_code(tmp_path):
+    path = tmp_path / "historical_rates.npz"
+    with open(path, "wb") as f:
+        np.savez(f, days=np.array([date(2024, 6, 3).toordinal()], dtype=np.int32),
+                 codes=np.array(["INR", "USD"]), rates=np.array([[83.10, 1.0]]))
+    assert HistoricalRates(str(path)).rate("USD", "INR", date(2024, 6, 3)) == pytest.approx(83.10)
+
+
+@pytest.fixture
+def client(web, store, monkeypatch):
+    monkeypatch.setattr(web, "historical_rates", store)
+    return web.app.test_client()
+
+
+def test_rate_api_as_of_date(client):
+    response = client.get("/api/rate/USD/INR?date=2024-06-02")
+    assert response.status_code == 200
+    body = response.get_json()
+    assert body["success"] is True
+    assert body["rate"] == 83.30
+    assert body["date"] == "2024-06-02"
+
+
+@pytest.mark.parametrize("value", ["2024-6-x", "yesterday", (date.today() + timedelta(days=1)).isoformat(),
+                                   "2030-01-01"])
+def test_rate_api_rejects_malformed_and_future_dates(client, value):
+    response = client.get(f"/api/rate/USD/INR?date={value}")
+    assert response.status_code == 400
+    assert response.get_json()["success"] is False
+
+
+def test_rate_api_date_without_stored_rate(client):
+    response = client.get("/api/rate/USD/INR?date=2023-01-02")
+    assert response.status_code == 404
+    assert "No stored USD→INR rate" in response.get_json()["error"]
+
+
+def test_get_exchange_rate_rejects_future_as_of(web):
+    with pytest.raises(ValueError):
+        web.get_exchange_rate("USD", "INR", as_of=date.today() + timedelta(days=1))
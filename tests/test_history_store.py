@@ -0,0 +1,95 @@
+"""
+Paging through the JSON Lines history (history_store.HistoryLog.page): results
+match a full scan, and the index keeps a page's cost bounded on a large log.
+"""
+
+from datetime import datetime, timedelta
+
+import pytest
+
+import history_store
+from history_store import HistoryLog, matches
+
+PAIRS = [("USD", "INR"), ("EUR", "INR"), ("USD", "EUR"), ("GBP", "USD")]
+START = datetime(2024, 1, 1)
+
+
+def conversion(i, minutes=None):
+    from_currency, to_currency = PAIRS[i % len(PAIRS)]
+    when = START + timedelta(minutes=i if minutes is None else minutes)
+    return {"from": from_currency, "to": to_currency, "amount": i, "mode": "simulated" if i % 97 == 0 else "live",
+            "time": when.strftime("%Y-%m-%d %H:%M:%S")}
+
+
+def all_pages(log, **filters):
+    found, cursor = [], None
+    while True:
+        page, cursor = log.page(cursor=cursor, limit=7, **filters)
+        found += page
+        if cursor is None:
+            return found
+
+
+def scan(entries, **filters):
+    return [e for e in reversed(entries) if matches(e, **filters)]
+
+
+FILTERS = [
+    {},
+    {"from_currency": "USD"},
+    {"to_currency": "INR"},
+    {"from_currency": "USD", "to_currency": "INR"},
+    {"mode": "simulated"},
+    {"mode": "simulated", "to_currency": "INR"},
+    {"since": "2024-01-01 01:00:00", "until": "2024-01-01 02:30:00"},
+    {"from_currency": "EUR", "since": "2024-01-01 03:10:00"},
+    {"to_currency": "USD", "until": "2024-01-01 00:40:00"},
+    {"since": "2030-01-01 00:00:00"},
+    {"from_currency": "XXX"},
+]
+
+
+@pytest.fixture
+def log(tmp_path):
+    log = HistoryLog(str(tmp_path / "history.jsonl"), legacy_path=None, compact_every=0)
+    entries = [conversion(i) for i in range(400)]
+    # Two workers racing to append: a few entries land after newer ones
+    entries[120], entries[121] = entries[121], entries[120]
+    entries[300]["time"] = "2024-01-01 02:00:00"
+    log.append_many(entries)
+    return log
+
+
+@pytest.mark.parametrize("filters", FILTERS)
+def test_pages_match_a_full_scan(log, filters):
+    assert all_pages(log, **filters) == scan(log.entries(), **filters)
+
+
+def test_index_follows_appends_and_compaction(log):
+    log.page(to_currency="INR", limit=5)
+    log.append(conversion(400))
+    assert log.page(to_currency="INR", limit=1)[0] == [conversion(400)]
+
+    log.max_entries = 50
+    log.compact()
+    assert all_pages(log, mode="simulated") == scan(log.entries(), mode="simulated")
+    assert all_pages(log, from_currency="USD") == scan(log.entries(), from_currency="USD")
+
+
+def test_page_cost_is_bounded_on_a_large_log(tmp_path, monkeypatch):
+    log = HistoryLog(str(tmp_path / "history.jsonl"), legacy_path=None, compact_every=0)
+    log.append_many([conversion(i) for i in range(100_000)])
+    log.page()   # build the index
+
+    checked = []
+    real_matches = history_store.matches
+    monkeypatch.setattr(history_store, "matches", lambda entry, *args: checked.append(1) or real_matches(entry, *args))
+
+    oldest_hour = {"since": "2024-01-01 00:00:00", "until": "2024-01-01 01:00:00"}
+    for filters in (oldest_hour, {"mode": "simulated"}, {"from_currency": "GBP"},
+                    {"to_currency": "EUR", **oldest_hour}, {"since": "2024-02-01 00:00:00"}):
+        checked.clear()
+        page, _ = log.page(limit=20, **filters)
+        assert page
+        # Only the page itself (and the one entry that shows there is a next page) is examined
+        assert len(checked) <= 21, filters
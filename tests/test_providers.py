@@ -0,0 +1,157 @@
+"""
+Provider fetching (providers.py) against the local stub HTTP server from
+benchmarks/stub_provider.py: hedging, first-valid-wins, circuit breakers,
+total failure and the per-provider in-flight cap.
+
+Breakers and stats are module-wide and keyed by provider name, so every test
+uses its own names.
+"""
+
+import itertools
+import time
+
+import pytest
+
+import providers
+from benchmarks.stub_provider import start_stub_provider
+
+
+_names = itertools.count()
+
+
+@pytest.fixture(scope="module")
+def stub():
+    server, url = start_stub_provider()
+    yield server, url
+    server.shutdown()
+
+
+def provider(stub, name, to="INR", delay=0.0, status=200):
+    server, url = stub
+    name = f"{name}-{next(_names)}"
+    return {
+        "name": name,
+        # The name in the query tells the providers' requests apart in server.requests
+        "url": f"{url}/latest/USD?delay={delay}&status={status}&provider={name}",
+        "extract": lambda r: r.get("rates", {}).get(to),
+    }
+
+
+def served(stub, entry):
+    """How many requests the stub got for this provider entry."""
+    server, url = stub
+    return server.requests.count(entry["url"][len(url):])
+
+
+def test_valid_rate_rejects_bools_and_non_positive():
+    assert providers.valid_rate(88.78)
+    assert providers.valid_rate(2)
+    assert not providers.valid_rate(True)
+    assert not providers.valid_rate(0)
+    assert not providers.valid_rate("88.78")
+
+
+def test_hedge_not_started_when_first_answers_in_time(stub):
+    fast, spare = provider(stub, "fast"), provider(stub, "spare")
+    assert providers.fetch_hedged([fast, spare], hedge_delay=0.5) == pytest.approx(88.78)
+    assert served(stub, spare) == 0
+
+
+def test_hedge_starts_after_delay_and_wins(stub):
+    slow, hedge = provider(stub, "slow", delay=1.0), provider(stub, "hedge")
+    started = time.perf_counter()
+    assert providers.fetch_hedged([slow, hedge], hedge_delay=0.1) == pytest.approx(88.78)
+    elapsed = time.perf_counter() - started
+    assert 0.1 <= elapsed < 0.8
+    assert served(stub, hedge) == 1
+
+
+def test_failure_launches_next_provider_without_waiting(stub):
+    broken, backup = provider(stub, "broken", status=503), provider(stub, "backup")
+    started = time.perf_counter()
+    assert providers.fetch_hedged([broken, backup], hedge_delay=5) == pytest.approx(88.78)
+    assert time.perf_counter() - started < 2
+
+
+def test_race_first_valid_answer_wins(stub):
+    # The fastest answer has no rate for XXX; the next valid one wins over the slowest
+    invalid = provider(stub, "invalid", to="XXX")
+    medium = provider(stub, "medium", to="EUR", delay=0.2)
+    slow = provider(stub, "slow", to="GBP", delay=1.0)
+    started = time.perf_counter()
+    assert providers.fetch_first([invalid, medium, slow], mode="race") == pytest.approx(0.86)
+    assert time.perf_counter() - started < 0.8
+
+
+def test_all_providers_fail_returns_none(stub):
+    entries = [provider(stub, "down", status=503), provider(stub, "missing", to="XXX"),
+               provider(stub, "bad", status=500)]
+    for mode in ("hedge", "race", "sequential"):
+        assert providers.fetch_first(entries, mode=mode) is None
+
+
+def test_breaker_opens_on_5xx_and_half_open_trial_closes_it(stub):
+    server, url = stub
+    entry = provider(stub, "flaky", status=503)
+    breaker = providers.get_breaker(entry["name"])
+    breaker.cooldown = 0.2
+    for _ in range(breaker.failure_threshold):
+        with pytest.raises(Exception):
+            providers.call_provider(entry)
+    assert breaker.snapshot()["state"] == "open"
+
+    # Open: skipped without a request
+    requests_before = len(server.requests)
+    with pytest.raises(providers.CircuitOpenError):
+        providers.call_provider(entry)
+    assert len(server.requests) == requests_before
+    assert providers.fetch_first([entry]) is None
+
+    # After the cooldown one trial goes out; it succeeds and closes the breaker
+    time.sleep(0.25)
+    entry["url"] = entry["url"].replace("status=503", "status=200")
+    assert breaker.allow()
+    assert not breaker.allow()
+    breaker._trial_running = False
+    assert providers.call_provider(entry) == pytest.approx(88.78)
+    assert breaker.snapshot() == {"state": "closed", "failures": 0, "retry_in": None}
+
+
+def test_failed_half_open_trial_reopens_breaker():
+    now = [0.0]
+    breaker = providers.CircuitBreaker(failure_threshold=2, cooldown=10, clock=lambda: now[0])
+    breaker.record_failure()
+    breaker.record_failure()
+    assert not breaker.available()
+    now[0] = 10
+    assert breaker.available()
+    assert breaker.allow()
+    breaker.record_failure()
+    assert breaker.snapshot()["state"] == "open"
+    assert not breaker.allow()
+
+
+def test_unusable_answers_do_not_trip_breaker(stub):
+    entries = [provider(stub, "unknown-currency", to="XXX"), provider(stub, "not-found", status=404)]
+    for entry in entries:
+        breaker = providers.get_breaker(entry["name"])
+        for _ in range(breaker.failure_threshold + 1):
+            with pytest.raises(Exception):
+                providers.call_provider(entry)
+        assert breaker.snapshot()["state"] == "closed"
+
+
+def test_in_flight_cap_skips_busy_provider(stub, monkeypatch):
+    monkeypatch.setattr(providers, "PROVIDER_MAX_IN_FLIGHT", 1)
+    stuck = provider(stub, "stuck", delay=1.0)
+    spare = provider(stub, "spare")
+    # A first fetch gives up on "stuck" (its request keeps running) and takes the spare
+    assert providers.fetch_hedged([stuck, spare], hedge_delay=0.05) == pytest.approx(88.78)
+    # "stuck" is still at its limit: the next fetch goes straight to the spare, no new request
+    assert providers.fetch_hedged([stuck, spare], hedge_delay=5) == pytest.approx(88.78)
+    assert served(stub, stuck) == 1
+
+    deadline = time.monotonic() + 3
+    while providers._in_flight.get(stuck["name"]) and time.monotonic() < deadline:
+        time.sleep(0.05)
+    assert providers._in_flight[stuck["name"]] == 0
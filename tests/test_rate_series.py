@@ -0,0 +1,62 @@
+"""
+Rate observation series (rate_series.py): seeding and compaction of the JSON
+Lines file.
+"""
+
+import json
+from datetime import datetime, timedelta
+
+import pytest
+
+from rate_series import RateSeries
+
+
+@pytest.fixture
+def series(tmp_path):
+    return RateSeries(str(tmp_path / "rate_series.jsonl"), seed_path=None, compact_every=0, tick_days=7)
+
+
+def test_seeded_rates_stay_out_of_current_windows(tmp_path):
+    seed = tmp_path / "rate_history.json"
+    seed.write_text(json.dumps({"USD_INR": 88.78, "USD_USD": 1.0}))
+    series = RateSeries(str(tmp_path / "rate_series.jsonl"), seed_path=str(seed))
+
+    assert series.pairs() == ["USD_INR"]
+    assert series.window_stats("USD", "INR", days=7) is None
+    assert series.daily_closes("USD", "INR", days=30) == []
+    assert [close for _, close in series.daily_closes("USD", "INR")] == [88.78]
+
+
+def test_compaction_folds_old_ticks_into_daily_rows(series):
+    now = datetime.now().replace(hour=12, minute=0, second=0, microsecond=0)
+    old = now - timedelta(days=20)
+    for minutes, rate in enumerate([83.0, 84.0, 82.0, 83.5]):
+        series.record("USD", "INR", rate, when=old + timedelta(minutes=minutes * 10))
+    for minutes, rate in enumerate([88.0, 89.0]):
+        series.record("USD", "INR", rate, when=now + timedelta(minutes=minutes * 10))
+    before = series.window_stats("USD", "INR", days=30)
+
+    series.compact()
+
+    with open(series.path) as f:
+        rows = [json.loads(line) for line in f]
+    assert len(rows) == 3
+    assert rows[0] == {"pair": "USD_INR", "rate": 83.5, "time": (old + timedelta(minutes=30)).strftime("%Y-%m-%d %H:%M:%S"),
+                       "high": 84.0, "low": 82.0, "sum": pytest.approx(332.5), "count": 4}
+    assert [row["rate"] for row in rows[1:]] == [88.0, 89.0]
+
+    reloaded = RateSeries(series.path, seed_path=None)
+    assert reloaded.window_stats("USD", "INR", days=30) == pytest.approx(before)
+    assert reloaded.daily_closes("USD", "INR") == series.daily_closes("USD", "INR")
+
+
+def test_compaction_runs_every_n_appended_lines(tmp_path):
+    series = RateSeries(str(tmp_path / "rate_series.jsonl"), seed_path=None, compact_every=10, tick_days=1)
+    start = datetime.now() - timedelta(days=5)
+    for i in range(25):
+        series.record("USD", "EUR", 0.80 + i / 1000, when=start + timedelta(hours=i))
+    with open(series.path) as f:
+        lines = f.readlines()
+    # Compacted at 10 and 20: the 20 ticks before that fold into their days, 5 ticks since stay
+    assert len(lines) < 12
+    assert RateSeries(series.path, seed_path=None).window_stats("USD", "EUR", days=7)["observations"] == 25
@@ -0,0 +1,184 @@
+"""
+Bulk SMS dispatch (sms_dispatch.py) and the outbox (sms_outbox.py) against a
+fake in-process SMS client.
+"""
+
+import json
+import threading
+from datetime import datetime, timedelta
+
+import pytest
+
+import sms_dispatch
+from sms_dispatch import FAILED, SENT, DeliveryLedger, TokenBucket, dispatch_bulk
+from sms_outbox import SmsOutbox
+
+
+class Crash(BaseException):
+    """Stands in for the process dying mid-send (not caught like a send error)."""
+
+
+class FakeSms:
+    """In-process SMS client: records sends and fails per phone as scripted."""
+
+    def __init__(self, failures=None, crash_after=None):
+        self.failures = dict(failures or {})   # phone -> failures before it succeeds (-1: always)
+        self.crash_after = crash_after
+        self.sent = []
+        self.attempts = []
+        self._lock = threading.Lock()
+
+    def __call__(self, phone, message):
+        with self._lock:
+            if self.crash_after is not None and len(self.sent) >= self.crash_after:
+                raise Crash()
+            self.attempts.append(phone)
+            left = self.failures.get(phone, 0)
+            if left:
+                if left > 0:
+                    self.failures[phone] = left - 1
+                raise ConnectionError(f"send to {phone} failed")
+            self.sent.append((phone, message))
+            return True
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+        self.sleeps = []
+
+    def __call__(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.sleeps.append(seconds)
+        self.now += seconds
+
+
+@pytest.fixture
+def ledger(tmp_path):
+    return DeliveryLedger(str(tmp_path / "sms_ledger.jsonl"))
+
+
+PHONES = [f"+9190000000{i}" for i in range(5)]
+
+
+def test_token_bucket_paces_to_rate():
+    clock = FakeClock()
+    bucket = TokenBucket(rate=2, capacity=1, clock=clock, sleep=clock.sleep)
+    for _ in range(5):
+        bucket.acquire()
+    # The first token is banked; every later one waits half a second
+    assert clock.now == pytest.approx(2.0)
+    assert sum(clock.sleeps) == pytest.approx(2.0)
+
+
+def test_token_bucket_burst_then_rate():
+    clock = FakeClock()
+    bucket = TokenBucket(rate=1, capacity=3, clock=clock, sleep=clock.sleep)
+    for _ in range(3):
+        bucket.acquire()
+    assert clock.now == 0
+    bucket.acquire()
+    assert clock.now == pytest.approx(1.0)
+
+
+def test_dispatch_paces_sends_with_the_bucket(ledger, monkeypatch):
+    clock = FakeClock()
+    sms = FakeSms()
+    send_times = []
+
+    def send(phone, message):
+        send_times.append(clock.now)
+        return sms(phone, message)
+
+    bucket = TokenBucket(rate=4, capacity=1, clock=clock, sleep=clock.sleep)
+    monkeypatch.setattr(sms_dispatch, "TokenBucket", lambda rate, capacity, sleep: bucket)
+    summary = dispatch_bulk("b-paced", PHONES, "hi", send, ledger=ledger, workers=1, rate=4)
+    assert summary == {"sent": 5, "failed": 0, "skipped": 0}
+    assert send_times == pytest.approx([0, 0.25, 0.5, 0.75, 1.0])
+
+
+def test_retries_with_exponential_backoff(ledger, monkeypatch):
+    monkeypatch.setattr(sms_dispatch.random, "random", lambda: 0.5)
+    sleeps = []
+    sms = FakeSms(failures={PHONES[0]: 2, PHONES[1]: -1})
+
+    summary = dispatch_bulk("b-retry", PHONES[:2], "hi", sms, ledger=ledger, workers=1, burst=100,
+                            max_attempts=4, backoff=1.0, sleep=sleeps.append)
+
+    assert summary == {"sent": 1, "failed": 1, "skipped": 0}
+    assert sms.attempts.count(PHONES[0]) == 3
+    assert sms.attempts.count(PHONES[1]) == 4
+    # 1s, 2s, 4s... (jitter pinned to 1x); no sleep after the last attempt
+    assert sleeps == [1.0, 2.0, 1.0, 2.0, 4.0]
+    assert ledger.delivered("b-retry", PHONES[0])
+    assert not ledger.delivered("b-retry", PHONES[1])
+
+    with open(ledger.path) as f:
+        deliveries = [r for r in map(json.loads, f) if r["type"] == "delivery"]
+    assert [(r["phone"], r["status"], r["attempts"]) for r in deliveries] == [
+        (PHONES[0], SENT, 3), (PHONES[1], FAILED, 4)]
+    assert "failed" in deliveries[1]["error"]
+
+
+def test_resume_after_crash_mid_batch(ledger):
+    crashing = FakeSms(crash_after=2)
+    with pytest.raises(Crash):
+        dispatch_bulk("daily-x", PHONES, "rates", crashing, ledger=ledger, workers=1, burst=100)
+    assert [phone for phone, _ in crashing.sent] == PHONES[:2]
+
+    # Restart: a fresh ledger reads the file and finds the unfinished batch
+    restarted = DeliveryLedger(ledger.path)
+    assert restarted.incomplete_batches() == {"daily-x": "rates"}
+
+    sms = FakeSms()
+    summary = dispatch_bulk("daily-x", PHONES, "rates", sms, ledger=restarted, workers=2, burst=100)
+    assert summary == {"sent": 3, "failed": 0, "skipped": 2}
+    assert sorted(phone for phone, _ in sms.sent) == PHONES[2:]
+    assert restarted.incomplete_batches() == {}
+
+
+def test_rerun_of_finished_batch_same_day_sends_nothing(ledger):
+    sms = FakeSms()
+    dispatch_bulk("daily-today", PHONES, "rates", sms, ledger=ledger, burst=100)
+    ledger.compact()
+
+    again = FakeSms()
+    reloaded = DeliveryLedger(ledger.path)
+    summary = dispatch_bulk("daily-today", PHONES, "rates", again, ledger=reloaded, burst=100)
+    assert summary == {"sent": 0, "failed": 0, "skipped": 5}
+    assert again.sent == []
+
+
+def test_compact_drops_batches_finished_before_today(ledger):
+    yesterday = (datetime.now() - timedelta(days=1)).strftime("%Y-%m-%d %H:%M:%S")
+    old = [
+        {"type": "batch_started", "batch": "daily-old", "total": 1, "message": "old", "time": yesterday},
+        {"type": "delivery", "batch": "daily-old", "phone": PHONES[0], "status": SENT, "attempts": 1,
+         "time": yesterday},
+        {"type": "batch_finished", "batch": "daily-old", "time": yesterday},
+        {"type": "batch_started", "batch": "daily-gone", "total": 1, "message": "gone", "time": yesterday},
+        {"type": "batch_abandoned", "batch": "daily-gone", "time": yesterday},
+    ]
+    with open(ledger.path, "w") as f:
+        f.writelines(json.dumps(r) + "\n" for r in old)
+    ledger = DeliveryLedger(ledger.path)
+    dispatch_bulk("daily-today", PHONES[:2], "new", FakeSms(), ledger=ledger, burst=100)
+
+    assert ledger.compact() == 4
+    assert not ledger.delivered("daily-old", PHONES[0])
+    assert ledger.delivered("daily-today", PHONES[1])
+    with open(ledger.path) as f:
+        assert {json.loads(line)["batch"] for line in f} == {"daily-today"}
+
+
+def test_outbox_sends_in_background_and_reports_results():
+    sms = FakeSms(failures={PHONES[1]: 1})
+    outbox = SmsOutbox(sms)
+    results = []
+    for phone in PHONES[:3]:
+        outbox.enqueue(phone, "hello", on_result=lambda ok, phone=phone: results.append((phone, ok)))
+    outbox.join()
+    assert results == [(PHONES[0], True), (PHONES[1], False), (PHONES[2], True)]
+    assert outbox.pending() == 0
@@ -0,0 +1,113 @@
+"""
+SQLite storage backend (storage.py): history grouped in SQL for the analytics
+counters and dashboard rollups must match what the in-memory path computes.
+"""
+
+from datetime import date
+
+import pytest
+
+from analytics import HistoryAggregates
+from rollups import HistoryRollups
+from storage import SqliteDatabase, SqliteHistoryStore, SqliteSubscriberStore
+
+
+def conversion(i):
+    pairs = [("USD", "INR"), ("EUR", "INR"), ("USD", "EUR")]
+    from_currency, to_currency = pairs[i % 3]
+    return {"from": from_currency, "to": to_currency, "amount": 10 + (i * 37) % 500,
+            "result": 1.0, "rate": 1.0, "mode": "simulated" if i % 4 == 0 else "live",
+            "time": f"2024-06-{1 + i % 20:02d} {i % 24:02d}:{i % 60:02d}:00"}
+
+
+# Not a multiple of 3, so the most frequent pair is not a tie
+N = 301
+
+
+@pytest.fixture
+def db(tmp_path):
+    return SqliteDatabase(str(tmp_path / "currency.db"), migrate=False)
+
+
+@pytest.fixture
+def history(db):
+    store = SqliteHistoryStore(db, compact_every=0)
+    store.append_many([conversion(i) for i in range(N)])
+    return store
+
+
+def in_memory(entries):
+    aggregates = HistoryAggregates(path=None)
+    aggregates._save = lambda: None
+    aggregates.rebuild(entries)
+    rollups = HistoryRollups()
+    rollups.rebuild(entries)
+    return aggregates, rollups
+
+
+def charts(rollups, **args):
+    """Dashboard data with the mode breakdown as a dict (its order follows first appearance)."""
+    data = rollups.dashboard(**args)
+    data["modes"] = dict(zip(data.pop("mode_labels"), data.pop("mode_values")))
+    return data
+
+
+def test_summarize_matches_in_memory_aggregates_and_rollups(history):
+    aggregates, rollups = in_memory([conversion(i) for i in range(N)])
+
+    groups, last_id, last_time = history.summarize()
+    assert last_id == N
+    assert last_time == conversion(N - 1)["time"]
+    grouped = HistoryAggregates(path=None)
+    grouped.merge(groups, last_time, reset=True)
+    assert grouped.summary() == aggregates.summary()
+
+    hourly, _, _ = history.summarize(by_hour=True)
+    grouped_rollups = HistoryRollups()
+    grouped_rollups.merge(hourly, reset=True)
+    for granularity in ("hour", "day", "month"):
+        args = {"granularity": granularity, "start": date(2024, 6, 1), "end": date(2024, 6, 20)}
+        assert charts(grouped_rollups, **args) == charts(rollups, **args)
+    assert charts(grouped_rollups, pair="USD→INR", mode="live") == charts(rollups, pair="USD→INR", mode="live")
+
+
+def test_summarize_only_returns_rows_after_cursor(history):
+    _, last_id, _ = history.summarize()
+    assert history.summarize(last_id) == ([], last_id, conversion(N - 1)["time"])
+
+    history.append_many([conversion(N), conversion(N + 1)])
+    groups, newest, _ = history.summarize(last_id)
+    assert newest == last_id + 2
+    assert sum(group[4] for group in groups) == 2
+
+
+def test_rows_without_amount_count_but_stay_out_of_breakdowns(history):
+    history.append({"from": "USD", "to": "INR", "amount": "n/a", "mode": "live", "time": "2024-06-21 10:00:00"})
+    aggregates = HistoryAggregates(path=None)
+    groups, _, last_time = history.summarize()
+    aggregates.merge(groups, last_time, reset=True)
+    summary = aggregates.summary()
+    assert summary["total_conversions"] == N + 1
+    assert sum(aggregates._data["pair_counts"].values()) == N
+    assert summary["last_conversion_time"] == "2024-06-21 10:00:00"
+
+
+def test_trim_bumps_generation(db):
+    store = SqliteHistoryStore(db, compact_every=0, max_entries=100)
+    store.append_many([conversion(i) for i in range(150)])
+    store.summarize()
+    generation = store.generation
+    store.compact()
+    groups, last_id, _ = store.summarize()
+    assert store.generation == generation + 1
+    assert last_id == 150
+    assert sum(group[4] for group in groups) == 100
+
+
+def test_subscriber_values_default_to_column_names(db):
+    store = SqliteSubscriberStore(db)
+    assert store.values({"phone": "+911234567890", "created_at": "2024-06-01", "name": "x"}) == \
+        ("+911234567890", "2024-06-01")
+    assert store.add({"phone": "+911234567890", "created_at": "2024-06-01"})
+    assert not store.add({"phone": "+911234567890", "created_at": "2024-06-02"})
+    assert [s["phone"] for s in SqliteSubscriberStore(db).load()] == ["+911234567890"]
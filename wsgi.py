@@ -0,0 +1,16 @@
+"""
+Production WSGI entry point.
+
+    gunicorn -w 4 -b 0.0.0.0:5000 wsgi:app
+
+Each worker builds its own app through create_app(); shared state (history,
+alerts, subscribers, notifications) lives in lock-guarded files or, with
+STORAGE_BACKEND=sqlite, in one WAL-mode database, and only one worker - the
+holder of SCHEDULER_LOCK_FILE - runs the daily summary and alert checks.
+Don't use gunicorn's --preload: the scheduler threads must start inside each
+worker, not in the master before it forks.
+"""
+
+from app import create_app
+
+app = create_app()